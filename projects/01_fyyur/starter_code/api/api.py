@@ -1,27 +1,247 @@
-from flask import Blueprint, jsonify, render_template, request, flash, url_for, redirect
-from models import Venue
+from flask import Blueprint, jsonify, render_template, request, flash, url_for, redirect, current_app, Response, stream_with_context
+from sqlalchemy import and_, func, select, text
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from models import Venue, Artist, Show, db
+from autocomplete import KINDS, name_index, load_name_index
+from cache import page_cache, HOME_PAGE
+from availability import availability_cache, venue_availability
+from booking import BOOKED, booking_index, is_double_booking
+from counters import count_shows, uncount_cascaded_shows
+from facets import FACET_MODELS, browse, facet_cache, facet_key
+from feed import add_to_feed, copy_to_feed
+from geo import geo_index, load_geo_index, locate, locate_venues, refresh_geo_index
+from importer import coerce, validate
+from conditional import (
+    compute_etag, mark_deleted, newest, not_modified, table_modified_at,
+    with_validators)
+from dbpool import pool_stats
+from datetime import datetime, timedelta
+import base64
+import binascii
+import csv
+import io
+import json
+import math
 
 '''
 Define the blueprint: 'api'
 '''
 api_bp = Blueprint('api', __name__)
 
+MAX_PAGE_SIZE = 100
+
+EXPORT_MODELS = {'artists': Artist, 'venues': Venue, 'shows': Show}
+EXPORT_BATCH_SIZE = 1000
+
+# Batch endpoints: entity -> (model, show foreign key).
+BATCH_MODELS = {'artists': (Artist, 'artist_id'), 'venues': (Venue, 'venue_id')}
+MAX_BATCH_SIZE = 1000
+BATCH_FILTERS = ('city', 'state', 'seeking_venue', 'seeking_talent')
+# Columns a batch update may not set; the counters belong to counters.py.
+BATCH_READ_ONLY = ('id', 'upcoming_shows_count', 'past_shows_count', 'updated_at')
+
+
+'''
+Encodes the last seen venue id into an opaque paging cursor
+'''
+def encode_cursor(venue_id):
+    payload = json.dumps({'id': venue_id}).encode('utf-8')
+    return base64.urlsafe_b64encode(payload).decode('ascii')
+
+
+'''
+Decodes a paging cursor, returns None when it is malformed
+'''
+def decode_cursor(cursor):
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return int(payload['id'])
+    except (ValueError, TypeError, KeyError, binascii.Error):
+        return None
+
+
+'''
+Counts venues, using the planner estimate on large Postgres tables.
+Takes any sync session, so the async routes share it through run_sync().
+'''
+def count_venues(session=None, threshold=None):
+    session = session or db.session
+    if threshold is None:
+        threshold = current_app.config.get('VENUE_COUNT_ESTIMATE_THRESHOLD', 100000)
+    if session.bind.dialect.name == 'postgresql':
+        estimate = session.execute(
+            text("SELECT reltuples::bigint FROM pg_class "
+                 "WHERE oid = to_regclass('venue')")).scalar()
+        if estimate is not None and estimate >= threshold:
+            return estimate
+    return session.execute(select(func.count(Venue.id))).scalar()
+
 
 '''
 Lists Venues
 '''
 @api_bp.route('/venues')
 def get_venues():
-    page = request.args.get('page', 1, type=int)
-    start = (page - 1) * 10
-    end = start + 10
-    venues = Venue.query.order_by(Venue.id.desc()).all()
-    formated_venues = [venue.format() for venue in venues]
+    limit = min(max(request.args.get('limit', 10, type=int), 1), MAX_PAGE_SIZE)
+    cursor = request.args.get('cursor')
+    query = Venue.query.order_by(Venue.id.desc())
+    if cursor:
+        last_id = decode_cursor(cursor)
+        if last_id is None:
+            return jsonify(
+                {
+                    'success': False,
+                    'message': 'Invalid cursor'
+                }
+            ), 400
+        query = query.filter(Venue.id < last_id)
+    else:
+        page = max(request.args.get('page', 1, type=int), 1)
+        query = query.offset((page - 1) * limit)
+    # Fetch one extra row to know whether another page exists.
+    venues = query.limit(limit + 1).all()
+    has_more = len(venues) > limit
+    venues = venues[:limit]
+    next_cursor = encode_cursor(venues[-1].id) if has_more else None
+    total = count_venues()
+    # Every change to a venue moves its updated_at, deletes move the total.
+    etag = compute_etag(
+        'venues', [(venue.id, venue.updated_at) for venue in venues],
+        next_cursor, total)
+    # Inserts and deletes anywhere shift pages and the total.
+    last_modified = newest(*db.session.execute(
+        table_modified_at(Venue)).one())
+    unchanged = not_modified(etag, last_modified)
+    if unchanged:
+        return unchanged
+    return with_validators(jsonify(
+        {
+            'success': True,
+            'data': [venue.format() for venue in venues],
+            'next_cursor': next_cursor,
+            'total_venues': total
+        }
+    ), etag, last_modified)
+
+
+'''
+Free windows of one or more venues. Query: ids=1,2,3, start and end as
+ISO dates or datetimes (default: the next 30 days) and optionally
+min_hours, the shortest window worth reporting.
+'''
+@api_bp.route('/venues/availability')
+def get_venue_availability():
+    max_venues = current_app.config.get('AVAILABILITY_MAX_VENUES', 50)
+    max_days = current_app.config.get('AVAILABILITY_MAX_DAYS', 92)
+    try:
+        venue_ids = list(dict.fromkeys(
+            int(venue_id) for venue_id in request.args.get('ids', '').split(',')
+            if venue_id.strip()))
+        start = request.args.get('start')
+        start = datetime.fromisoformat(start) if start else datetime.combine(
+            datetime.now().date(), datetime.min.time())
+        end = request.args.get('end')
+        end = datetime.fromisoformat(end) if end else start + timedelta(days=30)
+        min_length = timedelta(hours=float(request.args.get('min_hours', 0)))
+        if not 0 < len(venue_ids) <= max_venues:
+            raise ValueError('ids must list 1 to {} venues'.format(max_venues))
+        if not start < end <= start + timedelta(days=max_days):
+            raise ValueError(
+                'end must be after start, by at most {} days'.format(max_days))
+    except (ValueError, OverflowError) as error:
+        return jsonify({'success': False, 'message': str(error)}), 400
+    windows, unknown = venue_availability(venue_ids, start, end, min_length)
+    return jsonify(
+        {
+            'success': True,
+            'start': start.isoformat(),
+            'end': end.isoformat(),
+            'data': [
+                {'venue_id': venue_id, 'free': windows[venue_id]}
+                for venue_id in venue_ids if venue_id in windows
+            ],
+            'not_found': unknown
+        }
+    )
+
+
+'''
+Browses artists or venues by facets. Query: genre (repeatable, all must
+match), city and state, plus page and limit. Returns one page of matches
+ordered by id, their total, and the counts of every genre, city and state
+among them, most frequent first.
+'''
+@api_bp.route('/<entity>/facets')
+def get_facets(entity):
+    if entity not in FACET_MODELS:
+        return jsonify({'success': False, 'message': 'Unknown entity'}), 404
+    key = facet_key(
+        request.args.getlist('genre'),
+        request.args.get('city'),
+        request.args.get('state'))
+    page = max(request.args.get('page', 1, type=int), 1)
+    limit = min(max(request.args.get('limit', 10, type=int), 1), MAX_PAGE_SIZE)
+    matches, total, counts = browse(entity, key, page, limit)
+    return jsonify(
+        {
+            'success': True,
+            'data': [match.format() for match in matches],
+            'total': total,
+            'facets': {
+                name: [
+                    {'value': value, 'count': count}
+                    for value, count in values.most_common()
+                ]
+                for name, values in counts.items()
+            }
+        }
+    )
+
+
+'''
+Venues near a point, nearest first, from the in-process grid index.
+Query: lat and lng, or city and state resolved with the gazetteer;
+radius_km for every venue within that distance, otherwise the limit
+nearest within GEO_MAX_RADIUS_KM.
+'''
+@api_bp.route('/venues/nearby')
+def get_nearby_venues():
+    max_km = current_app.config.get('GEO_MAX_RADIUS_KM', 500)
+    limit = min(max(request.args.get('limit', 10, type=int), 1), MAX_PAGE_SIZE)
+    lat = request.args.get('lat', type=float)
+    lng = request.args.get('lng', type=float)
+    if lat is None or lng is None:
+        origin = locate(request.args.get('city'), request.args.get('state'))
+        if origin is None:
+            return jsonify({
+                'success': False,
+                'message': 'Pass lat and lng, or a known city and state'
+            }), 400
+        lat, lng = origin
+    if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        return jsonify({'success': False, 'message': 'Invalid coordinates'}), 400
+    radius_km = request.args.get('radius_km', type=float)
+    if radius_km is not None and not (
+            math.isfinite(radius_km) and radius_km > 0):
+        return jsonify({'success': False, 'message': 'Invalid radius_km'}), 400
+    if geo_index.stale(current_app.config.get('GEO_INDEX_MAX_AGE', 600)):
+        load_geo_index()
+    if radius_km is not None:
+        nearby = geo_index.within(lat, lng, min(radius_km, max_km), limit)
+    else:
+        nearby = geo_index.nearest(lat, lng, limit, max_km)
+    venues = {
+        venue.id: venue for venue in
+        Venue.query.filter(Venue.id.in_([venue_id for _, venue_id in nearby]))
+    } if nearby else {}
     return jsonify(
         {
             'success': True,
-            'data': formated_venues[start:end],
-            'total_venues': len(formated_venues)
+            'origin': {'lat': lat, 'lng': lng},
+            'data': [
+                dict(venues[venue_id].format(), distance_km=round(distance, 3))
+                for distance, venue_id in nearby if venue_id in venues
+            ]
         }
     )
 
@@ -33,16 +253,428 @@ Get specific venue
 def get_venue(venue_id):
     venue = Venue.query.get(venue_id)
     if venue:
-        return jsonify(
+        etag = compute_etag('venue', venue.id, venue.updated_at)
+        unchanged = not_modified(etag, venue.updated_at)
+        if unchanged:
+            return unchanged
+        return with_validators(jsonify(
             {
                 'success': True,
                 'data': venue.format()
             }
-        )
+        ), etag, venue.updated_at)
     else:
         return jsonify(
             {
                 'success': False,
                 'message': 'Venue not found'
             }
-        )
\ No newline at end of file
+        )
+
+
+'''
+Completes artist and venue names from the in-process prefix index
+'''
+@api_bp.route('/autocomplete')
+def autocomplete():
+    kind = request.args.get('type')
+    if kind is not None and kind not in KINDS:
+        return jsonify(
+            {
+                'success': False,
+                'message': 'Unknown type'
+            }
+        ), 400
+    if not name_index.loaded:
+        load_name_index()
+    limit = min(max(request.args.get('limit', 10, type=int), 1), MAX_PAGE_SIZE)
+    return jsonify(
+        {
+            'success': True,
+            'data': name_index.complete(
+                request.args.get('q', ''), kind=kind, limit=limit)
+        }
+    )
+
+
+'''
+Page cache hit/miss counters
+'''
+@api_bp.route('/cache')
+def cache_stats():
+    return jsonify(
+        {
+            'success': True,
+            'data': page_cache.stats()
+        }
+    )
+
+
+'''
+Connection pool statistics of the worker serving the request
+'''
+@api_bp.route('/pool')
+def get_pool_stats():
+    return jsonify(
+        {
+            'success': True,
+            'data': pool_stats(db.engine, current_app.config)
+        }
+    )
+
+
+'''
+Serializes export values: datetimes as ISO 8601, lists joined for CSV
+'''
+def export_value(value, for_csv=False):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if for_csv and isinstance(value, list):
+        return ','.join(value)
+    return value
+
+
+'''
+SELECT of every column of an export, in id order, read in batches of
+EXPORT_BATCH_SIZE from a server-side cursor. Raises ValueError on a bad
+updated_since.
+'''
+def export_query(model, updated_since=None):
+    query = select(*model.__table__.columns)
+    if updated_since:
+        query = query.where(
+            model.updated_at >= datetime.fromisoformat(updated_since))
+    return query.order_by(model.id).execution_options(
+        yield_per=EXPORT_BATCH_SIZE)
+
+
+'''
+Serializes one batch of export rows as NDJSON lines or CSV records
+'''
+def export_chunk(export_format, columns, rows):
+    if export_format == 'csv':
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(
+            [export_value(value, True) for value in row] for row in rows)
+        return buffer.getvalue()
+    return ''.join(json.dumps(
+        {name: export_value(value) for name, value in zip(columns, row)}
+    ) + '\n' for row in rows)
+
+
+'''
+Media type and headers of an export response
+'''
+def export_headers(entity, export_format, started_at):
+    mimetype = 'text/csv' if export_format == 'csv' else 'application/x-ndjson'
+    return mimetype, {
+        'Content-Disposition': 'attachment; filename={}.{}'.format(
+            entity, export_format),
+        'X-Export-Started-At': started_at.isoformat(),
+    }
+
+
+'''
+Streams every artist, venue or show as NDJSON or CSV.
+Rows come from a server-side cursor in batches of EXPORT_BATCH_SIZE, so
+memory stays flat whatever the table size. updated_since limits the dump
+to rows changed since then; the X-Export-Started-At header is the value to
+pass on the next incremental run.
+'''
+@api_bp.route('/export/<entity>')
+def export(entity):
+    model = EXPORT_MODELS.get(entity)
+    export_format = request.args.get('format', 'ndjson')
+    if model is None or export_format not in ('ndjson', 'csv'):
+        return jsonify(
+            {
+                'success': False,
+                'message': 'Unknown export'
+            }
+        ), 404
+    started_at = datetime.utcnow()
+    try:
+        query = export_query(model, request.args.get('updated_since'))
+    except ValueError:
+        return jsonify(
+            {
+                'success': False,
+                'message': 'Invalid updated_since'
+            }
+        ), 400
+    columns = [column.name for column in model.__table__.columns]
+
+    def body():
+        if export_format == 'csv':
+            yield export_chunk('csv', columns, [columns])
+        for rows in db.session.execute(query).partitions():
+            yield export_chunk(export_format, columns, rows)
+
+    mimetype, headers = export_headers(entity, export_format, started_at)
+    return Response(
+        stream_with_context(body()), mimetype=mimetype, headers=headers)
+
+
+'''
+Resolves the "ids" or "filter" of a batch request body to a list of ids.
+A filter is an equality match on BATCH_FILTERS columns and may match at
+most MAX_BATCH_SIZE rows. Raises ValueError on a bad body.
+'''
+def batch_ids(model, body):
+    ids, conditions = body.get('ids'), body.get('filter')
+    if (ids is None) == (conditions is None):
+        raise ValueError('Pass either ids or filter')
+    if ids is not None:
+        if not isinstance(ids, list) or not 0 < len(ids) <= MAX_BATCH_SIZE:
+            raise ValueError(
+                'ids must be a list of 1 to {} ids'.format(MAX_BATCH_SIZE))
+        try:
+            return list(dict.fromkeys(int(entity_id) for entity_id in ids))
+        except (TypeError, ValueError):
+            raise ValueError('ids must be integers')
+    if not isinstance(conditions, dict) or not conditions:
+        raise ValueError('filter must be an object')
+    table = model.__table__
+    clauses = []
+    for name, value in conditions.items():
+        if name not in BATCH_FILTERS or name not in table.c:
+            raise ValueError('Cannot filter on ' + str(name))
+        clauses.append(table.c[name] == coerce(table.c[name], value))
+    ids = db.session.execute(select(table.c.id).where(and_(*clauses)).order_by(
+        table.c.id).limit(MAX_BATCH_SIZE + 1)).scalars().all()
+    if len(ids) > MAX_BATCH_SIZE:
+        raise ValueError(
+            'filter matches more than {} rows'.format(MAX_BATCH_SIZE))
+    return ids
+
+
+'''
+Runs a set-based UPDATE or DELETE on the given ids and returns the ids it
+touched: through RETURNING where the dialect supports it, otherwise with a
+SELECT of the ids in the same transaction
+'''
+def apply_batch(statement, table, ids):
+    if db.engine.dialect.full_returning:
+        return set(db.session.execute(
+            statement.returning(table.c.id)).scalars())
+    found = set(db.session.execute(
+        select(table.c.id).where(table.c.id.in_(ids))).scalars())
+    db.session.execute(statement)
+    return found
+
+
+'''
+Status of each requested id: status if the batch touched it, else not_found
+'''
+def batch_results(ids, found, status):
+    return [
+        {'id': entity_id, 'status': status if entity_id in found else 'not_found'}
+        for entity_id in ids
+    ]
+
+
+'''
+Deletes many artists or venues with one DELETE. Body: {"ids": [...]} or
+{"filter": {"city": ...}}. Their shows go through ON DELETE CASCADE; the
+show counters of the other side are adjusted first with one UPDATE.
+'''
+@api_bp.route('/<entity>', methods=['DELETE'])
+def batch_delete(entity):
+    if entity not in BATCH_MODELS:
+        return jsonify({'success': False, 'message': 'Unknown entity'}), 404
+    model, key = BATCH_MODELS[entity]
+    table = model.__table__
+    try:
+        ids = batch_ids(model, request.get_json(silent=True) or {})
+    except ValueError as error:
+        return jsonify({'success': False, 'message': str(error)}), 400
+    try:
+        uncount_cascaded_shows(db.session.connection(), key, ids)
+        found = apply_batch(
+            table.delete().where(table.c.id.in_(ids)), table, ids)
+        if found:
+            mark_deleted(db.session.connection(), table.name)
+        db.session.commit()
+    except SQLAlchemyError:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': 'Delete failed'}), 500
+    finally:
+        db.session.close()
+    for entity_id in found:
+        name_index.remove(key[:-3], entity_id)
+        if entity == 'venues':
+            geo_index.remove(entity_id)
+    # Deleted artists' shows were at any number of venues.
+    availability_cache.forget(found if key == 'venue_id' else None)
+    facet_cache.forget(entity)
+    page_cache.invalidate(HOME_PAGE)
+    return jsonify(
+        {
+            'success': True,
+            'deleted': len(found),
+            'results': batch_results(ids, found, 'deleted')
+        }
+    )
+
+
+'''
+Updates many artists or venues with one UPDATE. Body: {"ids": [...]} or
+{"filter": {...}}, plus {"values": {"column": value, ...}}. updated_at is
+set explicitly, and new names and images are copied into the show feed.
+'''
+@api_bp.route('/<entity>', methods=['PATCH'])
+def batch_update(entity):
+    if entity not in BATCH_MODELS:
+        return jsonify({'success': False, 'message': 'Unknown entity'}), 404
+    model, key = BATCH_MODELS[entity]
+    table = model.__table__
+    body = request.get_json(silent=True) or {}
+    try:
+        updates = body.get('values')
+        if not isinstance(updates, dict) or not updates:
+            raise ValueError('values must be an object')
+        values = {}
+        for name, value in updates.items():
+            if name not in table.c or name in BATCH_READ_ONLY:
+                raise ValueError('Cannot update ' + str(name))
+            values[name] = coerce(table.c[name], value)
+        ids = batch_ids(model, body)
+    except (TypeError, ValueError) as error:
+        return jsonify({'success': False, 'message': str(error)}), 400
+    values['updated_at'] = datetime.utcnow()
+    try:
+        found = apply_batch(
+            table.update().where(table.c.id.in_(ids)).values(**values),
+            table, ids)
+        copy_to_feed(db.session.connection(), key, list(found), values)
+        if entity == 'venues' and {'city', 'state'} & set(values) and not {
+                'latitude', 'longitude'} & set(values):
+            locate_venues(list(found))
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': 'Invalid values'}), 400
+    except SQLAlchemyError:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': 'Update failed'}), 500
+    finally:
+        db.session.close()
+    if 'name' in values:
+        for entity_id in found:
+            name_index.add(key[:-3], entity_id, values['name'])
+    facet_cache.forget(entity)
+    if entity == 'venues' and {
+            'city', 'state', 'latitude', 'longitude'} & set(values):
+        refresh_geo_index(list(found))
+    page_cache.invalidate(HOME_PAGE)
+    return jsonify(
+        {
+            'success': True,
+            'updated': len(found),
+            'results': batch_results(ids, found, 'updated')
+        }
+    )
+
+
+'''
+Inserts show rows and returns their ids, in the order of the rows
+'''
+def _insert_shows(rows):
+    table = Show.__table__
+    if db.engine.dialect.full_returning:
+        inserted = db.session.execute(table.insert().values(rows).returning(
+            table.c.id, table.c.venue_id, table.c.start_time))
+        # Rows are matched back by venue and start, unique once booked.
+        ids = {(venue_id, start): show_id for show_id, venue_id, start in inserted}
+        return [ids[(row['venue_id'], row['start_time'])] for row in rows]
+    return [
+        db.session.execute(table.insert(), row).inserted_primary_key[0]
+        for row in rows
+    ]
+
+
+'''
+Inserts show rows each in a savepoint; a double-booked row gets id None
+'''
+def _insert_shows_one_by_one(rows):
+    ids = []
+    for row in rows:
+        try:
+            with db.session.begin_nested():
+                ids.extend(_insert_shows([row]))
+        except IntegrityError as error:
+            if not is_double_booking(error):
+                raise
+            ids.append(None)
+    return ids
+
+
+'''
+Schedules many shows at once. Body: {"shows": [{"artist_id": ...,
+"venue_id": ..., "start_time": ...}, ...]}. Rows are validated and checked
+for double bookings as a batch by importer.validate, then inserted with
+one statement; counters and feed are updated set-based. Returns a created/conflict/invalid status per row.
+'''
+@api_bp.route('/shows', methods=['POST'])
+def schedule_shows():
+    rows = (request.get_json(silent=True) or {}).get('shows')
+    if not isinstance(rows, list) or not 0 < len(rows) <= MAX_BATCH_SIZE:
+        return jsonify({
+            'success': False,
+            'message': 'shows must be a list of 1 to {} shows'.format(
+                MAX_BATCH_SIZE)
+        }), 400
+    results = [None] * len(rows)
+    batch = []
+    for number, raw in enumerate(rows):
+        if isinstance(raw, dict):
+            batch.append((number, raw))
+        else:
+            results[number] = {'status': 'invalid', 'error': 'not an object'}
+    venue_ids = set()
+    try:
+        bookable, rejects = validate('show', batch)
+        for number, raw, error in rejects:
+            results[number] = {
+                'status': 'conflict' if error.startswith(BOOKED) else 'invalid',
+                'error': error
+            }
+        shows = [row for _, _, row in bookable]
+        venue_ids = {row['venue_id'] for row in shows}
+        if shows:
+            try:
+                with db.session.begin_nested():
+                    ids = _insert_shows(shows)
+            except IntegrityError as error:
+                # Lost a race for a slot: find the rows that cannot be booked.
+                if not is_double_booking(error):
+                    raise
+                ids = _insert_shows_one_by_one(shows)
+            created = []
+            for (number, _, row), show_id in zip(bookable, ids):
+                if show_id is None:
+                    results[number] = {'status': 'conflict', 'error': BOOKED}
+                else:
+                    results[number] = {'status': 'created', 'id': show_id}
+                    created.append((row, show_id))
+            connection = db.session.connection()
+            count_shows(connection, [
+                (row['artist_id'], row['venue_id'], row['start_time'])
+                for row, _ in created])
+            add_to_feed(connection, [show_id for _, show_id in created])
+        db.session.commit()
+    except SQLAlchemyError:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': 'Scheduling failed'}), 500
+    finally:
+        db.session.close()
+        booking_index.forget(venue_ids)
+        availability_cache.forget(venue_ids)
+    page_cache.invalidate(HOME_PAGE)
+    return jsonify(
+        {
+            'success': True,
+            'created': sum(result['status'] == 'created' for result in results),
+            'results': results
+        }
+    )
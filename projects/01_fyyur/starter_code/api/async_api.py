@@ -0,0 +1,243 @@
+from datetime import datetime
+from sqlalchemy import select
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+from werkzeug.http import http_date as format_http_date, parse_date, parse_etags, quote_etag
+from api.api import (
+    EXPORT_MODELS, MAX_PAGE_SIZE, count_venues, decode_cursor, encode_cursor,
+    export_chunk, export_headers, export_query)
+from autocomplete import KINDS, name_index
+from cache import page_cache
+from conditional import (
+    compute_etag, http_date, newest, table_modified_at, validators_match)
+from dbpool import pool_stats
+from models import Venue
+
+# Async drivers for the dialects the app runs on.
+ASYNC_DRIVERS = {'postgresql': 'postgresql+asyncpg', 'sqlite': 'sqlite+aiosqlite'}
+
+
+'''
+Async counterpart of SQLALCHEMY_DATABASE_URI, unless ASYNC_DATABASE_URI
+is set
+'''
+def async_database_uri(config):
+    if config.get('ASYNC_DATABASE_URI'):
+        return config['ASYNC_DATABASE_URI']
+    url = make_url(config['SQLALCHEMY_DATABASE_URI'])
+    return url.set(drivername=ASYNC_DRIVERS[url.get_backend_name()])
+
+
+'''
+Async engine options from the same DB_* settings as the sync pool
+'''
+def async_engine_options(config):
+    if config['SQLALCHEMY_DATABASE_URI'].startswith('sqlite'):
+        return {}
+    options = {
+        'pool_size': config.get('DB_POOL_SIZE', 5),
+        'max_overflow': config.get('DB_MAX_OVERFLOW', 10),
+        'pool_timeout': config.get('DB_POOL_TIMEOUT', 30),
+        'pool_recycle': config.get('DB_POOL_RECYCLE', 1800),
+        'pool_pre_ping': config.get('DB_POOL_PRE_PING', True),
+    }
+    timeout = config.get('DB_STATEMENT_TIMEOUT_MS')
+    if timeout:
+        options['connect_args'] = {
+            'server_settings': {'statement_timeout': str(timeout)}}
+    return options
+
+
+'''
+Async engine and session factory shared by the async routes; created on
+startup of the ASGI app
+'''
+class AsyncDatabase:
+
+    def __init__(self):
+        self.engine = None
+        self.session = None
+        self.config = {}
+
+    def start(self, config):
+        self.config = config
+        self.engine = create_async_engine(
+            async_database_uri(config), **async_engine_options(config))
+        self.session = sessionmaker(
+            self.engine, class_=AsyncSession, expire_on_commit=False)
+
+    async def stop(self):
+        if self.engine is not None:
+            await self.engine.dispose()
+
+
+async_db = AsyncDatabase()
+
+
+def _int_arg(request, name, default):
+    try:
+        return int(request.query_params.get(name, default))
+    except ValueError:
+        return default
+
+
+def _error(message, status_code):
+    return JSONResponse(
+        {'success': False, 'message': message}, status_code=status_code)
+
+
+def _validator_headers(etag, last_modified):
+    headers = {'ETag': quote_etag(etag), 'Cache-Control': 'no-cache'}
+    if last_modified is not None:
+        headers['Last-Modified'] = format_http_date(http_date(last_modified))
+    return headers
+
+
+'''
+Answers 304 when the request's validators match, otherwise the JSON body
+built by make_body; the body is only serialized when it is sent
+'''
+def _conditional_json(request, etag, last_modified, make_body):
+    headers = _validator_headers(etag, last_modified)
+    if validators_match(
+            parse_etags(request.headers.get('if-none-match')),
+            parse_date(request.headers.get('if-modified-since')),
+            etag, last_modified):
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(make_body(), headers=headers)
+
+
+'''
+Lists Venues
+'''
+async def get_venues(request):
+    limit = min(max(_int_arg(request, 'limit', 10), 1), MAX_PAGE_SIZE)
+    cursor = request.query_params.get('cursor')
+    query = select(Venue).order_by(Venue.id.desc())
+    if cursor:
+        last_id = decode_cursor(cursor)
+        if last_id is None:
+            return _error('Invalid cursor', 400)
+        query = query.where(Venue.id < last_id)
+    else:
+        page = max(_int_arg(request, 'page', 1), 1)
+        query = query.offset((page - 1) * limit)
+    async with async_db.session() as session:
+        # Fetch one extra row to know whether another page exists.
+        venues = (await session.execute(query.limit(limit + 1))).scalars().all()
+        modified = (await session.execute(table_modified_at(Venue))).one()
+        total = await session.run_sync(
+            count_venues,
+            threshold=async_db.config.get(
+                'VENUE_COUNT_ESTIMATE_THRESHOLD', 100000))
+    has_more = len(venues) > limit
+    venues = venues[:limit]
+    next_cursor = encode_cursor(venues[-1].id) if has_more else None
+    etag = compute_etag(
+        'venues', [(venue.id, venue.updated_at) for venue in venues],
+        next_cursor, total)
+    # Inserts and deletes anywhere shift pages and the total.
+    last_modified = newest(*modified)
+    return _conditional_json(request, etag, last_modified, lambda: {
+        'success': True,
+        'data': [venue.format() for venue in venues],
+        'next_cursor': next_cursor,
+        'total_venues': total
+    })
+
+
+'''
+Get specific venue
+'''
+async def get_venue(request):
+    async with async_db.session() as session:
+        venue = await session.get(Venue, request.path_params['venue_id'])
+    if venue is None:
+        return JSONResponse({'success': False, 'message': 'Venue not found'})
+    etag = compute_etag('venue', venue.id, venue.updated_at)
+    return _conditional_json(request, etag, venue.updated_at, lambda: {
+        'success': True,
+        'data': venue.format()
+    })
+
+
+'''
+Completes artist and venue names from the in-process prefix index
+'''
+async def autocomplete(request):
+    kind = request.query_params.get('type')
+    if kind is not None and kind not in KINDS:
+        return _error('Unknown type', 400)
+    if not name_index.loaded:
+        entries = []
+        async with async_db.session() as session:
+            for name, model in KINDS.items():
+                rows = await session.execute(select(model.id, model.name))
+                entries.extend(
+                    (name, entity_id, entity_name)
+                    for entity_id, entity_name in rows)
+        name_index.load(entries)
+    limit = min(max(_int_arg(request, 'limit', 10), 1), MAX_PAGE_SIZE)
+    return JSONResponse({
+        'success': True,
+        'data': name_index.complete(
+            request.query_params.get('q', ''), kind=kind, limit=limit)
+    })
+
+
+'''
+Page cache hit/miss counters
+'''
+async def cache_stats(request):
+    return JSONResponse({'success': True, 'data': page_cache.stats()})
+
+
+'''
+Async engine pool statistics of the worker serving the request
+'''
+async def get_pool_stats(request):
+    return JSONResponse({
+        'success': True,
+        'data': pool_stats(async_db.engine.sync_engine, async_db.config)
+    })
+
+
+'''
+Streams every artist, venue or show as NDJSON or CSV, one chunk per
+EXPORT_BATCH_SIZE rows of a server-side cursor
+'''
+async def export(request):
+    entity = request.path_params['entity']
+    model = EXPORT_MODELS.get(entity)
+    export_format = request.query_params.get('format', 'ndjson')
+    if model is None or export_format not in ('ndjson', 'csv'):
+        return _error('Unknown export', 404)
+    started_at = datetime.utcnow()
+    try:
+        query = export_query(model, request.query_params.get('updated_since'))
+    except ValueError:
+        return _error('Invalid updated_since', 400)
+    columns = [column.name for column in model.__table__.columns]
+
+    async def body():
+        if export_format == 'csv':
+            yield export_chunk('csv', columns, [columns])
+        async with async_db.session() as session:
+            result = await session.stream(query)
+            async for rows in result.partitions():
+                yield export_chunk(export_format, columns, rows)
+
+    mimetype, headers = export_headers(entity, export_format, started_at)
+    return StreamingResponse(body(), media_type=mimetype, headers=headers)
+
+routes = [
+    Route('/api/venues', get_venues),
+    Route('/api/venues/{venue_id:int}', get_venue),
+    Route('/api/autocomplete', autocomplete),
+    Route('/api/cache', cache_stats),
+    Route('/api/pool', get_pool_stats),
+    Route('/api/export/{entity}', export),
+]
@@ -1,15 +1,27 @@
 # IMPORTS
 
-import dateutil.parser
-import babel
 from flask import (
     Flask,
     jsonify,
     render_template,
     request,
     Response,
+    session,
 )
 from models import setup_db, Venue, Artist, db
+from assets import assets_command, setup_assets
+from autocomplete import setup_autocomplete
+from availability import setup_availability
+from cache import page_cache, setup_page_cache, HOME_PAGE
+from compression import setup_compression
+from counters import counters_command
+from facets import setup_facets
+from feed import feed_command
+from filters import format_datetime
+from geo import geo_command, setup_geo
+from importer import import_command
+from profiler import setup_profiler
+from search import search_command
 from flask_moment import Moment
 from flask_migrate import Migrate
 from flask_cors import CORS
@@ -25,6 +37,10 @@ from artists.artists import artist_bp
 from shows.shows import show_bp
 from api.api import api_bp
 
+# CORS headers of every response; asgi.py sends the same on /api/*.
+CORS_ALLOW_HEADERS = 'Content-Type,Authorization,true'
+CORS_ALLOW_METHODS = 'GET,PUT,POST,PATCH,DELETE,OPTIONS'
+
 
 '''
 Factory function to create the app
@@ -33,39 +49,34 @@ def create_app(test_config=None):
 
     # APP CONFIG
     app = Flask(__name__)
-    setup_db(app)
-    cors = CORS(app, resources={r"/api/*": {"origins": "*"}})
+    setup_db(app, test_config)
+    cors = CORS(app, resources={r"/api/*": {"origins": app.config['CORS_ORIGINS']}})
     moment = Moment(app)
     migrate = Migrate(app, db)
+    setup_autocomplete(app)
+    setup_page_cache(app)
+    setup_availability(app)
+    setup_facets(app)
+    setup_geo(app)
+    setup_profiler(app)
+    setup_assets(app)
+    setup_compression(app)
 
     # CORS SETUP
 
     @app.after_request
     def after_request(response):
-        response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization,true')
-        response.headers.add('Access-Control-Allow-Methods', 'GET,PUT,POST,DELETE,OPTIONS')
+        response.headers.add('Access-Control-Allow-Headers', CORS_ALLOW_HEADERS)
+        response.headers.add('Access-Control-Allow-Methods', CORS_ALLOW_METHODS)
         return response
 
     # FILTERS
 
-
-    def format_datetime(value, format='medium'):
-        if isinstance(value, datetime):
-            value = value.strftime('%Y-%m-%d %H:%M:%S')
-            date = dateutil.parser.parse(value, ignoretz=True)
-        if format == 'full':
-            format = "EEEE MMMM, d, y 'at' h:mma"
-        elif format == 'medium':
-            format = "EE MM, dd, y h:mma"
-        return babel.dates.format_datetime(date, format, locale='en')
-
-
     app.jinja_env.filters['datetime'] = format_datetime
 
     # CONTROLLERS
 
-    @app.route('/')
-    def index():
+    def render_home():
         recent_artists = Artist.query.order_by(Artist.id.desc()).limit(3).all()
         recent_venues = Venue.query.order_by(Venue.id.desc()).limit(3).all()
         return render_template(
@@ -73,6 +84,26 @@ def create_app(test_config=None):
             artists=recent_artists,
             venues=recent_venues)
 
+    @app.route('/')
+    def index():
+        # Pending flash messages are rendered into the page, so skip the cache.
+        if '_flashes' in session:
+            return render_home()
+        page = page_cache.get(HOME_PAGE)
+        if page is None:
+            page = render_home()
+            page_cache.set(HOME_PAGE, page)
+        return page
+
+    # COMMANDS
+
+    app.cli.add_command(import_command)
+    app.cli.add_command(counters_command)
+    app.cli.add_command(feed_command)
+    app.cli.add_command(assets_command)
+    app.cli.add_command(geo_command)
+    app.cli.add_command(search_command)
+
     #  BLUEPRINTS
 
     app.register_blueprint(venue_bp, url_prefix='/venues')
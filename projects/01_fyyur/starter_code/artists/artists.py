@@ -1,7 +1,12 @@
-from flask import Blueprint, jsonify, render_template, request, flash, url_for, redirect
+from flask import Blueprint, jsonify, render_template, request, flash, url_for, redirect, abort, make_response
 from models import Venue, Show, Artist
 from datetime import datetime
 from app import db
+from autocomplete import name_index
+from cache import page_cache, HOME_PAGE
+from conditional import (
+    compute_etag, local_to_utc, newest, not_modified, with_validators)
+from search import search, SEARCH_RESULTS_PER_PAGE
 from forms import ArtistForm
 import sys
 
@@ -25,12 +30,9 @@ Functionality to search for artists
 '''
 @artist_bp.route('/search', methods=['POST'])
 def search_artists():
-    artists = Artist.query.filter(
-        Artist.name.ilike(
-            "%" +
-            request.form.get('search_term') +
-            '%')).all()
-    count_artists = len(artists)
+    search_term = request.form.get('search_term', '')
+    page = max(request.form.get('page', 1, type=int), 1)
+    artists, count_artists = search(Artist, search_term, page)
     response = {
         "count": count_artists,
         "data": artists
@@ -38,9 +40,9 @@ def search_artists():
     return render_template(
         'pages/search_artists.html',
         results=response,
-        search_term=request.form.get(
-            'search_term',
-            ''))
+        search_term=search_term,
+        page=page,
+        has_next=page * SEARCH_RESULTS_PER_PAGE < count_artists)
 
 
 '''
@@ -48,23 +50,44 @@ Artist page
 '''
 @artist_bp.route('/<int:artist_id>')
 def show_artist(artist_id):
+    # One statement: the artist joined to its shows and their venue columns.
+    rows = db.session.query(
+        Artist,
+        Show.start_time,
+        Show.venue_id,
+        Venue.name.label('venue_name'),
+        Venue.image_link.label('venue_image_link'),
+        Show.updated_at.label('show_updated_at'),
+        Venue.updated_at.label('venue_updated_at')).outerjoin(
+        Show, Show.artist_id == Artist.id).outerjoin(
+        Venue, Show.venue_id == Venue.id).filter(
+        Artist.id == artist_id).order_by(Show.start_time).all()
+    if not rows:
+        abort(404)
     date_today = datetime.now()
-    artist = Artist.query.get(artist_id)
-    upcoming_shows = db.session.query(Show).join(Venue).filter(
-        Show.artist_id == artist_id).filter(
-        Show.start_time > date_today).all()
-    upcoming_shows = [
-        show for show in upcoming_shows if len(
-            show.venue.name) > 0]
-    past_shows = db.session.query(Show).join(Venue).filter(
-        Show.artist_id == artist_id).filter(
-        Show.start_time < date_today).all()
-    past_shows = [show for show in past_shows if len(show.venue.name) > 0]
-    return render_template(
+    shows = [row for row in rows if row.start_time is not None]
+    past_shows = [show for show in shows if show.start_time < date_today]
+    upcoming_shows = [show for show in shows if show.start_time >= date_today]
+    # The rows hold everything the page renders; the split moves over time.
+    artist = rows[0].Artist
+    etag = compute_etag(
+        'artist', artist.id, artist.updated_at,
+        [tuple(show)[1:] for show in shows], len(upcoming_shows))
+    # A show leaving the page moves the artist's counters, and so its
+    # updated_at; a show moves into the past at its start time.
+    last_modified = newest(
+        artist.updated_at,
+        *[show.show_updated_at for show in shows],
+        *[show.venue_updated_at for show in shows],
+        *[local_to_utc(show.start_time) for show in past_shows])
+    unchanged = not_modified(etag, last_modified)
+    if unchanged:
+        return unchanged
+    return with_validators(make_response(render_template(
         'pages/show_artist.html',
         artist=artist,
         past_shows=past_shows,
-        upcoming_shows=upcoming_shows)
+        upcoming_shows=upcoming_shows)), etag, last_modified)
 
 '''
 Form to add new artists
@@ -96,6 +119,8 @@ def create_artist_submission():
             seeking_description=form.seeking_description.data)
         db.session.add(artist)
         db.session.commit()
+        name_index.add('artist', artist.id, artist.name)
+        page_cache.invalidate(HOME_PAGE)
         db.session.close()
         flash('Artist ' + request.form['name'] + ' was successfully listed!')
         return redirect(url_for('artist.artists'))
@@ -145,6 +170,8 @@ def update_artist(artist_id):
         artist.seeking_venue = form.seeking_venue.data
         artist.seeking_description = form.seeking_description.data
         db.session.commit()
+        name_index.add('artist', artist_id, form.name.data)
+        page_cache.invalidate(HOME_PAGE)
         db.session.close()
         flash('Artist ' + request.form['name'] + ' was successfully updated!')
         return redirect(url_for('artist.show_artist', artist_id=artist_id))
@@ -165,6 +192,8 @@ def delete_artist(artist_id):
         artist = Artist.query.get(artist_id)
         db.session.delete(artist)
         db.session.commit()
+        name_index.remove('artist', int(artist_id))
+        page_cache.invalidate(HOME_PAGE)
         db.session.close()
         flash('Artist ' + artist.name + ' was successfully deleted!')
     except BaseException:
@@ -0,0 +1,52 @@
+from starlette.applications import Starlette
+from starlette.middleware.cors import CORSMiddleware
+from starlette.middleware.wsgi import WSGIMiddleware
+from starlette.routing import Mount
+from api.async_api import async_db, routes
+from app import CORS_ALLOW_HEADERS, CORS_ALLOW_METHODS, create_app
+
+
+'''
+Applies the CORS policy of the Flask app to /api/* requests: the async
+routes bypass flask_cors and its after_request hook
+'''
+def api_cors(app, config):
+    origins = config['CORS_ORIGINS']
+    cors = CORSMiddleware(
+        app,
+        allow_origins=[origins] if isinstance(origins, str) else origins,
+        allow_methods=CORS_ALLOW_METHODS.split(','),
+        allow_headers=CORS_ALLOW_HEADERS.split(','))
+
+    async def dispatch(scope, receive, send):
+        if scope['type'] == 'http' and scope['path'].startswith('/api/'):
+            await cors(scope, receive, send)
+        else:
+            await app(scope, receive, send)
+
+    return dispatch
+
+
+'''
+ASGI entry point. The read-only /api routes run as coroutines on an async
+engine, so one worker serves many concurrent API reads while they wait on
+the database; every other request, API writes included, goes to the Flask
+app in a thread. Run it with
+    uvicorn --factory asgi:create_asgi_app --workers 4
+
+The async routes share the CORS policy and the conditional GET validators
+of the Flask app, but none of its other hooks: their responses are not
+compressed (put a compressing proxy in front), carry no X-Query-Count or
+Server-Timing profiler headers, and always read from ASYNC_DATABASE_URI
+rather than a read replica.
+'''
+def create_asgi_app(test_config=None):
+    flask_app = create_app(test_config)
+
+    async def dispose_engine():
+        await async_db.stop()
+
+    return api_cors(Starlette(
+        routes=routes + [Mount('', app=WSGIMiddleware(flask_app))],
+        on_startup=[lambda: async_db.start(flask_app.config)],
+        on_shutdown=[dispose_engine]), flask_app.config)
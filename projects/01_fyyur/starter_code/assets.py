@@ -0,0 +1,159 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import posixpath
+import re
+import shutil
+import click
+from flask import current_app, request, send_from_directory
+from flask.cli import with_appcontext
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Build output, inside static/ so it is served by the static route.
+DIST = 'dist'
+MANIFEST = 'manifest.json'
+
+# Types worth precompressing; images and woff fonts are compressed already.
+COMPRESSIBLE = ('.css', '.js', '.map', '.svg', '.ttf', '.otf', '.eot', '.ico')
+
+# Precompressed variants, in order of preference.
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+CSS_URL = re.compile(r'''url\(\s*(['"]?)([^'")?#]+)([^'")]*)\1\s*\)''')
+
+
+def _fingerprint(path, data):
+    stem, extension = posixpath.splitext(path)
+    return '{}.{}{}'.format(
+        stem, hashlib.sha256(data).hexdigest()[:12], extension)
+
+
+'''
+Points url() references of a stylesheet at the fingerprinted files
+'''
+def _rewrite_css(path, data, manifest):
+    directory = posixpath.dirname(path)
+
+    def replace(match):
+        quote, target, suffix = match.groups()
+        resolved = posixpath.normpath(posixpath.join(directory, target))
+        if resolved not in manifest:
+            return match.group(0)
+        relative = posixpath.relpath(manifest[resolved], directory)
+        return 'url({0}{1}{2}{0})'.format(quote, relative, suffix)
+
+    return CSS_URL.sub(replace, data.decode('utf-8')).encode('utf-8')
+
+
+def _write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as target:
+        target.write(data)
+
+
+'''
+Writes a fingerprinted copy of every static file to static/dist, with
+.gz and .br siblings for compressible types, and a manifest mapping the
+original names to the copies. Stylesheets go last so the files they
+reference already have their fingerprinted names.
+Returns the manifest.
+'''
+def build_assets(static_folder):
+    output = os.path.join(static_folder, DIST)
+    shutil.rmtree(output, ignore_errors=True)
+    sources = []
+    for root, directories, files in os.walk(static_folder):
+        directories[:] = [name for name in directories if name != DIST]
+        for name in files:
+            if not name.startswith('.'):
+                sources.append(os.path.relpath(
+                    os.path.join(root, name), static_folder).replace(os.sep, '/'))
+    sources.sort(key=lambda path: (path.endswith('.css'), path))
+    manifest = {}
+    for path in sources:
+        with open(os.path.join(static_folder, path), 'rb') as source:
+            data = source.read()
+        if path.endswith('.css'):
+            data = _rewrite_css(path, data, manifest)
+        built = _fingerprint(path, data)
+        manifest[path] = built
+        target = os.path.join(output, built)
+        _write(target, data)
+        if not path.endswith(COMPRESSIBLE):
+            continue
+        compressed = [('.gz', gzip.compress(data, 9, mtime=0))]
+        if brotli is not None:
+            compressed.append(('.br', brotli.compress(data, quality=11)))
+        for suffix, payload in compressed:
+            if len(payload) < len(data):
+                _write(target + suffix, payload)
+    _write(os.path.join(output, MANIFEST), json.dumps(
+        manifest, indent=2, sort_keys=True).encode('utf-8'))
+    return manifest
+
+
+'''
+Serves static files. Fingerprinted files from static/dist never change, so
+they get a far-future immutable Cache-Control, and the precompressed
+variant the client accepts is sent when one exists.
+'''
+def serve_static(filename):
+    app = current_app
+    if not filename.startswith(DIST + '/'):
+        return app.send_static_file(filename)
+    for encoding, suffix in ENCODINGS:
+        if request.accept_encodings[encoding] and os.path.isfile(
+                os.path.join(app.static_folder, filename + suffix)):
+            break
+    else:
+        encoding, suffix = None, ''
+    response = send_from_directory(
+        app.static_folder, filename + suffix,
+        mimetype=mimetypes.guess_type(filename)[0],
+        max_age=app.config.get('ASSETS_MAX_AGE', 31536000))
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+
+'''
+Makes url_for('static', filename=...) point at the fingerprinted copy when
+`flask assets build` has been run, and serves those copies
+'''
+def setup_assets(app):
+    manifest_path = os.path.join(app.static_folder, DIST, MANIFEST)
+    manifest = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path, encoding='utf-8') as source:
+            manifest = json.load(source)
+    app.view_functions['static'] = serve_static
+
+    @app.url_defaults
+    def fingerprinted_static(endpoint, values):
+        if endpoint == 'static' and values.get('filename') in manifest:
+            values['filename'] = DIST + '/' + manifest[values['filename']]
+
+
+'''
+Static asset build commands
+'''
+@click.group('assets')
+def assets_command():
+    pass
+
+
+@assets_command.command('build')
+@with_appcontext
+def build_command():
+    manifest = build_assets(current_app.static_folder)
+    click.echo('Built {} assets into {}'.format(
+        len(manifest), os.path.join(current_app.static_folder, DIST)))
@@ -0,0 +1,119 @@
+from bisect import bisect_left, insort
+from threading import Lock
+from sqlalchemy.exc import SQLAlchemyError
+from models import Artist, Venue, db
+
+KINDS = {'artist': Artist, 'venue': Venue}
+
+
+'''
+In-process prefix index over artist and venue names.
+Every word of a name is a sorted key, so "hop" completes "The Musical Hop".
+Lookups are a bisect into the sorted keys and never touch the database.
+The index lives in the process and follows the writes this worker makes:
+names written by other workers or `flask import` appear only after the
+worker restarts.
+'''
+class PrefixIndex:
+
+    def __init__(self):
+        self._lock = Lock()
+        self._keys = {kind: [] for kind in KINDS}
+        self._names = {}
+        self.loaded = False
+
+    @staticmethod
+    def _words(name):
+        words = (name or '').casefold().split()
+        return [' '.join(words[i:]) for i in range(len(words))]
+
+    def load(self, entries):
+        keys = {kind: [] for kind in KINDS}
+        names = {}
+        for kind, entity_id, name in entries:
+            names[(kind, entity_id)] = name
+            keys[kind].extend(
+                (word, entity_id) for word in self._words(name))
+        for kind_keys in keys.values():
+            kind_keys.sort()
+        with self._lock:
+            self._keys = keys
+            self._names = names
+            self.loaded = True
+
+    def add(self, kind, entity_id, name):
+        with self._lock:
+            self._discard(kind, entity_id)
+            self._names[(kind, entity_id)] = name
+            for word in self._words(name):
+                insort(self._keys[kind], (word, entity_id))
+
+    def remove(self, kind, entity_id):
+        with self._lock:
+            self._discard(kind, entity_id)
+
+    def _discard(self, kind, entity_id):
+        name = self._names.pop((kind, entity_id), None)
+        if name is None:
+            return
+        kind_keys = self._keys[kind]
+        for word in self._words(name):
+            i = bisect_left(kind_keys, (word, entity_id))
+            if i < len(kind_keys) and kind_keys[i] == (word, entity_id):
+                del kind_keys[i]
+
+    def complete(self, prefix, kind=None, limit=10):
+        prefix = ' '.join(prefix.casefold().split())
+        if not prefix:
+            return []
+        kinds = [kind] if kind else list(KINDS)
+        matches = []
+        with self._lock:
+            for kind in kinds:
+                kind_keys = self._keys[kind]
+                seen = set()
+                i = bisect_left(kind_keys, (prefix,))
+                while i < len(kind_keys) and len(seen) < limit:
+                    word, entity_id = kind_keys[i]
+                    if not word.startswith(prefix):
+                        break
+                    if entity_id not in seen:
+                        seen.add(entity_id)
+                        name = self._names[(kind, entity_id)]
+                        matches.append((name.casefold(), kind, entity_id, name))
+                    i += 1
+        matches.sort()
+        return [
+            {'id': entity_id, 'name': name, 'type': kind}
+            for _, kind, entity_id, name in matches[:limit]
+        ]
+
+
+name_index = PrefixIndex()
+
+
+'''
+Loads every artist and venue name into the index
+'''
+def load_name_index():
+    entries = []
+    for kind, model in KINDS.items():
+        entries.extend(
+            (kind, entity_id, name)
+            for entity_id, name in db.session.query(model.id, model.name))
+    name_index.load(entries)
+
+
+'''
+Fills the name index when the app is created. A database that is not
+ready yet (e.g. before migrations) is tolerated; the index then loads on
+the first autocomplete request instead.
+'''
+def setup_autocomplete(app):
+    with app.app_context():
+        try:
+            load_name_index()
+        except SQLAlchemyError:
+            app.logger.warning('Autocomplete index not loaded at startup')
+        finally:
+            db.session.remove()
@@ -0,0 +1,186 @@
+from itertools import groupby
+import json
+from sqlalchemy import and_, event, inspect, select
+from sqlalchemy.orm import Session, object_session
+from booking import SHOW_DURATION
+from cache import PageCache
+from models import Artist, Show, Venue, db
+
+show_table = Show.__table__
+venue_table = Venue.__table__
+
+
+'''
+Cache of free windows, one entry per venue and requested range.
+Keys carry a per-venue generation that committed show writes bump, so a
+venue's entries are invalidated without scanning the cache, and a result
+computed while the venue changed is stored under a key nobody looks up
+anymore. Generations live in the process: writes made elsewhere (other
+workers, `flask import`) reach its entries only when they expire.
+'''
+class AvailabilityCache(PageCache):
+
+    def __init__(self, ttl=300, max_entries=4096, max_bytes=4 * 1024 * 1024):
+        self._generations = {}
+        self._epoch = 0
+        super().__init__(ttl, max_entries, max_bytes)
+
+    def key(self, venue_id, *parts):
+        with self._lock:
+            return (self._epoch, venue_id,
+                    self._generations.get(venue_id, 0)) + parts
+
+    '''
+    Invalidates the given venues, or every venue when called without ids
+    '''
+    def forget(self, venue_ids=None):
+        if venue_ids is None:
+            with self._lock:
+                self._epoch += 1
+                self._generations.clear()
+            self.invalidate()
+            return
+        with self._lock:
+            for venue_id in venue_ids:
+                self._generations[venue_id] = (
+                    self._generations.get(venue_id, 0) + 1)
+
+
+availability_cache = AvailabilityCache()
+
+
+def _record(target, venue_ids):
+    object_session(target).info.setdefault(
+        'availability_changes', set()).update(venue_ids)
+
+
+@event.listens_for(Show, 'after_insert')
+@event.listens_for(Show, 'after_delete')
+def _show_written(mapper, connection, show):
+    _record(show, [show.venue_id])
+
+
+@event.listens_for(Show, 'after_update')
+def _show_moved(mapper, connection, show):
+    history = inspect(show).attrs.venue_id.history
+    _record(show, [show.venue_id, *history.deleted])
+
+
+@event.listens_for(Venue, 'after_insert')
+@event.listens_for(Venue, 'before_delete')
+def _venue_written(mapper, connection, venue):
+    _record(venue, [venue.id])
+
+
+# Deleting an artist cascades to shows at venues the session never loaded;
+# None stands for every venue.
+@event.listens_for(Artist, 'before_delete')
+def _artist_deleted(mapper, connection, artist):
+    _record(artist, [None])
+
+
+# Generations are bumped once the writes are visible to other sessions; a
+# reader between flush and commit would otherwise cache the old rows under
+# the new generation.
+@event.listens_for(Session, 'after_commit')
+def _apply_changes(session):
+    venue_ids = session.info.pop('availability_changes', set())
+    if None in venue_ids:
+        availability_cache.forget()
+    elif venue_ids:
+        availability_cache.forget(venue_ids)
+
+
+# Changes of a transaction that ended without committing are dropped.
+@event.listens_for(Session, 'after_transaction_end')
+def _drop_changes(session, transaction):
+    if transaction.parent is None:
+        session.info.pop('availability_changes', None)
+
+
+'''
+Free windows within [start, end) of a venue whose shows start at the
+sorted start_times. A single sweep: each show's SHOW_DURATION interval is
+merged into the busy run, and the gaps of at least min_length between
+runs are the free windows.
+'''
+def free_windows(start_times, start, end, min_length):
+    windows = []
+    free_from = start
+    for show_start in start_times:
+        if free_from >= end:
+            break
+        free_until = min(show_start, end)
+        if free_until > free_from and free_until - free_from >= min_length:
+            windows.append((free_from, free_until))
+        free_from = max(free_from, show_start + SHOW_DURATION)
+    if end > free_from and end - free_from >= min_length:
+        windows.append((free_from, end))
+    return windows
+
+
+'''
+Computes the free windows of venues with one statement: the venues' primary
+key lookups joined to a range scan of ix_show_venue_id_start_time each.
+Returns {venue_id: windows} for the venues that exist.
+'''
+def load_windows(venue_ids, start, end, min_length):
+    rows = db.session.execute(select(
+        venue_table.c.id, show_table.c.start_time).select_from(
+        venue_table.outerjoin(show_table, and_(
+            show_table.c.venue_id == venue_table.c.id,
+            show_table.c.start_time > start - SHOW_DURATION,
+            show_table.c.start_time < end))).where(
+        venue_table.c.id.in_(venue_ids)).order_by(
+        venue_table.c.id, show_table.c.start_time))
+    return {
+        venue_id: free_windows(
+            [start_time for _, start_time in shows if start_time is not None],
+            start, end, min_length)
+        for venue_id, shows in groupby(rows, key=lambda row: row[0])
+    }
+
+
+'''
+Returns ({venue_id: [{"start": ..., "end": ...}, ...]}, unknown venue ids)
+for the free windows of at least min_length between start and end. Cached venues are
+answered from the cache; the others are loaded together.
+'''
+def venue_availability(venue_ids, start, end, min_length):
+    keys = {
+        venue_id: availability_cache.key(venue_id, start, end, min_length)
+        for venue_id in venue_ids
+    }
+    found, missing = {}, []
+    for venue_id, key in keys.items():
+        cached = availability_cache.get(key)
+        if cached is None:
+            missing.append(venue_id)
+        else:
+            found[venue_id] = json.loads(cached)
+    if missing:
+        loaded = load_windows(missing, start, end, min_length)
+        for venue_id in missing:
+            windows = loaded.get(venue_id)
+            if windows is not None:
+                windows = [
+                    {'start': window_start.isoformat(),
+                     'end': window_end.isoformat()}
+                    for window_start, window_end in windows]
+            availability_cache.set(keys[venue_id], json.dumps(windows))
+            found[venue_id] = windows
+    unknown = [venue_id for venue_id in venue_ids if found[venue_id] is None]
+    return {
+        venue_id: windows for venue_id, windows in found.items()
+        if windows is not None
+    }, unknown
+
+
+'''
+Applies the availability cache settings from the app config
+'''
+def setup_availability(app):
+    availability_cache.configure(
+        app.config.get('AVAILABILITY_CACHE_TTL', 300),
+        app.config.get('AVAILABILITY_CACHE_MAX_ENTRIES', 4096),
+        app.config.get('AVAILABILITY_CACHE_MAX_BYTES', 4 * 1024 * 1024))
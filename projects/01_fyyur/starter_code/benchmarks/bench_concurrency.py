@@ -0,0 +1,174 @@
+'''
+Concurrency benchmark: serves the app once through the threaded WSGI server
+and once through the ASGI entry point (async /api routes), then drives the
+read-only API with 1, 50 and 500 concurrent clients and reports throughput
+and latency per level.
+
+Run from the starter_code directory against seeded data, e.g.
+    python -m benchmarks.bench_routes --seed --requests 1
+    python -m benchmarks.bench_concurrency --duration 10
+    python -m benchmarks.bench_concurrency --database-uri postgresql://...
+
+The load generator is a single asyncio process opening one connection per
+request; on small machines it can saturate before the servers do, so
+compare the two servers at each level rather than absolute numbers.
+'''
+import argparse
+import asyncio
+import json
+import logging
+import random
+import socket
+import subprocess
+import sys
+import time
+import warnings
+from benchmarks import datagen
+from benchmarks.bench_routes import DEFAULT_SQLITE, percentile
+
+SERVERS = ('sync', 'async')
+
+
+def _config(database_uri):
+    return {
+        'SQLALCHEMY_DATABASE_URI': database_uri,
+        'SQL_PROFILER_ENABLED': False,
+    }
+
+
+'''
+Runs one server in the foreground; used by the benchmark's child processes
+'''
+def serve(server, database_uri, port):
+    warnings.simplefilter('ignore', DeprecationWarning)
+    if server == 'sync':
+        from werkzeug.serving import run_simple
+        from app import create_app
+        app = create_app(_config(database_uri))
+        app.logger.disabled = True
+        logging.getLogger('werkzeug').setLevel(logging.WARNING)
+        run_simple('127.0.0.1', port, app, threaded=True)
+    else:
+        import uvicorn
+        from asgi import create_asgi_app
+        uvicorn.run(
+            create_asgi_app(_config(database_uri)),
+            host='127.0.0.1', port=port, log_level='warning')
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _wait_for_port(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), 1).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise SystemExit('server on port {} did not start'.format(port))
+
+
+def _paths(rng, venues):
+    return rng.choice((
+        '/api/venues?limit=10',
+        '/api/venues/{}'.format(rng.randint(1, venues)),
+        '/api/autocomplete?q=' + rng.choice(datagen.WORDS)[:3],
+    ))
+
+
+async def _get(port, path):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    try:
+        writer.write((
+            'GET {} HTTP/1.1\r\nHost: 127.0.0.1\r\nConnection: close\r\n\r\n'
+        ).format(path).encode('ascii'))
+        await writer.drain()
+        response = await reader.read()
+    finally:
+        writer.close()
+    return int(response.split(b' ', 2)[1])
+
+
+async def _client(port, deadline, rng, venues, timings, errors):
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        try:
+            status = await _get(port, _paths(rng, venues))
+        except (OSError, ValueError, IndexError):
+            status = None
+        if status is None or status >= 500:
+            errors.append(status)
+        else:
+            timings.append((time.perf_counter() - start) * 1000)
+
+
+'''
+Runs `clients` concurrent clients for `duration` seconds
+'''
+async def run_level(port, clients, duration, venues, seed=0):
+    timings, errors = [], []
+    deadline = time.perf_counter() + duration
+    await asyncio.gather(*(
+        _client(port, deadline, random.Random(seed + number), venues,
+                timings, errors)
+        for number in range(clients)))
+    return {
+        'clients': clients,
+        'requests': len(timings),
+        'errors': len(errors),
+        'rps': round(len(timings) / duration, 1),
+        'p50_ms': round(percentile(timings, 0.50), 3) if timings else None,
+        'p99_ms': round(percentile(timings, 0.99), 3) if timings else None,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--database-uri', default=DEFAULT_SQLITE)
+    parser.add_argument('--servers', default=','.join(SERVERS))
+    parser.add_argument('--clients', default='1,50,500')
+    parser.add_argument('--duration', type=float, default=5.0,
+                        help='Seconds per concurrency level.')
+    parser.add_argument('--venues', type=int, default=datagen.SCALES['1k']['venues'],
+                        help='Venue ids to pick from (the seeded count).')
+    parser.add_argument('--save', help='Write results to this JSON file.')
+    parser.add_argument('--serve', choices=SERVERS, help=argparse.SUPPRESS)
+    parser.add_argument('--port', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    if args.serve:
+        serve(args.serve, args.database_uri, args.port)
+        return 0
+
+    results = {}
+    for server in args.servers.split(','):
+        port = _free_port()
+        process = subprocess.Popen([
+            sys.executable, '-m', 'benchmarks.bench_concurrency',
+            '--serve', server, '--port', str(port),
+            '--database-uri', args.database_uri])
+        try:
+            _wait_for_port(port)
+            results[server] = []
+            for clients in (int(value) for value in args.clients.split(',')):
+                level = asyncio.run(run_level(
+                    port, clients, args.duration, args.venues))
+                results[server].append(level)
+                print('{:6} clients {clients:4}  {rps:9.1f} req/s  '
+                      'p50 {p50_ms} ms  p99 {p99_ms} ms  errors {errors}'.format(
+                          server, **level))
+        finally:
+            process.terminate()
+            process.wait()
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
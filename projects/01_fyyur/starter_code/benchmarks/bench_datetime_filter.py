@@ -0,0 +1,47 @@
+'''
+Micro-benchmark of the `datetime` Jinja filter on a 10k-show page.
+Compares the previous string round-trip implementation with filters.py.
+
+Run from the starter_code directory:
+    python -m benchmarks.bench_datetime_filter
+'''
+from datetime import datetime, timedelta
+import timeit
+import babel.dates
+import dateutil.parser
+from filters import format_datetime
+
+SHOWS = 10000
+REPEAT = 5
+
+
+'''
+The filter as it was registered in create_app before filters.py
+'''
+def legacy_format_datetime(value, format='medium'):
+    if isinstance(value, datetime):
+        value = value.strftime('%Y-%m-%d %H:%M:%S')
+        date = dateutil.parser.parse(value, ignoretz=True)
+    if format == 'full':
+        format = "EEEE MMMM, d, y 'at' h:mma"
+    elif format == 'medium':
+        format = "EE MM, dd, y h:mma"
+    return babel.dates.format_datetime(date, format, locale='en')
+
+
+def run():
+    start = datetime(2026, 1, 1, 20, 0)
+    values = [start + timedelta(hours=i) for i in range(SHOWS)]
+    for value in values[:100]:
+        assert format_datetime(value, 'full') == legacy_format_datetime(value, 'full')
+    for name, formatter in (('legacy', legacy_format_datetime),
+                            ('filters', format_datetime)):
+        best = min(timeit.repeat(
+            lambda: [formatter(value, 'full') for value in values],
+            number=1, repeat=REPEAT))
+        print('{:8} {:8.1f} ms/page {:6.2f} us/call'.format(
+            name, best * 1000, best * 1e6 / SHOWS))
+
+
+if __name__ == '__main__':
+    run()
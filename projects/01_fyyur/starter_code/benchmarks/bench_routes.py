@@ -0,0 +1,214 @@
+'''
+Route-level benchmark: seeds synthetic data, drives every route through
+the Flask test client and records latency percentiles and statement counts.
+
+Run from the starter_code directory, SQLite by default:
+    python -m benchmarks.bench_routes --scale 1k --seed --save results.json
+    python -m benchmarks.bench_routes --scale 1k --baseline results.json
+Postgres (migrated with `flask db upgrade` first):
+    python -m benchmarks.bench_routes --database-uri postgresql://... --scale 100k --seed
+
+With --baseline the run exits non-zero when a route's p95 latency grows by
+more than --tolerance (and --min-delta-ms), or it issues more statements
+than the baseline.
+'''
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import warnings
+from urllib.parse import urlencode
+from app import create_app
+from benchmarks import datagen
+from autocomplete import load_name_index
+from geo import load_geo_index
+
+DEFAULT_SQLITE = 'sqlite:///' + os.path.join(
+    tempfile.gettempdir(), 'fyyur_bench.db')
+
+
+def _artist_form(rng, number):
+    return {
+        'name': 'Bench Artist {}'.format(number),
+        'city': 'Austin',
+        'state': 'TX',
+        'phone': '5550000000',
+        'genres': rng.choice(datagen.GENRES),
+        'facebook_link': 'https://facebook.com/bench',
+    }
+
+
+def _venue_form(rng, number):
+    form = _artist_form(rng, number)
+    form['name'] = 'Bench Venue {}'.format(number)
+    form['address'] = '1 Bench St'
+    return form
+
+
+'''
+(name, method, path, form data) builders, one per benchmarked route
+'''
+def routes(sizes):
+    artists, venues = sizes['artists'], sizes['venues']
+    return [
+        ('index', lambda rng, n: ('GET', '/', None)),
+        ('venues', lambda rng, n: ('GET', '/venues/', None)),
+        ('shows', lambda rng, n: ('GET', '/shows/', None)),
+        ('show_venue', lambda rng, n: (
+            'GET', '/venues/{}'.format(rng.randint(1, venues)), None)),
+        ('show_artist', lambda rng, n: (
+            'GET', '/artists/{}'.format(rng.randint(1, artists)), None)),
+        ('search_venues', lambda rng, n: (
+            'POST', '/venues/search',
+            {'search_term': rng.choice(datagen.WORDS)})),
+        ('search_artists', lambda rng, n: (
+            'POST', '/artists/search',
+            {'search_term': rng.choice(datagen.WORDS)[:3]})),
+        ('api_venues', lambda rng, n: ('GET', '/api/venues', None)),
+        ('api_autocomplete', lambda rng, n: (
+            'GET', '/api/autocomplete?q=' + rng.choice(datagen.WORDS)[:2],
+            None)),
+        ('api_nearby', lambda rng, n: (
+            'GET', '/api/venues/nearby?' + urlencode(dict(zip(
+                ('city', 'state'), rng.choice(datagen.PLACES)))), None)),
+        ('create_artist', lambda rng, n: (
+            'POST', '/artists/create', _artist_form(rng, n))),
+        ('edit_artist', lambda rng, n: (
+            'POST', '/artists/{}/edit'.format(rng.randint(1, artists)),
+            _artist_form(rng, n))),
+        ('create_venue', lambda rng, n: (
+            'POST', '/venues/create', _venue_form(rng, n))),
+        ('edit_venue', lambda rng, n: (
+            'POST', '/venues/{}/edit'.format(rng.randint(1, venues)),
+            _venue_form(rng, n))),
+    ]
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    index = max(int(round(fraction * len(ordered))) - 1, 0)
+    return ordered[index]
+
+
+'''
+Runs each route `requests` times after `warmup` requests
+'''
+def run_routes(app, sizes, requests, warmup, seed):
+    rng = random.Random(seed)
+    client = app.test_client()
+    results = {}
+    for name, build in routes(sizes):
+        timings, statements = [], []
+        for number in range(warmup + requests):
+            method, path, data = build(rng, number)
+            start = time.perf_counter()
+            response = client.open(path, method=method, data=data)
+            elapsed = time.perf_counter() - start
+            if response.status_code >= 400:
+                raise SystemExit('{} {} returned {}'.format(
+                    method, path, response.status_code))
+            if number >= warmup:
+                timings.append(elapsed * 1000)
+                statements.append(int(response.headers.get('X-Query-Count', 0)))
+        results[name] = {
+            'requests': requests,
+            'p50_ms': round(percentile(timings, 0.50), 3),
+            'p95_ms': round(percentile(timings, 0.95), 3),
+            'p99_ms': round(percentile(timings, 0.99), 3),
+            'max_statements': max(statements),
+        }
+        print('{:18} p50 {p50_ms:9.3f} ms  p95 {p95_ms:9.3f} ms  '
+              'p99 {p99_ms:9.3f} ms  statements {max_statements}'.format(
+                  name, **results[name]))
+    return results
+
+
+'''
+Lists regressions of `current` against `baseline`
+'''
+def compare(current, baseline, tolerance, min_delta_ms):
+    regressions = []
+    for name, before in baseline['routes'].items():
+        after = current['routes'].get(name)
+        if after is None:
+            continue
+        if (after['p95_ms'] > before['p95_ms'] * (1 + tolerance)
+                and after['p95_ms'] - before['p95_ms'] > min_delta_ms):
+            regressions.append('{}: p95 {} ms -> {} ms'.format(
+                name, before['p95_ms'], after['p95_ms']))
+        if after['max_statements'] > before['max_statements']:
+            regressions.append('{}: statements {} -> {}'.format(
+                name, before['max_statements'], after['max_statements']))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--database-uri', default=DEFAULT_SQLITE)
+    parser.add_argument('--scale', choices=sorted(datagen.SCALES), default='1k')
+    parser.add_argument('--artists', type=int)
+    parser.add_argument('--venues', type=int)
+    parser.add_argument('--shows', type=int)
+    parser.add_argument('--seed', action='store_true',
+                        help='(Re)load synthetic data before running.')
+    parser.add_argument('--requests', type=int, default=50)
+    parser.add_argument('--warmup', type=int, default=5)
+    parser.add_argument('--save', help='Write results to this JSON file.')
+    parser.add_argument('--baseline', help='Compare against this JSON file.')
+    parser.add_argument('--tolerance', type=float, default=0.25)
+    parser.add_argument('--min-delta-ms', type=float, default=2.0,
+                        help='Ignore p95 changes smaller than this.')
+    args = parser.parse_args(argv)
+    # The form handlers warn about flask_wtf.Form on every request.
+    warnings.simplefilter('ignore', DeprecationWarning)
+
+    sizes = dict(datagen.SCALES[args.scale])
+    for key in sizes:
+        if getattr(args, key) is not None:
+            sizes[key] = getattr(args, key)
+
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': args.database_uri,
+        'WTF_CSRF_ENABLED': False,
+        'SQL_PROFILER_ENABLED': True,
+        'SQL_PROFILER_STRICT': False,
+    })
+    app.logger.disabled = True
+    if args.seed:
+        with app.app_context():
+            start = time.perf_counter()
+            datagen.seed(**sizes)
+            load_name_index()
+            load_geo_index()
+            print('seeded {} in {:.1f} s'.format(
+                sizes, time.perf_counter() - start))
+
+    results = {
+        'meta': {
+            'database': args.database_uri.split(':', 1)[0],
+            'sizes': sizes,
+            'python': platform.python_version(),
+            'requests': args.requests,
+        },
+        'routes': run_routes(app, sizes, args.requests, args.warmup, 0),
+    }
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(
+                results, json.load(f), args.tolerance, args.min_delta_ms)
+        for regression in regressions:
+            print('REGRESSION ' + regression)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,149 @@
+'''
+Synthetic artists, venues and shows for the benchmarks.
+Rows are generated deterministically from a seed and inserted in batches
+through Core executemany, so a 1M-row profile loads in minutes.
+'''
+from datetime import datetime, timedelta
+import random
+from sqlalchemy import text
+from booking import SHOW_DURATION
+from counters import repair_counters
+from feed import refresh_feed
+from geo import locate
+from importer import sync_sequence
+from models import Artist, Show, Venue, db
+from search import SEARCH_MODELS, build_sqlite_index, drop_sqlite_index
+
+SCALES = {
+    '1k': {'artists': 1000, 'venues': 1000, 'shows': 1000},
+    '100k': {'artists': 100000, 'venues': 100000, 'shows': 100000},
+    '1m': {'artists': 1000000, 'venues': 1000000, 'shows': 1000000},
+}
+
+BATCH_SIZE = 10000
+
+WORDS = (
+    'blue', 'velvet', 'electric', 'moon', 'river', 'golden', 'echo', 'neon',
+    'wild', 'silver', 'hollow', 'midnight', 'crystal', 'lucky', 'iron',
+    'paper', 'royal', 'static', 'honey', 'thunder', 'copper', 'garden',
+)
+PLACES = (
+    ('San Francisco', 'CA'), ('New York', 'NY'), ('Austin', 'TX'),
+    ('Chicago', 'IL'), ('Seattle', 'WA'), ('Nashville', 'TN'),
+    ('New Orleans', 'LA'), ('Denver', 'CO'), ('Boston', 'MA'),
+    ('Atlanta', 'GA'), ('Portland', 'OR'), ('Miami', 'FL'),
+)
+GENRES = (
+    'Alternative', 'Blues', 'Classical', 'Country', 'Electronic', 'Folk',
+    'Funk', 'Hip-Hop', 'Heavy Metal', 'Instrumental', 'Jazz',
+    'Musical Theatre', 'Pop', 'Punk', 'R&B', 'Reggae', 'Rock n Roll', 'Soul',
+)
+
+
+def _name(rng, suffix):
+    return '{} {} {}'.format(
+        rng.choice(WORDS).title(), rng.choice(WORDS).title(), suffix)
+
+
+def _artist(rng, number):
+    city, state = rng.choice(PLACES)
+    return {
+        'id': number,
+        'name': _name(rng, 'Band {}'.format(number)),
+        'city': city,
+        'state': state,
+        'phone': '555{:07d}'.format(number % 10000000),
+        'genres': rng.sample(GENRES, 2),
+        'image_link': 'https://example.com/artists/{}.jpg'.format(number),
+        'facebook_link': 'https://facebook.com/artist{}'.format(number),
+        'seeking_venue': rng.random() < 0.3,
+    }
+
+
+def _venue(rng, number):
+    city, state = rng.choice(PLACES)
+    # Spread around the city centroid so the geo index has some work.
+    latitude, longitude = locate(city, state)
+    return {
+        'id': number,
+        'name': _name(rng, 'Hall {}'.format(number)),
+        'city': city,
+        'state': state,
+        'address': '{} {} St'.format(number, rng.choice(WORDS).title()),
+        'phone': '555{:07d}'.format(number % 10000000),
+        'genres': rng.sample(GENRES, 3),
+        'image_link': 'https://example.com/venues/{}.jpg'.format(number),
+        'facebook_link': 'https://facebook.com/venue{}'.format(number),
+        'seeking_talent': rng.random() < 0.3,
+        'latitude': latitude + rng.uniform(-0.2, 0.2),
+        'longitude': longitude + rng.uniform(-0.2, 0.2),
+    }
+
+
+# Shows start on slots SHOW_DURATION apart, one per venue and slot, so the
+# data passes the venue exclusion constraint.
+SLOTS = 365 * timedelta(days=1) // SHOW_DURATION
+
+
+def _show(rng, number, artists, venues, now, booked):
+    while True:
+        venue_id, slot = rng.randint(1, venues), rng.randint(-SLOTS, SLOTS)
+        if (venue_id, slot) not in booked:
+            booked.add((venue_id, slot))
+            break
+    return {
+        'id': number,
+        'artist_id': rng.randint(1, artists),
+        'venue_id': venue_id,
+        'start_time': now + slot * SHOW_DURATION,
+    }
+
+
+def _insert(model, rows):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == BATCH_SIZE:
+            db.session.execute(model.__table__.insert(), batch)
+            db.session.commit()
+            batch = []
+    if batch:
+        db.session.execute(model.__table__.insert(), batch)
+        db.session.commit()
+
+
+'''
+Empties the tables and fills them. Must run inside an app context.
+Postgres keeps the migrated schema (search function, indexes), so run
+`flask db upgrade` against it first; other databases are recreated, with
+the SQLite search tables built after the rows are loaded.
+'''
+def seed(artists, venues, shows, seed=0):
+    rng = random.Random(seed)
+    now = datetime.now().replace(minute=0, second=0, microsecond=0)
+    if db.engine.dialect.name == 'postgresql':
+        db.session.execute(text(
+            'TRUNCATE show_feed, show, venue, artist, show_counter_watermark '
+            'RESTART IDENTITY CASCADE'))
+        db.session.commit()
+    else:
+        # The SQLite FTS5 search tables are not part of the metadata.
+        for model in SEARCH_MODELS:
+            drop_sqlite_index(model)
+        db.session.commit()
+        db.drop_all()
+        db.create_all()
+    _insert(Artist, (_artist(rng, n) for n in range(1, artists + 1)))
+    _insert(Venue, (_venue(rng, n) for n in range(1, venues + 1)))
+    booked = set()
+    _insert(Show, (
+        _show(rng, n, artists, venues, now, booked)
+        for n in range(1, shows + 1)))
+    for entity in ('artist', 'venue', 'show'):
+        sync_sequence(entity)
+    repair_counters()
+    refresh_feed()
+    if db.engine.dialect.name == 'sqlite':
+        for model in SEARCH_MODELS:
+            build_sqlite_index(model)
+        db.session.commit()
@@ -0,0 +1,170 @@
+'''
+Runs EXPLAIN on the statements the hot routes issue and fails when one
+of them reads artist, venue or show with a full table scan.
+
+Statements are captured while the routes are requested through the test
+client, so the check always follows the queries the code really sends.
+Point it at a database seeded at a realistic size (small tables make the
+planner prefer sequential scans):
+    python -m benchmarks.bench_routes --scale 100k --seed --requests 1
+    python -m benchmarks.explain_queries
+    python -m benchmarks.explain_queries --database-uri postgresql://...
+tests/test_explain_queries.py runs the same check on SQLite under pytest.
+'''
+import argparse
+import json
+import re
+import sys
+import warnings
+from sqlalchemy import event
+from app import create_app
+from benchmarks.bench_routes import DEFAULT_SQLITE
+from models import db
+
+TABLES = ('artist', 'venue', 'show', 'show_feed')
+
+# An ORDER BY key list directly followed by LIMIT.
+ORDER_BY_LIMIT = re.compile(
+    r'ORDER BY ((?:[\w".]+(?: ASC| DESC)?, )*[\w".]+(?: ASC| DESC)?)\s+LIMIT\b',
+    re.IGNORECASE)
+
+HOT_ROUTES = [
+    ('GET', '/venues/', None),
+    ('GET', '/venues/area?city=Austin&state=TX&offset=5', None),
+    ('GET', '/venues/1', None),
+    ('GET', '/artists/1', None),
+    ('GET', '/shows/', None),
+    ('GET', '/shows/?start=2026-03-01&end=2026-04-01', None),
+    ('GET', '/api/venues', None),
+    ('GET', '/api/venues?cursor=eyJpZCI6IDUwMH0=', None),
+    ('GET', '/api/venues/availability?ids=1,2,3&start=2026-03-01&end=2026-04-01', None),
+    ('GET', '/api/venues/facets?city=Austin&state=TX', None),
+    ('GET', '/api/venues/nearby?city=Austin&state=TX', None),
+    ('POST', '/venues/search', {'search_term': 'golden'}),
+    ('POST', '/artists/search', {'search_term': 'moo'}),
+]
+
+
+'''
+Requests the hot routes and returns the distinct SELECTs they executed
+'''
+def capture_statements(app):
+    captured = {}
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(('SELECT', 'WITH')):
+            captured.setdefault(statement, parameters)
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', record)
+    try:
+        client = app.test_client()
+        for method, path, data in HOT_ROUTES:
+            client.open(path, method=method, data=data)
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)
+    return engine, captured
+
+
+def _postgres_full_scans(plan):
+    scans = []
+    if plan.get('Node Type') == 'Seq Scan' and plan.get('Relation Name') in TABLES:
+        scans.append(plan['Relation Name'])
+    for child in plan.get('Plans', []):
+        scans.extend(_postgres_full_scans(child))
+    return scans
+
+
+'''
+(table, ORDER BY columns) of each ORDER BY on the columns of one table that
+is directly followed by LIMIT
+'''
+def ordered_walks(statement):
+    walks = set()
+    for match in ORDER_BY_LIMIT.finditer(statement):
+        keys = [
+            re.sub(r' (ASC|DESC)$', '', key.strip(), flags=re.IGNORECASE)
+            .replace('"', '').rpartition('.')
+            for key in match.group(1).split(',')]
+        tables = {table for table, _, _ in keys}
+        if len(tables) == 1 and '' not in tables:
+            walks.add((tables.pop(), tuple(column for _, _, column in keys)))
+    return walks
+
+
+'''
+Whether a SQLite SCAN reads its table in the ORDER BY order of a walk, so
+it stops at the LIMIT: the rowid for ORDER BY id, or an index whose leading
+columns are the ORDER BY columns. Scans of any other table are not exempt.
+'''
+def _is_ordered_walk(connection, detail, walks):
+    words = detail.split()
+    for table, columns in walks:
+        if words[1] != table:
+            continue
+        if len(words) == 2 and columns == ('id',):
+            return True
+        if words[2:4] == ['USING', 'INDEX']:
+            indexed = tuple(row[2] for row in connection.exec_driver_sql(
+                'PRAGMA index_info({})'.format(words[4])))
+            if indexed[:len(columns)] == columns:
+                return True
+    return False
+
+
+'''
+Returns (plan text, tables read by full scan) for one statement
+'''
+def explain(connection, statement, parameters):
+    if connection.dialect.name == 'postgresql':
+        plan = connection.exec_driver_sql(
+            'EXPLAIN (FORMAT JSON) ' + statement, parameters).scalar()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return json.dumps(plan, indent=1), _postgres_full_scans(plan[0]['Plan'])
+    rows = connection.exec_driver_sql(
+        'EXPLAIN QUERY PLAN ' + statement, parameters).fetchall()
+    details = [row[-1] for row in rows]
+    walks = set() if any('TEMP B-TREE' in detail for detail in details) else (
+        ordered_walks(statement))
+    # SCAN walks a whole table or index; only covering index scans (the
+    # aggregates) and ordered walks are cheap enough.
+    scans = [
+        detail.split()[1] for detail in details
+        if detail.startswith('SCAN ') and 'COVERING INDEX' not in detail
+        and detail.split()[1] in TABLES
+        and not _is_ordered_walk(connection, detail, walks)
+    ]
+    return '\n'.join(details), scans
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--database-uri', default=DEFAULT_SQLITE)
+    parser.add_argument('--verbose', action='store_true')
+    args = parser.parse_args(argv)
+    warnings.simplefilter('ignore', DeprecationWarning)
+
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': args.database_uri,
+        'WTF_CSRF_ENABLED': False,
+    })
+    app.logger.disabled = True
+    engine, captured = capture_statements(app)
+    failures = 0
+    with engine.connect() as connection:
+        for statement, parameters in captured.items():
+            plan, scans = explain(connection, statement, parameters)
+            status = 'FULL SCAN ' + ', '.join(scans) if scans else 'ok'
+            print('{}: {}'.format(status, ' '.join(statement.split())[:120]))
+            if args.verbose or scans:
+                print(plan + '\n')
+            failures += bool(scans)
+    print('{} statements, {} with full table scans'.format(
+        len(captured), failures))
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
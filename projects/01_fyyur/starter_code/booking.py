@@ -0,0 +1,166 @@
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from datetime import timedelta
+from threading import Lock
+from sqlalchemy import event, select
+from sqlalchemy.exc import IntegrityError
+from models import Show, db
+
+# Every show holds its venue for this long. The exclusion constraint of
+# migration 6e1b0c7d2a95 uses the same duration.
+SHOW_DURATION = timedelta(hours=3)
+
+# Error of the rows check_bookings refuses.
+BOOKED = 'venue already booked'
+
+# Postgres SQLSTATE of an exclusion constraint violation.
+EXCLUSION_VIOLATION = '23P01'
+
+show_table = Show.__table__
+
+
+'''
+Per-venue index of booked start times, used to pre-check bookings without
+a database round trip.
+Shows last SHOW_DURATION each, so two shows overlap exactly when their
+starts are less than SHOW_DURATION apart; an overlap query is then a range
+query on the venue's sorted starts, answered with two bisects. Venues load
+lazily and the least recently used are dropped past max_venues.
+The index can go stale (other workers, cascaded deletes), so a conflict it
+reports is confirmed against the database before a booking is refused,
+and the database has the final word on bookings it lets through.
+'''
+class BookingIndex:
+
+    def __init__(self, max_venues=10000):
+        self.max_venues = max_venues
+        self._lock = Lock()
+        self._venues = OrderedDict()
+
+    def load(self, venue_ids):
+        venue_ids = set(venue_ids)
+        schedules = {venue_id: ([], []) for venue_id in venue_ids}
+        if venue_ids:
+            rows = db.session.execute(select(
+                show_table.c.venue_id, show_table.c.start_time,
+                show_table.c.id).where(
+                show_table.c.venue_id.in_(venue_ids)).order_by(
+                show_table.c.venue_id, show_table.c.start_time))
+            for venue_id, start_time, show_id in rows:
+                starts, ids = schedules[venue_id]
+                starts.append(start_time)
+                ids.append(show_id)
+        with self._lock:
+            for venue_id, schedule in schedules.items():
+                self._venues[venue_id] = schedule
+                self._venues.move_to_end(venue_id)
+            while len(self._venues) > self.max_venues:
+                self._venues.popitem(last=False)
+
+    def forget(self, venue_ids):
+        with self._lock:
+            for venue_id in venue_ids:
+                self._venues.pop(venue_id, None)
+
+    def conflicts(self, venue_id, start_time):
+        with self._lock:
+            schedule = self._venues.get(venue_id)
+            if schedule is not None:
+                self._venues.move_to_end(venue_id)
+        if schedule is None:
+            self.load([venue_id])
+            return self.conflicts(venue_id, start_time)
+        with self._lock:
+            starts, ids = schedule
+            low = bisect_right(starts, start_time - SHOW_DURATION)
+            high = bisect_left(starts, start_time + SHOW_DURATION)
+            return ids[low:high]
+
+    def add(self, venue_id, start_time, show_id):
+        with self._lock:
+            schedule = self._venues.get(venue_id)
+            if schedule is None:
+                return
+            starts, ids = schedule
+            position = bisect_right(starts, start_time)
+            starts.insert(position, start_time)
+            ids.insert(position, show_id)
+
+    def remove(self, venue_id, show_id):
+        with self._lock:
+            schedule = self._venues.get(venue_id)
+            if schedule is None or show_id not in schedule[1]:
+                return
+            position = schedule[1].index(show_id)
+            del schedule[0][position]
+            del schedule[1][position]
+
+
+booking_index = BookingIndex()
+
+
+@event.listens_for(Show, 'after_insert')
+def _show_booked(mapper, connection, show):
+    booking_index.add(show.venue_id, show.start_time, show.id)
+
+
+@event.listens_for(Show, 'after_delete')
+def _show_cancelled(mapper, connection, show):
+    booking_index.remove(show.venue_id, show.id)
+
+
+@event.listens_for(Show, 'after_update')
+def _show_moved(mapper, connection, show):
+    booking_index.forget([show.venue_id])
+
+
+'''
+Ids of the shows overlapping a show at venue_id starting at start_time.
+Checks the index first and confirms any conflict it reports with a fresh
+load of the venue; databases without the exclusion constraint are also
+checked with an indexed query.
+'''
+def find_conflicts(venue_id, start_time):
+    conflicts = booking_index.conflicts(venue_id, start_time)
+    if conflicts:
+        booking_index.load([venue_id])
+        return booking_index.conflicts(venue_id, start_time)
+    if db.engine.dialect.name != 'postgresql':
+        return db.session.execute(select(show_table.c.id).where(
+            show_table.c.venue_id == venue_id,
+            show_table.c.start_time > start_time - SHOW_DURATION,
+            show_table.c.start_time < start_time + SHOW_DURATION)).scalars().all()
+    return []
+
+
+'''
+Whether an IntegrityError is the venue exclusion constraint refusing an
+overlapping show
+'''
+def is_double_booking(error):
+    return (isinstance(error, IntegrityError)
+            and getattr(error.orig, 'pgcode', None) == EXCLUSION_VIOLATION)
+
+
+'''
+Splits (number, raw, row) show rows into bookable rows and
+(number, raw, error) conflicts, against the shows in the database and the
+earlier rows of the same batch. The batch's venues are loaded fresh with
+one query, so the check is exact as of the current transaction.
+'''
+def check_bookings(valid):
+    venue_ids = {row['venue_id'] for _, _, row in valid}
+    booking_index.load(venue_ids)
+    bookable, conflicts = [], []
+    for number, raw, row in valid:
+        overlapping = booking_index.conflicts(row['venue_id'], row['start_time'])
+        if overlapping:
+            conflicts.append((number, raw, BOOKED + ': ' + ', '.join(
+                str(show_id) for show_id in overlapping)))
+        else:
+            booking_index.add(
+                row['venue_id'], row['start_time'], 'row {}'.format(number))
+            bookable.append((number, raw, row))
+    # The placeholders above are not show ids; reload on next use.
+    booking_index.forget(venue_ids)
+    return bookable, conflicts
@@ -0,0 +1,86 @@
+from collections import OrderedDict
+from threading import Lock
+import time
+
+
+'''
+Bounded in-process cache for rendered pages.
+Entries expire after `ttl` seconds, and the least recently used ones are
+evicted once either `max_entries` or `max_bytes` is exceeded.
+'''
+class PageCache:
+
+    def __init__(self, ttl=60, max_entries=128, max_bytes=1024 * 1024):
+        self._lock = Lock()
+        self._entries = OrderedDict()
+        self._size = 0
+        self.hits = 0
+        self.misses = 0
+        self.configure(ttl, max_entries, max_bytes)
+
+    def configure(self, ttl, max_entries, max_bytes):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= time.monotonic():
+                self._drop(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value):
+        size = len(value.encode('utf-8') if isinstance(value, str) else value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            self._drop(key)
+            self._entries[key] = (time.monotonic() + self.ttl, value, size)
+            self._size += size
+            while (len(self._entries) > self.max_entries
+                   or self._size > self.max_bytes):
+                self._drop(next(iter(self._entries)))
+
+    '''
+    Drops the given keys, or every entry when called without keys
+    '''
+    def invalidate(self, *keys):
+        with self._lock:
+            for key in keys or list(self._entries):
+                self._drop(key)
+
+    def _drop(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._size -= entry[2]
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'entries': len(self._entries),
+                'bytes': self._size
+            }
+
+
+page_cache = PageCache()
+
+HOME_PAGE = 'home'
+
+
+'''
+Applies the page cache settings from the app config
+'''
+def setup_page_cache(app):
+    page_cache.configure(
+        app.config.get('PAGE_CACHE_TTL', 60),
+        app.config.get('PAGE_CACHE_MAX_ENTRIES', 128),
+        app.config.get('PAGE_CACHE_MAX_BYTES', 1024 * 1024))
@@ -0,0 +1,102 @@
+from queue import Empty, LifoQueue
+import threading
+import zlib
+from flask import request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# gzip framing for zlib.
+GZIP_WBITS = 31
+
+
+'''
+Pool of gzip compressors shared by the request threads.
+Python's zlib cannot reset a finished compressor, so the pool keeps
+initialized ones and hands out copies of them, which skips the setup of a
+new deflate stream. It also caps how many responses are compressed at
+once: when every slot is taken compress() returns None and the response
+goes out uncompressed rather than waiting.
+'''
+class CompressorPool:
+
+    def __init__(self, size=8, level=6, brotli_quality=4):
+        self.level = level
+        self.brotli_quality = brotli_quality
+        self._slots = threading.BoundedSemaphore(size)
+        self._compressors = LifoQueue()
+
+    def _gzip(self, data):
+        try:
+            pristine = self._compressors.get_nowait()
+        except Empty:
+            pristine = zlib.compressobj(self.level, zlib.DEFLATED, GZIP_WBITS)
+        try:
+            compressor = pristine.copy()
+        finally:
+            self._compressors.put(pristine)
+        return compressor.compress(data) + compressor.flush()
+
+    def compress(self, data, encoding):
+        if not self._slots.acquire(blocking=False):
+            return None
+        try:
+            if encoding == 'br':
+                return brotli.compress(data, quality=self.brotli_quality)
+            return self._gzip(data)
+        finally:
+            self._slots.release()
+
+
+'''
+Picks the encoding for a response: brotli when available and accepted,
+otherwise gzip, or None when the client accepts neither
+'''
+def choose_encoding(accept_encodings):
+    if brotli is not None and accept_encodings['br']:
+        return 'br'
+    if accept_encodings['gzip']:
+        return 'gzip'
+    return None
+
+
+'''
+Compresses HTML, JSON and other text responses of at least
+COMPRESS_MIN_SIZE bytes. Streamed responses and files (exports, static
+assets) are left alone. A strong ETag becomes weak, since the compressed
+body is a different byte sequence.
+'''
+def setup_compression(app):
+    pool = CompressorPool(
+        app.config.get('COMPRESS_POOL_SIZE', 8),
+        app.config.get('COMPRESS_LEVEL', 6),
+        app.config.get('COMPRESS_BROTLI_QUALITY', 4))
+    app.extensions['compressor_pool'] = pool
+    mimetypes = set(app.config.get(
+        'COMPRESS_MIMETYPES', ('text/html', 'application/json')))
+    min_size = app.config.get('COMPRESS_MIN_SIZE', 1024)
+
+    @app.after_request
+    def compress_response(response):
+        if (response.direct_passthrough or response.is_streamed
+                or response.status_code != 200
+                or 'Content-Encoding' in response.headers
+                or response.mimetype not in mimetypes):
+            return response
+        response.vary.add('Accept-Encoding')
+        if response.content_length is not None and response.content_length < min_size:
+            return response
+        encoding = choose_encoding(request.accept_encodings)
+        if encoding is None:
+            return response
+        compressed = pool.compress(response.get_data(), encoding)
+        if compressed is None:
+            return response
+        response.set_data(compressed)
+        response.headers['Content-Encoding'] = encoding
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return response
@@ -0,0 +1,109 @@
+from datetime import datetime, timezone
+import hashlib
+from flask import Response, request, session
+from sqlalchemy import event, func, select
+from models import Artist, DeletionMark, Venue
+
+deletion_table = DeletionMark.__table__
+
+
+'''
+Strong ETag over the values a response is rendered from, so it can be
+checked before the body is serialized
+'''
+def compute_etag(*parts):
+    return hashlib.sha1(repr(parts).encode('utf-8')).hexdigest()
+
+
+'''
+updated_at columns hold naive UTC; HTTP dates have whole seconds
+'''
+def http_date(value):
+    return value.replace(microsecond=0, tzinfo=timezone.utc)
+
+
+'''
+Show start times are naive local time, compared with datetime.now(); the
+moment a show moved into the past, as naive UTC
+'''
+def local_to_utc(value):
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+'''
+Last-Modified of a response: the newest of the given naive UTC times,
+skipping None
+'''
+def newest(*values):
+    return max((value for value in values if value is not None), default=None)
+
+
+'''
+Records that rows of a table were deleted, on the connection of the
+deleting transaction
+'''
+def mark_deleted(connection, table_name):
+    now = datetime.utcnow()
+    marked = connection.execute(deletion_table.update().where(
+        deletion_table.c.table_name == table_name).values(deleted_at=now))
+    if not marked.rowcount:
+        connection.execute(deletion_table.insert(), {
+            'table_name': table_name, 'deleted_at': now})
+
+
+def _entity_deleted(mapper, connection, target):
+    mark_deleted(connection, target.__tablename__)
+
+
+event.listen(Artist, 'after_delete', _entity_deleted)
+event.listen(Venue, 'after_delete', _entity_deleted)
+
+
+'''
+SELECT of the newest change to a model's table: its latest updated_at and
+its latest delete. Both are index lookups.
+'''
+def table_modified_at(model):
+    return select(
+        func.max(model.updated_at),
+        select(deletion_table.c.deleted_at).where(
+            deletion_table.c.table_name == model.__tablename__
+        ).scalar_subquery())
+
+
+'''
+Whether parsed If-None-Match or, without it, If-Modified-Since headers
+match the validators
+'''
+def validators_match(if_none_match, if_modified_since, etag, last_modified=None):
+    if if_none_match:
+        return if_none_match.contains_weak(etag)
+    if last_modified is not None and if_modified_since:
+        return http_date(last_modified) <= if_modified_since
+    return False
+
+
+'''
+Returns a 304 response when the request's validators match, otherwise
+None. Pages with pending flash messages render them, so they are never
+answered with 304.
+'''
+def not_modified(etag, last_modified=None):
+    if '_flashes' in session:
+        return None
+    if not validators_match(
+            request.if_none_match, request.if_modified_since,
+            etag, last_modified):
+        return None
+    return with_validators(Response(status=304), etag, last_modified)
+
+
+'''
+Sets ETag and Last-Modified, and asks clients to revalidate before reuse
+'''
+def with_validators(response, etag, last_modified=None):
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = http_date(last_modified)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
@@ -21,3 +21,76 @@ DEBUG = True
 # # TODO IMPLEMENT DATABASE URL
 SQLALCHEMY_DATABASE_URI = 'postgresql://postgres@localhost:5432/fyyur'
 SQLALCHEMY_TRACK_MODIFICATIONS = True
+
+# Above this many rows /api/venues reports the planner's row estimate
+# instead of running an exact COUNT(*).
+VENUE_COUNT_ESTIMATE_THRESHOLD = 100000
+
+# Rendered page cache used for the home page.
+PAGE_CACHE_TTL = 60
+PAGE_CACHE_MAX_ENTRIES = 128
+PAGE_CACHE_MAX_BYTES = 1024 * 1024
+
+# Cached venue free windows (/api/venues/availability). Show writes
+# invalidate a venue's entries in the writing process; the TTL bounds how
+# long other processes can serve them. A request covers at most
+# AVAILABILITY_MAX_VENUES venues and AVAILABILITY_MAX_DAYS days.
+AVAILABILITY_CACHE_TTL = 300
+AVAILABILITY_CACHE_MAX_ENTRIES = 4096
+AVAILABILITY_CACHE_MAX_BYTES = 4 * 1024 * 1024
+AVAILABILITY_MAX_VENUES = 50
+AVAILABILITY_MAX_DAYS = 92
+
+# Cached facet counts (/api/<entity>/facets), per filter combination.
+# Writes update the cached counts of the writing process; the TTL bounds
+# how stale other processes get.
+FACET_CACHE_TTL = 300
+FACET_CACHE_MAX_ENTRIES = 256
+
+# /api/venues/nearby searches at most this far (and by default this far
+# for k-nearest queries).
+GEO_MAX_RADIUS_KM = 500
+# Each worker reloads its venue grid index this often, to pick up venues
+# imported or located by CLI commands, which run in their own process.
+GEO_INDEX_MAX_AGE = 600
+
+# Connection pool, per worker process. Keep
+# workers * (DB_POOL_SIZE + DB_MAX_OVERFLOW) below Postgres max_connections.
+DB_POOL_SIZE = 5
+DB_MAX_OVERFLOW = 10
+DB_POOL_TIMEOUT = 30
+DB_POOL_RECYCLE = 1800
+DB_POOL_PRE_PING = True
+DB_STATEMENT_TIMEOUT_MS = 5000
+
+# Read replicas. GET/HEAD/OPTIONS requests read from these; writes and the
+# READ_YOUR_WRITES_SECONDS after a client's write go to the primary.
+SQLALCHEMY_REPLICA_URIS = []
+READ_YOUR_WRITES_SECONDS = 5
+
+# Origins allowed to call /api/*, for both the Flask app and asgi.py.
+CORS_ORIGINS = '*'
+
+# Per-request SQL profiler. Requests over a threshold are logged; in strict
+# mode a statement repeated SQL_PROFILER_DUPLICATE_THRESHOLD times (an N+1
+# lazy-load loop) raises profiler.NPlusOneError, failing tests.
+SQL_PROFILER_ENABLED = True
+SQL_PROFILER_QUERY_THRESHOLD = 20
+SQL_PROFILER_TIME_THRESHOLD_MS = 200
+SQL_PROFILER_DUPLICATE_THRESHOLD = 3
+SQL_PROFILER_STRICT = False
+
+# Fingerprinted files built by `flask assets build` are cached for a year.
+ASSETS_MAX_AGE = 365 * 24 * 3600
+
+# On-the-fly compression of text responses of at least COMPRESS_MIN_SIZE
+# bytes. COMPRESS_POOL_SIZE caps concurrent compressions per process.
+COMPRESS_MIN_SIZE = 1024
+COMPRESS_MIMETYPES = ['text/html', 'application/json', 'text/csv']
+COMPRESS_LEVEL = 6
+COMPRESS_BROTLI_QUALITY = 4
+COMPRESS_POOL_SIZE = 8
+
+# Database of the async /api routes served by asgi.py. Defaults to
+# SQLALCHEMY_DATABASE_URI with the asyncpg (or aiosqlite) driver.
+ASYNC_DATABASE_URI = None
@@ -0,0 +1,230 @@
+from datetime import datetime
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import and_, bindparam, event, func, inspect, or_, select
+from models import Artist, Show, ShowCounterWatermark, Venue, db
+
+COUNTED = ((Artist, 'artist_id'), (Venue, 'venue_id'))
+
+watermark_table = ShowCounterWatermark.__table__
+show_table = Show.__table__
+
+
+'''
+Returns the counters watermark, creating it on a fresh database.
+Shows are classified against the watermark rather than the clock, so the
+counters stay consistent with what the roll job has moved. On Postgres
+writers hold a share lock on it and the roll job an exclusive one, so a
+show cannot be counted while its time window is being rolled.
+'''
+def counter_watermark(connection, for_roll=False):
+    query = select(watermark_table.c.rolled_at).with_for_update(
+        read=not for_roll)
+    rolled_at = connection.execute(query).scalar()
+    if rolled_at is None:
+        rolled_at = datetime.now()
+        connection.execute(watermark_table.insert(), {'rolled_at': rolled_at})
+    return rolled_at
+
+
+'''
+Adds (sign=1) or removes (sign=-1) shows from the artist and venue counters.
+shows holds (artist_id, venue_id, start_time) tuples; the counters of each
+touched row are updated with one executemany per table.
+'''
+def count_shows(connection, shows, sign=1):
+    shows = list(shows)
+    if not shows:
+        return
+    watermark = counter_watermark(connection)
+    for model, key in COUNTED:
+        deltas = {}
+        for show in shows:
+            entity_id = show[0] if key == 'artist_id' else show[1]
+            delta = deltas.setdefault(entity_id, [0, 0])
+            delta[0 if show[2] > watermark else 1] += sign
+        table = model.__table__
+        connection.execute(
+            table.update().where(table.c.id == bindparam('entity_id')).values(
+                upcoming_shows_count=table.c.upcoming_shows_count
+                + bindparam('upcoming'),
+                past_shows_count=table.c.past_shows_count + bindparam('past')),
+            [{'entity_id': entity_id, 'upcoming': upcoming, 'past': past}
+             for entity_id, (upcoming, past) in deltas.items()])
+
+
+def _show_key(show):
+    return (show.artist_id, show.venue_id, show.start_time)
+
+
+@event.listens_for(Show, 'after_insert')
+def _show_inserted(mapper, connection, show):
+    count_shows(connection, [_show_key(show)])
+
+
+@event.listens_for(Show, 'after_delete')
+def _show_deleted(mapper, connection, show):
+    count_shows(connection, [_show_key(show)], -1)
+
+
+@event.listens_for(Show, 'after_update')
+def _show_updated(mapper, connection, show):
+    state = inspect(show)
+    old = []
+    for name in ('artist_id', 'venue_id', 'start_time'):
+        history = state.attrs[name].history
+        old.append(history.deleted[0] if history.deleted else getattr(show, name))
+    if tuple(old) != _show_key(show):
+        count_shows(connection, [tuple(old)], -1)
+        count_shows(connection, [_show_key(show)])
+
+
+'''
+Takes the shows of the given artists (key='artist_id') or venues off the
+counters of the other side, before the ON DELETE CASCADE removes them
+without going through the ORM events. Set-based: one UPDATE of the other
+table.
+'''
+def uncount_cascaded_shows(connection, key, ids):
+    watermark = counter_watermark(connection)
+    other_model, other_key = [
+        (model, other) for model, other in COUNTED if other != key][0]
+    other = other_model.__table__
+    shows = select(func.count()).where(
+        show_table.c[key].in_(ids), show_table.c[other_key] == other.c.id)
+    upcoming = shows.where(
+        show_table.c.start_time > watermark).scalar_subquery()
+    past = shows.where(
+        show_table.c.start_time <= watermark).scalar_subquery()
+    connection.execute(other.update().where(other.c.id.in_(
+        select(show_table.c[other_key]).where(
+            show_table.c[key].in_(ids)))).values(
+        upcoming_shows_count=other.c.upcoming_shows_count - upcoming,
+        past_shows_count=other.c.past_shows_count - past))
+
+
+# Shows the session already deleted have been counted by _show_deleted.
+def _entity_deleted(mapper, connection, target):
+    key = 'artist_id' if isinstance(target, Artist) else 'venue_id'
+    uncount_cascaded_shows(connection, key, [target.id])
+
+
+event.listen(Artist, 'before_delete', _entity_deleted)
+event.listen(Venue, 'before_delete', _entity_deleted)
+
+
+'''
+Moves shows that started since the last roll from upcoming to past and
+advances the watermark. Set-based: one UPDATE per table, driven by the
+(start_time, id) index. Returns the number of shows rolled.
+'''
+def roll_counters(now=None):
+    now = now or datetime.now()
+    connection = db.session.connection()
+    watermark = counter_watermark(connection, for_roll=True)
+    if now <= watermark:
+        return 0
+    window = and_(
+        show_table.c.start_time > watermark,
+        show_table.c.start_time <= now)
+    for model, key in COUNTED:
+        table = model.__table__
+        moved = select(func.count()).where(
+            show_table.c[key] == table.c.id, window).scalar_subquery()
+        connection.execute(
+            table.update().where(table.c.id.in_(
+                select(show_table.c[key]).where(window))).values(
+                upcoming_shows_count=table.c.upcoming_shows_count - moved,
+                past_shows_count=table.c.past_shows_count + moved))
+    rolled = connection.execute(
+        select(func.count()).select_from(show_table).where(window)).scalar()
+    connection.execute(watermark_table.update().values(rolled_at=now))
+    db.session.commit()
+    return rolled
+
+
+def _actual_counts(table, key, watermark):
+    counted = select(func.count()).where(show_table.c[key] == table.c.id)
+    upcoming = counted.where(
+        show_table.c.start_time > watermark).scalar_subquery()
+    past = counted.where(
+        show_table.c.start_time <= watermark).scalar_subquery()
+    return upcoming, past
+
+
+'''
+Returns (model, id, stored upcoming, actual upcoming, stored past, actual
+past) for every artist and venue whose counters are wrong
+'''
+def counter_mismatches():
+    connection = db.session.connection()
+    watermark = counter_watermark(connection)
+    mismatches = []
+    for model, key in COUNTED:
+        table = model.__table__
+        upcoming, past = _actual_counts(table, key, watermark)
+        rows = connection.execute(select(
+            table.c.id,
+            table.c.upcoming_shows_count, upcoming,
+            table.c.past_shows_count, past).where(or_(
+                table.c.upcoming_shows_count != upcoming,
+                table.c.past_shows_count != past)).order_by(table.c.id))
+        mismatches.extend((model, *row) for row in rows)
+    return mismatches
+
+
+'''
+Recomputes the counters of every artist and venue whose counters are
+wrong. Returns the number of rows fixed.
+'''
+def repair_counters():
+    connection = db.session.connection()
+    watermark = counter_watermark(connection)
+    fixed = 0
+    for model, key in COUNTED:
+        table = model.__table__
+        upcoming, past = _actual_counts(table, key, watermark)
+        fixed += connection.execute(table.update().where(or_(
+            table.c.upcoming_shows_count != upcoming,
+            table.c.past_shows_count != past)).values(
+            upcoming_shows_count=upcoming,
+            past_shows_count=past)).rowcount
+    db.session.commit()
+    return fixed
+
+
+'''
+Maintenance commands for the denormalized show counters.
+Run `flask counters roll` periodically, e.g. from cron every few minutes;
+listings show upcoming counts as of the last roll.
+'''
+@click.group('counters')
+def counters_command():
+    pass
+
+
+@counters_command.command('roll')
+@click.option('--now', type=click.DateTime(), default=None,
+              help='Roll up to this time instead of the current time.')
+@with_appcontext
+def roll_command(now):
+    click.echo('Rolled {} shows to past'.format(roll_counters(now)))
+
+
+@counters_command.command('verify')
+@click.option('--repair', is_flag=True, help='Rebuild the wrong counters.')
+@with_appcontext
+def verify_command(repair):
+    mismatches = counter_mismatches()
+    for model, entity_id, upcoming, actual_upcoming, past, actual_past in mismatches:
+        click.echo('{} {}: upcoming {} (actual {}), past {} (actual {})'.format(
+            model.__tablename__, entity_id, upcoming, actual_upcoming,
+            past, actual_past))
+    if repair:
+        click.echo('Repaired {} rows'.format(repair_counters()))
+    elif mismatches:
+        raise click.ClickException(
+            '{} rows with wrong counters, rerun with --repair'.format(
+                len(mismatches)))
+    else:
+        click.echo('All counters are correct')
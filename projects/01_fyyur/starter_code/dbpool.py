@@ -0,0 +1,82 @@
+from threading import Lock
+import time
+from sqlalchemy.pool import QueuePool
+
+
+'''
+QueuePool that records how long callers wait for a connection
+'''
+class TimedQueuePool(QueuePool):
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._wait_lock = Lock()
+        self.waits = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            waited = time.perf_counter() - start
+            with self._wait_lock:
+                self.waits += 1
+                self.wait_seconds += waited
+                self.max_wait_seconds = max(self.max_wait_seconds, waited)
+
+    def recreate(self):
+        # Keep the counters across pre-ping/recycle driven pool rebuilds.
+        pool = super().recreate()
+        pool.waits = self.waits
+        pool.wait_seconds = self.wait_seconds
+        pool.max_wait_seconds = self.max_wait_seconds
+        return pool
+
+
+'''
+Builds SQLAlchemy engine options from the DB_* settings in config.py.
+SQLite keeps the pool Flask-SQLAlchemy picks for it.
+'''
+def engine_options(config):
+    uri = config['SQLALCHEMY_DATABASE_URI']
+    if uri.startswith('sqlite'):
+        return {}
+    options = {
+        'poolclass': TimedQueuePool,
+        'pool_size': config.get('DB_POOL_SIZE', 5),
+        'max_overflow': config.get('DB_MAX_OVERFLOW', 10),
+        'pool_timeout': config.get('DB_POOL_TIMEOUT', 30),
+        'pool_recycle': config.get('DB_POOL_RECYCLE', 1800),
+        'pool_pre_ping': config.get('DB_POOL_PRE_PING', True),
+    }
+    timeout = config.get('DB_STATEMENT_TIMEOUT_MS')
+    if timeout and uri.startswith('postgres'):
+        options['connect_args'] = {
+            'options': '-c statement_timeout={:d}'.format(timeout)}
+    return options
+
+
+'''
+Live numbers for an engine's connection pool. Its overflow limit is read
+from DB_MAX_OVERFLOW in config, which both the sync and async pools use.
+'''
+def pool_stats(engine, config):
+    pool = engine.pool
+    stats = {'pool': type(pool).__name__, 'status': pool.status()}
+    if isinstance(pool, QueuePool):
+        stats.update({
+            'size': pool.size(),
+            'checked_in': pool.checkedin(),
+            'checked_out': pool.checkedout(),
+            'overflow': max(pool.overflow(), 0),
+            'max_overflow': config.get('DB_MAX_OVERFLOW', 10),
+        })
+    if isinstance(pool, TimedQueuePool):
+        stats.update({
+            'waits': pool.waits,
+            'wait_ms_total': round(pool.wait_seconds * 1000, 3),
+            'wait_ms_max': round(pool.max_wait_seconds * 1000, 3),
+        })
+    return stats
@@ -0,0 +1,238 @@
+from collections import Counter, OrderedDict
+from threading import Lock
+import time
+from sqlalchemy import event, exists, func, inspect, literal, select, true, union_all
+from sqlalchemy.dialects.postgresql import array
+from sqlalchemy.orm import Session, object_session
+from models import Artist, Venue, db
+
+FACET_MODELS = {'artists': Artist, 'venues': Venue}
+
+# Facets counted per entity; genres is the array column, the others plain.
+FACETS = ('genres', 'city', 'state')
+
+
+'''
+Normalizes facet filters to a hashable key: genres as a sorted tuple of
+distinct values, city and state as strings or None
+'''
+def facet_key(genres=(), city=None, state=None):
+    return tuple(sorted(set(genres))), city or None, state or None
+
+
+def _matches(values, key):
+    genres, city, state = key
+    return (values is not None
+            and set(genres) <= set(values['genres'] or ())
+            and city in (None, values['city'])
+            and state in (None, values['state']))
+
+
+def facet_conditions(model, key):
+    genres, city, state = key
+    conditions = []
+    if genres:
+        if db.engine.dialect.name == 'postgresql':
+            # genres @> ARRAY[...] is answered by the GIN index.
+            conditions.append(
+                model.genres.op('@>', is_comparison=True)(array(genres)))
+        else:
+            for genre in genres:
+                values = func.json_each(model.genres).table_valued('value')
+                conditions.append(exists(
+                    select(1).select_from(values).where(values.c.value == genre)))
+    if city:
+        conditions.append(model.city == city)
+    if state:
+        conditions.append(model.state == state)
+    return conditions
+
+
+def _genre_values(model):
+    if db.engine.dialect.name == 'postgresql':
+        return func.unnest(model.genres).table_valued('value').render_derived()
+    return func.json_each(model.genres).table_valued('value')
+
+
+'''
+Counts every facet value of the artists or venues matching key, plus their
+total, in one aggregate statement: a UNION ALL of one GROUP BY per facet.
+'''
+def count_facets(model, key):
+    conditions = facet_conditions(model, key)
+    genre = _genre_values(model)
+    arms = [
+        select(literal('total'), literal(None), func.count(model.id)).where(
+            *conditions),
+        select(literal('genres'), genre.c.value, func.count()).select_from(
+            model).join(genre, true()).where(*conditions).group_by(
+            genre.c.value),
+    ]
+    for name in FACETS[1:]:
+        column = getattr(model, name)
+        arms.append(select(literal(name), column, func.count()).where(
+            *conditions, column.isnot(None)).group_by(column))
+    counts = {name: Counter() for name in FACETS}
+    total = 0
+    for facet, value, count in db.session.execute(union_all(*arms)):
+        if facet == 'total':
+            total = count
+        else:
+            counts[facet][value] = count
+    return total, counts
+
+
+def _copy(counts):
+    return {name: Counter(values) for name, values in counts.items()}
+
+
+def _count(counts, values, sign):
+    for name in FACETS:
+        facet_values = values[name] if name == 'genres' else [values[name]]
+        for value in set(facet_values or ()):
+            if value is None:
+                continue
+            counts[name][value] += sign
+            if counts[name][value] <= 0:
+                del counts[name][value]
+
+
+'''
+In-process cache of facet counts per entity and filter combination.
+Committed writes are applied to every cached combination incrementally:
+an artist or venue leaving a combination is subtracted from its counts and
+one entering it added, so counts stay exact without re-aggregating.
+Counts computed while a write committed are not stored, and entries expire
+after `ttl` seconds to pick up writes made by other processes.
+'''
+class FacetCache:
+
+    def __init__(self, ttl=300, max_entries=256):
+        self._lock = Lock()
+        self._entries = OrderedDict()
+        self._generations = Counter()
+        self.configure(ttl, max_entries)
+
+    def configure(self, ttl, max_entries):
+        self.ttl = ttl
+        self.max_entries = max_entries
+
+    def counts(self, entity, key):
+        cache_key = (entity, key)
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(cache_key)
+                return entry[1], _copy(entry[2])
+            generation = self._generations[entity]
+        total, counts = count_facets(FACET_MODELS[entity], key)
+        with self._lock:
+            if self._generations[entity] == generation:
+                self._entries[cache_key] = (
+                    time.monotonic() + self.ttl, total, counts)
+                self._entries.move_to_end(cache_key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                counts = _copy(counts)
+        return total, counts
+
+    '''
+    Applies one committed write: old and new are the facet values of the
+    artist or venue before and after it, None when it did not exist
+    '''
+    def apply(self, entity, old, new):
+        with self._lock:
+            self._generations[entity] += 1
+            for cache_key, (expires, total, counts) in self._entries.items():
+                if cache_key[0] != entity:
+                    continue
+                for values, sign in ((old, -1), (new, 1)):
+                    if _matches(values, cache_key[1]):
+                        total += sign
+                        _count(counts, values, sign)
+                self._entries[cache_key] = (expires, total, counts)
+
+    '''
+    Drops the cached counts of an entity after a bulk write
+    '''
+    def forget(self, entity):
+        with self._lock:
+            self._generations[entity] += 1
+            for cache_key in [
+                    cache_key for cache_key in self._entries
+                    if cache_key[0] == entity]:
+                del self._entries[cache_key]
+
+
+facet_cache = FacetCache()
+
+
+def _values(target, old=False):
+    state = inspect(target)
+    values = {}
+    for name in FACETS:
+        history = state.attrs[name].history
+        values[name] = (history.deleted[0] if old and history.deleted
+                        else getattr(target, name))
+    return values
+
+
+def _record(target, old, new):
+    entity = target.__tablename__ + 's'
+    object_session(target).info.setdefault('facet_changes', []).append(
+        (entity, old, new))
+
+
+def _inserted(mapper, connection, target):
+    _record(target, None, _values(target))
+
+
+def _updated(mapper, connection, target):
+    old, new = _values(target, old=True), _values(target)
+    if old != new:
+        _record(target, old, new)
+
+
+def _deleted(mapper, connection, target):
+    _record(target, _values(target), None)
+
+
+for model in FACET_MODELS.values():
+    event.listen(model, 'after_insert', _inserted)
+    event.listen(model, 'after_update', _updated)
+    event.listen(model, 'after_delete', _deleted)
+
+
+@event.listens_for(Session, 'after_commit')
+def _apply_changes(session):
+    for entity, old, new in session.info.pop('facet_changes', ()):
+        facet_cache.apply(entity, old, new)
+
+
+# Changes of a transaction that ended without committing are dropped.
+@event.listens_for(Session, 'after_transaction_end')
+def _drop_changes(session, transaction):
+    if transaction.parent is None:
+        session.info.pop('facet_changes', None)
+
+
+'''
+Returns (one page of the matching artists or venues, their total, their
+facet counts). The page is read with the same indexed conditions; the
+counts come from the facet cache.
+'''
+def browse(entity, key, page=1, per_page=10):
+    model = FACET_MODELS[entity]
+    total, counts = facet_cache.counts(entity, key)
+    matches = model.query.filter(*facet_conditions(model, key)).order_by(
+        model.id).offset((page - 1) * per_page).limit(per_page).all()
+    return matches, total, counts
+
+
+'''
+Applies the facet cache settings from the app config
+'''
+def setup_facets(app):
+    facet_cache.configure(
+        app.config.get('FACET_CACHE_TTL', 300),
+        app.config.get('FACET_CACHE_MAX_ENTRIES', 256))
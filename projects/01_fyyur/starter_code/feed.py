@@ -0,0 +1,157 @@
+from datetime import datetime
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import event, exists, inspect, select
+from models import Artist, Show, ShowFeedEntry, Venue, db
+
+feed_table = ShowFeedEntry.__table__
+show_table = Show.__table__
+artist_table = Artist.__table__
+venue_table = Venue.__table__
+
+FEED_COLUMNS = (
+    'show_id', 'start_time', 'artist_id', 'venue_id',
+    'artist_name', 'artist_image_link', 'venue_name')
+
+
+def _feed_rows(*conditions):
+    return select(
+        show_table.c.id,
+        show_table.c.start_time,
+        show_table.c.artist_id,
+        show_table.c.venue_id,
+        artist_table.c.name,
+        artist_table.c.image_link,
+        venue_table.c.name).select_from(show_table.join(
+            artist_table, show_table.c.artist_id == artist_table.c.id).join(
+            venue_table, show_table.c.venue_id == venue_table.c.id)).where(
+        *conditions)
+
+
+'''
+Adds the upcoming ones of the given shows to the feed, with one
+INSERT ... SELECT
+'''
+def add_to_feed(connection, show_ids):
+    connection.execute(feed_table.insert().from_select(
+        FEED_COLUMNS, _feed_rows(
+            show_table.c.id.in_(show_ids),
+            show_table.c.start_time > datetime.now())))
+
+
+@event.listens_for(Show, 'after_insert')
+def _show_inserted(mapper, connection, show):
+    if show.start_time > datetime.now():
+        add_to_feed(connection, [show.id])
+
+
+@event.listens_for(Show, 'after_update')
+def _show_updated(mapper, connection, show):
+    connection.execute(
+        feed_table.delete().where(feed_table.c.show_id == show.id))
+    if show.start_time > datetime.now():
+        add_to_feed(connection, [show.id])
+
+
+# Artist and venue columns copied into the feed, by feed key.
+COPIED_COLUMNS = {
+    'artist_id': (('name', 'artist_name'), ('image_link', 'artist_image_link')),
+    'venue_id': (('name', 'venue_name'),),
+}
+
+
+'''
+Copies new artist or venue column values into the feed rows of the given
+ids, e.g. after a batch update
+'''
+def copy_to_feed(connection, key, ids, values):
+    changed = {
+        feed_column: values[name]
+        for name, feed_column in COPIED_COLUMNS[key] if name in values
+    }
+    if changed:
+        connection.execute(feed_table.update().where(
+            feed_table.c[key].in_(ids)).values(**changed))
+
+
+'''
+Copies renamed artists and venues, and new artist images, into their
+feed rows. Deleted shows leave the feed through ON DELETE CASCADE.
+'''
+def _copy_changes(connection, target, key):
+    state = inspect(target)
+    copy_to_feed(connection, key, [target.id], {
+        name: getattr(target, name)
+        for name, _ in COPIED_COLUMNS[key]
+        if state.attrs[name].history.has_changes()
+    })
+
+
+@event.listens_for(Artist, 'after_update')
+def _artist_updated(mapper, connection, artist):
+    _copy_changes(connection, artist, 'artist_id')
+
+
+@event.listens_for(Venue, 'after_update')
+def _venue_updated(mapper, connection, venue):
+    _copy_changes(connection, venue, 'venue_id')
+
+
+'''
+Drops shows that have started from the feed and adds upcoming shows that
+are missing from it, e.g. after a bulk import. Returns (removed, added).
+'''
+def refresh_feed(now=None):
+    now = now or datetime.now()
+    removed = db.session.execute(
+        feed_table.delete().where(feed_table.c.start_time <= now)).rowcount
+    missing = ~exists().where(feed_table.c.show_id == show_table.c.id)
+    added = db.session.execute(feed_table.insert().from_select(
+        FEED_COLUMNS,
+        _feed_rows(show_table.c.start_time > now, missing))).rowcount
+    db.session.commit()
+    return removed, added
+
+
+'''
+Fetches one page of upcoming shows from the feed table: a range scan of
+its (start_time, show_id) index. Rows that started since the last refresh
+are skipped by the start bound.
+'''
+def upcoming_shows(page, start, end, per_page):
+    query = db.session.query(
+        ShowFeedEntry.show_id.label('id'),
+        ShowFeedEntry.start_time,
+        ShowFeedEntry.artist_id,
+        ShowFeedEntry.venue_id,
+        ShowFeedEntry.artist_name,
+        ShowFeedEntry.artist_image_link,
+        ShowFeedEntry.venue_name).filter(
+        ShowFeedEntry.start_time >= max(start, datetime.now()))
+    if end is not None:
+        query = query.filter(ShowFeedEntry.start_time < end)
+    rows = query.order_by(
+        ShowFeedEntry.start_time, ShowFeedEntry.show_id).offset(
+        (page - 1) * per_page).limit(per_page + 1).all()
+    return rows[:per_page], len(rows) > per_page
+
+
+'''
+Maintenance commands for the upcoming shows feed.
+Run `flask feed refresh` periodically, e.g. from cron, to drop started
+shows; new and edited shows are added as they are saved.
+'''
+@click.group('feed')
+def feed_command():
+    pass
+
+
+@feed_command.command('refresh')
+@click.option('--rebuild', is_flag=True, help='Empty the feed first.')
+@with_appcontext
+def refresh_command(rebuild):
+    if rebuild:
+        db.session.execute(feed_table.delete())
+    removed, added = refresh_feed()
+    click.echo('Removed {} started shows, added {} upcoming shows'.format(
+        removed, added))
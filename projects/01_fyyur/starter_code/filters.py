@@ -0,0 +1,39 @@
+from datetime import datetime
+from functools import lru_cache
+from babel import Locale
+from babel.dates import parse_pattern
+import dateutil.parser
+
+# Named formats accepted by the `datetime` template filter.
+DATETIME_FORMATS = {
+    'full': "EEEE MMMM, d, y 'at' h:mma",
+    'medium': "EE MM, dd, y h:mma",
+}
+
+
+'''
+Compiles a babel date pattern once per distinct pattern string
+'''
+@lru_cache(maxsize=64)
+def compiled_pattern(pattern):
+    return parse_pattern(DATETIME_FORMATS.get(pattern, pattern))
+
+
+'''
+Parses a locale identifier once per distinct locale
+'''
+@lru_cache(maxsize=16)
+def get_locale(identifier):
+    return Locale.parse(identifier)
+
+
+'''
+Jinja filter formatting a show time. Datetimes are formatted directly with
+a pre-compiled pattern; strings are parsed first. Timezones are ignored.
+'''
+def format_datetime(value, format='medium', locale='en'):
+    if not isinstance(value, datetime):
+        value = dateutil.parser.parse(value, ignoretz=True)
+    elif value.tzinfo is not None:
+        value = value.replace(tzinfo=None)
+    return compiled_pattern(format).apply(value, get_locale(locale))
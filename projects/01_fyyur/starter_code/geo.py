@@ -0,0 +1,327 @@
+from collections import defaultdict
+from heapq import nsmallest
+from math import asin, cos, floor, pi, radians, sin, sqrt
+from threading import Lock
+import csv
+import os
+import time
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import bindparam, event, inspect, select
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session, object_session
+from models import Venue, db
+
+# City and state centroids; rows without a city are the state centroids.
+GAZETTEER_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), 'data', 'gazetteer.csv')
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = EARTH_RADIUS_KM * pi / 180
+
+# Side of a grid cell in degrees; about 55 km north-south.
+CELL_DEGREES = 0.5
+
+# Columns around the globe; column numbers wrap at the antimeridian.
+COLUMNS = round(360 / CELL_DEGREES)
+
+venue_table = Venue.__table__
+
+_gazetteer = {}
+
+
+'''
+Returns the (latitude, longitude) of a city, falling back to the centroid
+of its state, or None. Reads the bundled gazetteer on first use.
+'''
+def locate(city, state):
+    if not _gazetteer:
+        with open(GAZETTEER_PATH, newline='', encoding='utf-8') as f:
+            _gazetteer.update({
+                (row['city'].casefold(), row['state']): (
+                    float(row['latitude']), float(row['longitude']))
+                for row in csv.DictReader(f)})
+    return (_gazetteer.get(((city or '').strip().casefold(), state))
+            or _gazetteer.get(('', state)))
+
+
+def distance_km(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(radians, (lat1, lon1, lat2, lon2))
+    h = (sin((lat2 - lat1) / 2) ** 2
+         + cos(lat1) * cos(lat2) * sin((lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * asin(min(1.0, sqrt(h)))
+
+
+def _cell(lat, lon):
+    return floor(lat / CELL_DEGREES), floor(lon / CELL_DEGREES) % COLUMNS
+
+
+'''
+In-process grid index over venue coordinates.
+Venues are bucketed into CELL_DEGREES cells, so a radius query only reads
+the cells overlapping the circle's bounding box and a k-nearest query
+grows a square of cells ring by ring until the k-th candidate is closer
+than anything outside it. Columns wrap around the antimeridian, and a
+circle around a pole reads every column. Neither touches the database.
+'''
+class GridIndex:
+
+    def __init__(self):
+        self._lock = Lock()
+        self._cells = defaultdict(dict)
+        self._points = {}
+        self.loaded = False
+        self.loaded_at = None
+
+    def load(self, entries):
+        cells, points = defaultdict(dict), {}
+        for venue_id, lat, lon in entries:
+            cells[_cell(lat, lon)][venue_id] = (lat, lon)
+            points[venue_id] = (lat, lon)
+        with self._lock:
+            self._cells, self._points = cells, points
+            self.loaded = True
+            self.loaded_at = time.monotonic()
+
+    '''
+    Whether the index must be (re)loaded: writes made by other processes,
+    such as `flask import venue` or `flask geo locate`, only reach it
+    through a reload every max_age seconds
+    '''
+    def stale(self, max_age):
+        return not self.loaded or time.monotonic() - self.loaded_at > max_age
+
+    def add(self, venue_id, lat, lon):
+        with self._lock:
+            self._discard(venue_id)
+            self._cells[_cell(lat, lon)][venue_id] = (lat, lon)
+            self._points[venue_id] = (lat, lon)
+
+    def remove(self, venue_id):
+        with self._lock:
+            self._discard(venue_id)
+
+    def _discard(self, venue_id):
+        point = self._points.pop(venue_id, None)
+        if point is None:
+            return
+        cell = _cell(*point)
+        self._cells[cell].pop(venue_id, None)
+        if not self._cells[cell]:
+            del self._cells[cell]
+
+    def _candidates(self, rows, cols):
+        # Reads the cells of the box, or every occupied cell if fewer.
+        if len(rows) * len(cols) > len(self._cells):
+            return [
+                (venue_id, point)
+                for cell, venues in self._cells.items()
+                if cell[0] in rows and cell[1] in cols
+                for venue_id, point in venues.items()]
+        return [
+            (venue_id, point)
+            for row in rows for col in cols
+            for venue_id, point in self._cells.get((row, col), {}).items()]
+
+    '''
+    (distance_km, venue_id) of the venues within radius_km, nearest first
+    '''
+    def within(self, lat, lon, radius_km, limit=None):
+        lat_span = radius_km / KM_PER_DEGREE
+        south, north = max(lat - lat_span, -90), min(lat + lat_span, 90)
+        cos_lat = cos(radians(max(abs(south), abs(north))))
+        lon_span = 180 if cos_lat < 1e-6 else min(
+            radius_km / (KM_PER_DEGREE * cos_lat), 180)
+        rows = range(
+            floor(south / CELL_DEGREES), floor(north / CELL_DEGREES) + 1)
+        if lon_span >= 180:
+            cols = range(COLUMNS)
+        else:
+            cols = {col % COLUMNS for col in range(
+                floor((lon - lon_span) / CELL_DEGREES),
+                floor((lon + lon_span) / CELL_DEGREES) + 1)}
+        with self._lock:
+            candidates = self._candidates(rows, cols)
+        found = [
+            (distance, venue_id) for distance, venue_id in (
+                (distance_km(lat, lon, *point), venue_id)
+                for venue_id, point in candidates)
+            if distance <= radius_km]
+        found.sort()
+        return found[:limit] if limit else found
+
+    '''
+    (distance_km, venue_id) of the k venues nearest to a point, within
+    max_km
+    '''
+    def nearest(self, lat, lon, k, max_km):
+        # The box edges are measured from the unwrapped column.
+        row, col = floor(lat / CELL_DEGREES), floor(lon / CELL_DEGREES)
+        found, ring = [], 0
+        with self._lock:
+            while self._points:
+                found.extend(
+                    (distance_km(lat, lon, *point), venue_id)
+                    for d_row in range(-ring, ring + 1)
+                    for d_col in range(-ring, ring + 1)
+                    if max(abs(d_row), abs(d_col)) == ring
+                    for venue_id, point in self._cells.get(
+                        (row + d_row, (col + d_col) % COLUMNS), {}).items())
+                # Nothing outside the box is closer than its nearest edge.
+                south = (row - ring) * CELL_DEGREES
+                north = (row + ring + 1) * CELL_DEGREES
+                cos_lat = cos(radians(min(max(abs(south), abs(north)), 90)))
+                covered = min(
+                    (lat - south) * KM_PER_DEGREE,
+                    (north - lat) * KM_PER_DEGREE,
+                    (lon - (col - ring) * CELL_DEGREES) * KM_PER_DEGREE * cos_lat,
+                    ((col + ring + 1) * CELL_DEGREES - lon) * KM_PER_DEGREE * cos_lat)
+                if covered >= max_km or sum(
+                        1 for distance, _ in found if distance <= covered) >= k:
+                    break
+                if ((2 * ring + 1) ** 2 >= len(self._cells)
+                        or 2 * ring + 3 > COLUMNS):
+                    # The box outgrew the occupied cells, or would wrap
+                    # onto itself: check every venue.
+                    found = [
+                        (distance_km(lat, lon, *point), venue_id)
+                        for venue_id, point in self._points.items()]
+                    break
+                ring += 1
+        return nsmallest(k, (
+            (distance, venue_id) for distance, venue_id in found
+            if distance <= max_km))
+
+
+geo_index = GridIndex()
+
+
+def load_geo_index():
+    geo_index.load(db.session.execute(select(
+        venue_table.c.id, venue_table.c.latitude, venue_table.c.longitude).where(
+        venue_table.c.latitude.isnot(None),
+        venue_table.c.longitude.isnot(None))))
+
+
+def _located(venue):
+    state = inspect(venue)
+    pinned = any(
+        state.attrs[name].history.has_changes()
+        for name in ('latitude', 'longitude'))
+    moved = any(
+        state.attrs[name].history.has_changes() for name in ('city', 'state'))
+    if not pinned and (moved or venue.latitude is None):
+        venue.latitude, venue.longitude = (
+            locate(venue.city, venue.state) or (None, None))
+
+
+@event.listens_for(Venue, 'before_insert')
+@event.listens_for(Venue, 'before_update')
+def _venue_saving(mapper, connection, venue):
+    _located(venue)
+
+
+def _record(venue, point):
+    object_session(venue).info.setdefault('geo_changes', []).append(
+        (venue.id, point))
+
+
+@event.listens_for(Venue, 'after_insert')
+@event.listens_for(Venue, 'after_update')
+def _venue_saved(mapper, connection, venue):
+    _record(venue, (venue.latitude, venue.longitude))
+
+
+@event.listens_for(Venue, 'after_delete')
+def _venue_deleted(mapper, connection, venue):
+    _record(venue, None)
+
+
+@event.listens_for(Session, 'after_commit')
+def _apply_changes(session):
+    for venue_id, point in session.info.pop('geo_changes', ()):
+        if point is None or None in point:
+            geo_index.remove(venue_id)
+        else:
+            geo_index.add(venue_id, *point)
+
+
+# Changes of a transaction that ended without committing are dropped.
+@event.listens_for(Session, 'after_transaction_end')
+def _drop_changes(session, transaction):
+    if transaction.parent is None:
+        session.info.pop('geo_changes', None)
+
+
+'''
+Sets the coordinates of venues (all, or the given ids) from the gazetteer,
+with one executemany. Returns the number of venues located.
+'''
+def locate_venues(venue_ids=None):
+    query = select(venue_table.c.id, venue_table.c.city, venue_table.c.state)
+    if venue_ids is not None:
+        query = query.where(venue_table.c.id.in_(venue_ids))
+    rows = []
+    for venue_id, city, state in db.session.execute(query):
+        point = locate(city, state) or (None, None)
+        rows.append({'venue_id': venue_id, 'lat': point[0], 'lon': point[1]})
+    if rows:
+        db.session.execute(venue_table.update().where(
+            venue_table.c.id == bindparam('venue_id')).values(
+            latitude=bindparam('lat'), longitude=bindparam('lon')), rows)
+    return sum(1 for row in rows if row['lat'] is not None)
+
+
+'''
+Re-reads the coordinates of the given venues into the index after a write
+that bypassed the ORM
+'''
+def refresh_geo_index(venue_ids):
+    points = {
+        venue_id: (lat, lon) for venue_id, lat, lon in db.session.execute(
+            select(venue_table.c.id, venue_table.c.latitude,
+                   venue_table.c.longitude).where(
+                venue_table.c.id.in_(venue_ids)))}
+    for venue_id in venue_ids:
+        lat, lon = points.get(venue_id, (None, None))
+        if lat is None or lon is None:
+            geo_index.remove(venue_id)
+        else:
+            geo_index.add(venue_id, lat, lon)
+
+
+'''
+Fills the grid index when the app is created. A database that is not
+ready yet (e.g. before migrations) is tolerated; the index then loads on
+the first nearby request instead.
+'''
+def setup_geo(app):
+    with app.app_context():
+        try:
+            load_geo_index()
+        except SQLAlchemyError:
+            app.logger.warning('Geo index not loaded at startup')
+        finally:
+            db.session.remove()
+
+
+'''
+Commands for venue coordinates
+'''
+@click.group('geo')
+def geo_command():
+    pass
+
+
+@geo_command.command('locate')
+@click.option('--missing', is_flag=True,
+              help='Only venues without coordinates.')
+@with_appcontext
+def locate_command(missing):
+    venue_ids = None
+    if missing:
+        venue_ids = db.session.execute(select(venue_table.c.id).where(
+            venue_table.c.latitude.is_(None))).scalars().all()
+    located = locate_venues(venue_ids)
+    db.session.commit()
+    click.echo('Located {} venues'.format(located))
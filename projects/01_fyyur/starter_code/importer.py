@@ -0,0 +1,285 @@
+import csv
+from datetime import datetime
+import io
+import json
+import math
+import os
+from itertools import islice
+import click
+import dateutil.parser
+from flask.cli import with_appcontext
+from sqlalchemy import ARRAY, Boolean, DateTime, Float, Integer, text
+from sqlalchemy.exc import IntegrityError
+from booking import check_bookings
+from counters import count_shows
+from facets import facet_cache
+from feed import refresh_feed
+from geo import locate
+from models import Artist, Show, Venue, db
+
+MODELS = {'artist': Artist, 'venue': Venue, 'show': Show}
+
+# Columns that must be present for a row to be loaded.
+REQUIRED = {
+    'artist': ('name',),
+    'venue': ('name',),
+    'show': ('artist_id', 'venue_id', 'start_time'),
+}
+
+TRUE_VALUES = ('1', 'true', 't', 'yes', 'y')
+
+# Largest absolute value of the coordinate columns.
+COORDINATE_LIMITS = {'latitude': 90, 'longitude': 180}
+
+
+'''
+Yields (line number, row) from a .csv or .jsonl file. A JSONL line that
+does not parse is yielded as its JSONDecodeError, and one that holds
+something other than an object as that value; validate rejects both.
+'''
+def read_rows(path):
+    with open(path, newline='', encoding='utf-8') as source:
+        if path.endswith('.jsonl') or path.endswith('.ndjson'):
+            for number, line in enumerate(source, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                except json.JSONDecodeError as error:
+                    row = error
+                yield number, row
+        else:
+            # Line 1 is the header.
+            for number, row in enumerate(csv.DictReader(source), start=2):
+                yield number, row
+
+
+'''
+Converts a raw value to the Python type of the column it targets
+'''
+def coerce(column, value):
+    if value is None or value == '':
+        return None
+    # Unwrap with_variant() types such as genres.
+    column_type = getattr(column.type, 'impl', column.type)
+    if isinstance(column_type, ARRAY):
+        if isinstance(value, str):
+            value = [item.strip() for item in value.split(',') if item.strip()]
+        return list(value)
+    if isinstance(column_type, Float):
+        if isinstance(value, bool) or not isinstance(value, (str, int, float)):
+            raise ValueError('{} must be a number'.format(column.name))
+        value = float(value)
+        limit = COORDINATE_LIMITS.get(column.name, math.inf)
+        if not (math.isfinite(value) and -limit <= value <= limit):
+            raise ValueError('{} is out of range'.format(column.name))
+        return value
+    if isinstance(value, str):
+        if isinstance(column_type, Boolean):
+            return value.strip().lower() in TRUE_VALUES
+        if isinstance(column_type, Integer):
+            return int(value)
+        if isinstance(column_type, DateTime):
+            return dateutil.parser.parse(value, ignoretz=True)
+    # JSON rows can carry numbers, lists or objects anywhere.
+    if isinstance(column_type, DateTime) and not isinstance(value, datetime):
+        raise ValueError('{} must be a date and time'.format(column.name))
+    if isinstance(column_type, Integer) and (
+            isinstance(value, bool) or not isinstance(value, int)):
+        raise ValueError('{} must be an integer'.format(column.name))
+    return value
+
+
+'''
+Splits a batch into insertable rows and (line, row, error) rejects
+'''
+def validate(entity, batch):
+    table = MODELS[entity].__table__
+    valid, rejects = [], []
+    for number, raw in batch:
+        if isinstance(raw, json.JSONDecodeError):
+            rejects.append((
+                number, raw.doc.rstrip('\r\n'), 'invalid JSON: ' + str(raw)))
+            continue
+        try:
+            if not isinstance(raw, dict):
+                raise ValueError('not an object')
+            row = {
+                name: coerce(table.c[name], value)
+                for name, value in raw.items() if name in table.c
+            }
+            missing = [name for name in REQUIRED[entity] if row.get(name) is None]
+            if missing:
+                raise ValueError('missing ' + ', '.join(missing))
+            if entity == 'artist':
+                row.setdefault('seeking_venue', False)
+            elif entity == 'venue':
+                row.setdefault('seeking_talent', False)
+                if row.get('latitude') is None or row.get('longitude') is None:
+                    row['latitude'], row['longitude'] = (
+                        locate(row.get('city'), row.get('state')) or (None, None))
+            valid.append((number, raw, row))
+        except (ValueError, TypeError, OverflowError) as error:
+            rejects.append((number, raw, str(error)))
+    if entity == 'show':
+        valid, orphans = check_show_references(valid)
+        rejects.extend(orphans)
+        valid, conflicts = check_bookings(valid)
+        rejects.extend(conflicts)
+    return valid, rejects
+
+
+'''
+Validates the artist and venue ids of a whole batch with one query each
+'''
+def check_show_references(valid):
+    known = {}
+    for model, key in ((Artist, 'artist_id'), (Venue, 'venue_id')):
+        ids = {row[key] for _, _, row in valid}
+        known[key] = {
+            entity_id for entity_id, in
+            db.session.query(model.id).filter(model.id.in_(ids))
+        } if ids else set()
+    kept, orphans = [], []
+    for number, raw, row in valid:
+        missing = [key for key in known if row[key] not in known[key]]
+        if missing:
+            orphans.append((number, raw, 'unknown ' + ', '.join(missing)))
+        else:
+            kept.append((number, raw, row))
+    return kept, orphans
+
+
+def _copy_value(value):
+    if value is None:
+        return None
+    if isinstance(value, list):
+        return '{' + ','.join(
+            '"' + item.replace('\\', '\\\\').replace('"', '\\"') + '"'
+            for item in value) + '}'
+    return value
+
+
+'''
+Inserts rows with COPY on Postgres and executemany elsewhere, and counts
+imported shows on their artist and venue
+'''
+def insert_rows(entity, rows):
+    if not rows:
+        return
+    table = MODELS[entity].__table__
+    columns = [column.name for column in table.columns if any(
+        column.name in row for row in rows)]
+    rows = [{name: row.get(name) for name in columns} for row in rows]
+    if db.engine.dialect.name == 'postgresql':
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            writer.writerow([_copy_value(row[name]) for name in columns])
+        buffer.seek(0)
+        cursor = db.session.connection().connection.cursor()
+        cursor.copy_expert(
+            'COPY {} ({}) FROM STDIN WITH (FORMAT csv)'.format(
+                table.name, ', '.join(columns)),
+            buffer)
+    else:
+        db.session.execute(table.insert(), rows)
+    if entity == 'show':
+        # Bulk inserts skip the ORM events that maintain the counters.
+        count_shows(db.session.connection(), (
+            (row['artist_id'], row['venue_id'], row['start_time'])
+            for row in rows))
+    else:
+        facet_cache.forget(entity + 's')
+
+
+'''
+Inserts rows one at a time, each in its own savepoint, after a batch
+failed on a constraint. Returns the inserted rows and (line, row, error)
+rejects for the rows the database refused.
+'''
+def insert_one_by_one(entity, valid):
+    inserted, failed = [], []
+    for number, raw, row in valid:
+        try:
+            with db.session.begin_nested():
+                insert_rows(entity, [row])
+        except IntegrityError as error:
+            failed.append((number, raw, str(error.orig).strip()))
+        else:
+            inserted.append((number, raw, row))
+    return inserted, failed
+
+
+'''
+Moves the id sequence past explicitly imported ids on Postgres
+'''
+def sync_sequence(entity):
+    if db.engine.dialect.name == 'postgresql':
+        table = MODELS[entity].__tablename__
+        db.session.execute(text(
+            "SELECT setval(pg_get_serial_sequence(:table, 'id'), "
+            "coalesce((SELECT max(id) FROM \"{}\"), 0) + 1, false)".format(table)),
+            {'table': table})
+        db.session.commit()
+
+
+'''
+Bulk loads artists, venues or shows from a CSV or JSONL file.
+Rows are committed in batches; rejected rows go to the rejects file and a
+checkpoint next to the source records progress so --resume can continue
+an interrupted import. Running servers pick up imported venues in their
+grid index within GEO_INDEX_MAX_AGE, and imported shows in their cached
+availability within AVAILABILITY_CACHE_TTL.
+'''
+@click.command('import')
+@click.argument('entity', type=click.Choice(sorted(MODELS)))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--batch-size', default=5000, show_default=True)
+@click.option('--rejects', 'rejects_path', default=None,
+              help='Rejects file (default: PATH.rejects.jsonl).')
+@click.option('--resume', is_flag=True,
+              help='Continue from the last committed batch.')
+@with_appcontext
+def import_command(entity, path, batch_size, rejects_path, resume):
+    checkpoint = path + '.checkpoint'
+    rejects_path = rejects_path or path + '.rejects.jsonl'
+    done = 0
+    if resume and os.path.exists(checkpoint):
+        with open(checkpoint) as f:
+            done = int(f.read().strip() or 0)
+    rows = islice(read_rows(path), done, None)
+    loaded = rejected = 0
+    with open(rejects_path, 'a' if resume else 'w', encoding='utf-8') as rejects:
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                break
+            valid, bad = validate(entity, batch)
+            try:
+                with db.session.begin_nested():
+                    insert_rows(entity, [row for _, _, row in valid])
+            except IntegrityError:
+                # One refused row fails a whole COPY or executemany.
+                valid, refused = insert_one_by_one(entity, valid)
+                bad.extend(refused)
+            db.session.commit()
+            for number, raw, error in bad:
+                rejects.write(json.dumps(
+                    {'line': number, 'error': error, 'row': raw},
+                    default=str) + '\n')
+            rejects.flush()
+            done += len(batch)
+            loaded += len(valid)
+            rejected += len(bad)
+            with open(checkpoint, 'w') as f:
+                f.write(str(done))
+            click.echo('{} rows read, {} loaded, {} rejected'.format(
+                done, loaded, rejected))
+    sync_sequence(entity)
+    if entity == 'show':
+        refresh_feed()
+    if os.path.exists(checkpoint):
+        os.remove(checkpoint)
+    click.echo('Imported {} {} rows ({} rejected, see {})'.format(
+        loaded, entity, rejected, rejects_path))
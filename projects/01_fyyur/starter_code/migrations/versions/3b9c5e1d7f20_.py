@@ -0,0 +1,50 @@
+"""show counters on artist and venue
+
+Revision ID: 3b9c5e1d7f20
+Revises: e321affa3111
+Create Date: 2026-10-18 18:40:03.112574
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3b9c5e1d7f20'
+down_revision = 'e321affa3111'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'show_counter_watermark',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('rolled_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id'))
+    # start_time is stored as local time, so the watermark is too.
+    op.execute(
+        'INSERT INTO show_counter_watermark (rolled_at) VALUES (LOCALTIMESTAMP)')
+    for table, key in (('artist', 'artist_id'), ('venue', 'venue_id')):
+        op.add_column(table, sa.Column(
+            'upcoming_shows_count', sa.Integer(), nullable=False,
+            server_default='0'))
+        op.add_column(table, sa.Column(
+            'past_shows_count', sa.Integer(), nullable=False,
+            server_default='0'))
+        op.execute(
+            'UPDATE {table} SET '
+            'upcoming_shows_count = (SELECT count(*) FROM show '
+            'WHERE show.{key} = {table}.id '
+            'AND show.start_time > (SELECT rolled_at FROM show_counter_watermark)), '
+            'past_shows_count = (SELECT count(*) FROM show '
+            'WHERE show.{key} = {table}.id '
+            'AND show.start_time <= (SELECT rolled_at FROM show_counter_watermark))'
+            .format(table=table, key=key))
+
+
+def downgrade():
+    for table in ('venue', 'artist'):
+        op.drop_column(table, 'past_shows_count')
+        op.drop_column(table, 'upcoming_shows_count')
+    op.drop_table('show_counter_watermark')
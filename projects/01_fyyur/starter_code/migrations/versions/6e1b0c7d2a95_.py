@@ -0,0 +1,37 @@
+"""venue double-booking exclusion constraint
+
+Revision ID: 6e1b0c7d2a95
+Revises: 9d2a4f6c8e13
+Create Date: 2026-10-18 21:03:17.524690
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6e1b0c7d2a95'
+down_revision = '9d2a4f6c8e13'
+branch_labels = None
+depends_on = None
+
+
+# Postgres only; the interval must match booking.SHOW_DURATION. Fails if the
+# table already holds overlapping shows at a venue: find them with
+#   SELECT a.id, b.id FROM show a JOIN show b ON a.venue_id = b.venue_id
+#   AND a.id < b.id AND abs(extract(epoch FROM a.start_time - b.start_time))
+#   < 3 * 3600;
+def upgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+    op.execute(
+        'ALTER TABLE show ADD CONSTRAINT show_venue_no_overlap '
+        'EXCLUDE USING gist (venue_id WITH =, '
+        "tsrange(start_time, start_time + interval '3 hours') WITH &&)")
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute('ALTER TABLE show DROP CONSTRAINT show_venue_no_overlap')
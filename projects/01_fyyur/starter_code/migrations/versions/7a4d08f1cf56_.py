@@ -0,0 +1,34 @@
+"""updated_at on artist, venue and show
+
+Revision ID: 7a4d08f1cf56
+Revises: c785264a9e97
+Create Date: 2026-10-18 11:02:17.640918
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7a4d08f1cf56'
+down_revision = 'c785264a9e97'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # The server default stamps existing rows and rows loaded by COPY;
+    # the ORM sets the value itself on insert and update.
+    for table in ('artist', 'venue', 'show'):
+        op.add_column(table, sa.Column(
+            'updated_at', sa.DateTime(), nullable=False,
+            server_default=sa.text("timezone('utc', now())")))
+        op.create_index(
+            op.f('ix_{}_updated_at'.format(table)), table, ['updated_at'],
+            unique=False)
+
+
+def downgrade():
+    for table in ('show', 'venue', 'artist'):
+        op.drop_index(op.f('ix_{}_updated_at'.format(table)), table_name=table)
+        op.drop_column(table, 'updated_at')
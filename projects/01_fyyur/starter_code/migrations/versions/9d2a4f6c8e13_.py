@@ -0,0 +1,52 @@
+"""upcoming shows feed table
+
+Revision ID: 9d2a4f6c8e13
+Revises: 3b9c5e1d7f20
+Create Date: 2026-10-18 19:12:45.308215
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9d2a4f6c8e13'
+down_revision = '3b9c5e1d7f20'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'show_feed',
+        sa.Column('show_id', sa.Integer(), nullable=False),
+        sa.Column('start_time', sa.DateTime(), nullable=False),
+        sa.Column('artist_id', sa.Integer(), nullable=False),
+        sa.Column('venue_id', sa.Integer(), nullable=False),
+        sa.Column('artist_name', sa.String(), nullable=True),
+        sa.Column('artist_image_link', sa.String(length=500), nullable=True),
+        sa.Column('venue_name', sa.String(), nullable=True),
+        sa.ForeignKeyConstraint(['show_id'], ['show.id'], ondelete='cascade'),
+        sa.PrimaryKeyConstraint('show_id'))
+    op.create_index(
+        'ix_show_feed_start_time_show_id', 'show_feed',
+        ['start_time', 'show_id'], unique=False)
+    op.create_index(
+        op.f('ix_show_feed_artist_id'), 'show_feed', ['artist_id'], unique=False)
+    op.create_index(
+        op.f('ix_show_feed_venue_id'), 'show_feed', ['venue_id'], unique=False)
+    op.execute(
+        'INSERT INTO show_feed (show_id, start_time, artist_id, venue_id, '
+        'artist_name, artist_image_link, venue_name) '
+        'SELECT show.id, show.start_time, show.artist_id, show.venue_id, '
+        'artist.name, artist.image_link, venue.name FROM show '
+        'JOIN artist ON artist.id = show.artist_id '
+        'JOIN venue ON venue.id = show.venue_id '
+        'WHERE show.start_time > LOCALTIMESTAMP')
+
+
+def downgrade():
+    op.drop_index(op.f('ix_show_feed_venue_id'), table_name='show_feed')
+    op.drop_index(op.f('ix_show_feed_artist_id'), table_name='show_feed')
+    op.drop_index('ix_show_feed_start_time_show_id', table_name='show_feed')
+    op.drop_table('show_feed')
@@ -0,0 +1,54 @@
+"""genre and area indexes for facets
+
+Revision ID: a4c7e9f2b6d1
+Revises: 6e1b0c7d2a95
+Create Date: 2026-10-18 22:41:09.631045
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a4c7e9f2b6d1'
+down_revision = '6e1b0c7d2a95'
+branch_labels = None
+depends_on = None
+
+# name, table, columns
+INDEXES = [
+    # facets filtered by city and state on artists
+    ('ix_artist_state_city_id', 'artist', ['state', 'city', 'id']),
+]
+
+# name, table, column; GIN indexes for genres @> ARRAY[...], Postgres only
+GIN_INDEXES = [
+    ('ix_artist_genres', 'artist', 'genres'),
+    ('ix_venue_genres', 'venue', 'genres'),
+]
+
+
+def upgrade():
+    postgresql = op.get_bind().dialect.name == 'postgresql'
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(
+                name, table, columns, unique=False,
+                postgresql_concurrently=True)
+        if postgresql:
+            for name, table, column in GIN_INDEXES:
+                op.create_index(
+                    name, table, [column], unique=False,
+                    postgresql_using='gin', postgresql_concurrently=True)
+
+
+def downgrade():
+    postgresql = op.get_bind().dialect.name == 'postgresql'
+    with op.get_context().autocommit_block():
+        if postgresql:
+            for name, table, column in reversed(GIN_INDEXES):
+                op.drop_index(
+                    name, table_name=table, postgresql_concurrently=True)
+        for name, table, columns in reversed(INDEXES):
+            op.drop_index(
+                name, table_name=table, postgresql_concurrently=True)
@@ -0,0 +1,27 @@
+"""venue coordinates
+
+Revision ID: b8d3f5a1c7e2
+Revises: a4c7e9f2b6d1
+Create Date: 2026-10-18 23:26:52.180374
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b8d3f5a1c7e2'
+down_revision = 'a4c7e9f2b6d1'
+branch_labels = None
+depends_on = None
+
+
+# Fill the new columns afterwards with `flask geo locate`.
+def upgrade():
+    op.add_column('venue', sa.Column('latitude', sa.Float(), nullable=True))
+    op.add_column('venue', sa.Column('longitude', sa.Float(), nullable=True))
+
+
+def downgrade():
+    op.drop_column('venue', 'longitude')
+    op.drop_column('venue', 'latitude')
@@ -0,0 +1,32 @@
+"""deletion marks for Last-Modified
+
+Revision ID: c2e6a9d4b7f3
+Revises: b8d3f5a1c7e2
+Create Date: 2026-10-19 09:41:17.402958
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c2e6a9d4b7f3'
+down_revision = 'b8d3f5a1c7e2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'deletion_mark',
+        sa.Column('table_name', sa.String(length=64), nullable=False),
+        sa.Column('deleted_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('table_name'))
+    # One row per table, so recording a delete is a plain UPDATE.
+    op.execute(
+        "INSERT INTO deletion_mark (table_name, deleted_at) VALUES "
+        "('artist', timezone('utc', now())), ('venue', timezone('utc', now()))")
+
+
+def downgrade():
+    op.drop_table('deletion_mark')
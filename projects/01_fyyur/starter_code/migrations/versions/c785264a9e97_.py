@@ -0,0 +1,50 @@
+"""search indexes for artists and venues
+
+Revision ID: c785264a9e97
+Revises: 5f4e42f2a67b
+Create Date: 2026-10-18 10:12:41.528310
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c785264a9e97'
+down_revision = '5f4e42f2a67b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    # array_to_string() is only STABLE, so the search document is wrapped in
+    # an IMMUTABLE function that an expression index can be built on.
+    op.execute("""
+        CREATE OR REPLACE FUNCTION fyyur_search_document(
+            name varchar, city varchar, state varchar, genres varchar[])
+        RETURNS tsvector
+        LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+            SELECT to_tsvector('simple'::regconfig,
+                coalesce(name, '') || ' ' ||
+                coalesce(city, '') || ' ' ||
+                coalesce(state, '') || ' ' ||
+                coalesce(array_to_string(genres, ' '), ''))
+        $$
+    """)
+    for table in ('artist', 'venue'):
+        op.execute(
+            'CREATE INDEX ix_{0}_search_document ON {0} USING gin '
+            '(fyyur_search_document(name, city, state, genres))'.format(table))
+        op.execute(
+            'CREATE INDEX ix_{0}_name_trgm ON {0} USING gin '
+            '(name gin_trgm_ops)'.format(table))
+
+
+def downgrade():
+    for table in ('artist', 'venue'):
+        op.execute('DROP INDEX IF EXISTS ix_{}_name_trgm'.format(table))
+        op.execute('DROP INDEX IF EXISTS ix_{}_search_document'.format(table))
+    op.execute(
+        'DROP FUNCTION IF EXISTS '
+        'fyyur_search_document(varchar, varchar, varchar, varchar[])')
@@ -0,0 +1,45 @@
+"""indexes for show lookups and venue areas
+
+Revision ID: e321affa3111
+Revises: 7a4d08f1cf56
+Create Date: 2026-10-18 12:20:05.117342
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e321affa3111'
+down_revision = '7a4d08f1cf56'
+branch_labels = None
+depends_on = None
+
+# name, table, columns
+INDEXES = [
+    # show_artist: shows of an artist ordered by start_time
+    ('ix_show_artist_id_start_time', 'show', ['artist_id', 'start_time']),
+    # show_venue: shows of a venue ordered by start_time
+    ('ix_show_venue_id_start_time', 'show', ['venue_id', 'start_time']),
+    # show feed: date window ordered by (start_time, id)
+    ('ix_show_start_time_id', 'show', ['start_time', 'id']),
+    # venues by area: GROUP BY state, city and area pages ordered by id
+    ('ix_venue_state_city_id', 'venue', ['state', 'city', 'id']),
+]
+
+
+def upgrade():
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction and does not
+    # block writes while it builds.
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(
+                name, table, columns, unique=False,
+                postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, table, columns in reversed(INDEXES):
+            op.drop_index(
+                name, table_name=table, postgresql_concurrently=True)
@@ -0,0 +1,244 @@
+from datetime import datetime
+import sqlite3
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from dbpool import engine_options
+from routing import RoutingSQLAlchemy, setup_replicas
+
+db = RoutingSQLAlchemy()
+
+
+'''
+Binds a flask application and a SQLAlchemy service.
+test_config overrides settings from config.py, e.g. the database URI.
+'''
+def setup_db(app, test_config=None):
+    app.config.from_object('config')
+    if test_config:
+        app.config.update(test_config)
+    app.config.setdefault(
+        'SQLALCHEMY_ENGINE_OPTIONS', engine_options(app.config))
+    setup_replicas(app)
+    db.app = app
+    db.init_app(app)
+
+
+'''
+SQLite only enforces foreign keys, and so the ON DELETE CASCADE of shows
+the show counters rely on, when asked to on each connection
+'''
+@event.listens_for(Engine, 'connect')
+def enable_sqlite_foreign_keys(dbapi_connection, connection_record):
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        cursor = dbapi_connection.cursor()
+        cursor.execute('PRAGMA foreign_keys=ON')
+        cursor.close()
+
+
+'''
+Venue
+'''
+class Venue(db.Model):
+    __tablename__ = 'venue'
+    __table_args__ = (
+        db.Index('ix_venue_state_city_id', 'state', 'city', 'id'),
+        # GIN on Postgres for genre facets; a plain index elsewhere.
+        db.Index('ix_venue_genres', 'genres', postgresql_using='gin'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String)
+    city = db.Column(db.String(120))
+    state = db.Column(db.String(120))
+    address = db.Column(db.String(120))
+    phone = db.Column(db.String(120))
+    # JSON on SQLite so the schema can be created for local runs.
+    genres = db.Column(
+        db.ARRAY(db.String(120)).with_variant(db.JSON, 'sqlite'))
+    image_link = db.Column(db.String(500))
+    facebook_link = db.Column(db.String(500))
+    website_link = db.Column(db.String(500))
+    seeking_talent = db.Column(db.Boolean, nullable=False, default=False)
+    seeking_description = db.Column(db.String(500))
+    # City (or state) centroid from the gazetteer, set by geo.py.
+    latitude = db.Column(db.Float)
+    longitude = db.Column(db.Float)
+    # Shows before/after the counters watermark, maintained by counters.py.
+    upcoming_shows_count = db.Column(
+        db.Integer, nullable=False, default=0, server_default='0')
+    past_shows_count = db.Column(
+        db.Integer, nullable=False, default=0, server_default='0')
+    updated_at = db.Column(
+        db.DateTime,
+        nullable=False,
+        default=datetime.utcnow,
+        onupdate=datetime.utcnow,
+        index=True)
+    shows = db.relationship(
+        'Show',
+        backref='venue',
+        lazy=True,
+        cascade='all, delete-orphan',
+        passive_deletes=True)
+
+    def format(self):
+        return {
+            'id': self.id,
+            'name': self.name,
+            'city': self.city,
+            'state': self.state,
+            'address': self.address,
+            'phone': self.phone,
+            'genres': self.genres,
+            'image_link': self.image_link,
+            'facebook_link': self.facebook_link,
+            'website_link': self.website_link,
+            'seeking_talent': self.seeking_talent,
+            'seeking_description': self.seeking_description,
+            'latitude': self.latitude,
+            'longitude': self.longitude,
+            'num_upcoming_shows': self.upcoming_shows_count,
+            'num_past_shows': self.past_shows_count,
+        }
+
+    def __repr__(self):
+        return f'<Venue {self.id} {self.name}>'
+
+
+'''
+Artist
+'''
+class Artist(db.Model):
+    __tablename__ = 'artist'
+    __table_args__ = (
+        db.Index('ix_artist_state_city_id', 'state', 'city', 'id'),
+        # GIN on Postgres for genre facets; a plain index elsewhere.
+        db.Index('ix_artist_genres', 'genres', postgresql_using='gin'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String)
+    city = db.Column(db.String(120))
+    state = db.Column(db.String(120))
+    phone = db.Column(db.String(120))
+    # JSON on SQLite so the schema can be created for local runs.
+    genres = db.Column(
+        db.ARRAY(db.String(120)).with_variant(db.JSON, 'sqlite'))
+    image_link = db.Column(db.String(500))
+    facebook_link = db.Column(db.String(500))
+    website_link = db.Column(db.String(500))
+    seeking_venue = db.Column(db.Boolean, nullable=False, default=False)
+    seeking_description = db.Column(db.String(500))
+    # Shows before/after the counters watermark, maintained by counters.py.
+    upcoming_shows_count = db.Column(
+        db.Integer, nullable=False, default=0, server_default='0')
+    past_shows_count = db.Column(
+        db.Integer, nullable=False, default=0, server_default='0')
+    updated_at = db.Column(
+        db.DateTime,
+        nullable=False,
+        default=datetime.utcnow,
+        onupdate=datetime.utcnow,
+        index=True)
+    shows = db.relationship(
+        'Show',
+        backref='artist',
+        lazy=True,
+        cascade='all, delete-orphan',
+        passive_deletes=True)
+
+    def format(self):
+        return {
+            'id': self.id,
+            'name': self.name,
+            'city': self.city,
+            'state': self.state,
+            'phone': self.phone,
+            'genres': self.genres,
+            'image_link': self.image_link,
+            'facebook_link': self.facebook_link,
+            'website_link': self.website_link,
+            'seeking_venue': self.seeking_venue,
+            'seeking_description': self.seeking_description,
+            'num_upcoming_shows': self.upcoming_shows_count,
+            'num_past_shows': self.past_shows_count,
+        }
+
+    def __repr__(self):
+        return f'<Artist {self.id} {self.name}>'
+
+
+'''
+Show
+'''
+class Show(db.Model):
+    __tablename__ = 'show'
+    __table_args__ = (
+        db.Index('ix_show_artist_id_start_time', 'artist_id', 'start_time'),
+        db.Index('ix_show_venue_id_start_time', 'venue_id', 'start_time'),
+        db.Index('ix_show_start_time_id', 'start_time', 'id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    venue_id = db.Column(
+        db.Integer,
+        db.ForeignKey('venue.id', onupdate='cascade', ondelete='cascade'),
+        nullable=False)
+    artist_id = db.Column(
+        db.Integer,
+        db.ForeignKey('artist.id', onupdate='cascade', ondelete='cascade'),
+        nullable=False)
+    start_time = db.Column(db.DateTime, nullable=False)
+    updated_at = db.Column(
+        db.DateTime,
+        nullable=False,
+        default=datetime.utcnow,
+        onupdate=datetime.utcnow,
+        index=True)
+
+    def __repr__(self):
+        return f'<Show {self.id} {self.artist_id} {self.venue_id}>'
+
+
+'''
+Time up to which the show counters have been rolled: shows starting after
+it count as upcoming, the others as past
+'''
+class ShowCounterWatermark(db.Model):
+    __tablename__ = 'show_counter_watermark'
+
+    id = db.Column(db.Integer, primary_key=True)
+    rolled_at = db.Column(db.DateTime, nullable=False)
+
+
+'''
+Last time rows were deleted from a table. A delete leaves no updated_at
+behind, so listings fold this into their Last-Modified.
+'''
+class DeletionMark(db.Model):
+    __tablename__ = 'deletion_mark'
+
+    table_name = db.Column(db.String(64), primary_key=True)
+    deleted_at = db.Column(db.DateTime, nullable=False)
+
+
+'''
+Upcoming show with the artist and venue columns the show tiles need,
+maintained by feed.py so the feed is read without joins
+'''
+class ShowFeedEntry(db.Model):
+    __tablename__ = 'show_feed'
+    __table_args__ = (
+        db.Index('ix_show_feed_start_time_show_id', 'start_time', 'show_id'),
+    )
+
+    show_id = db.Column(
+        db.Integer,
+        db.ForeignKey('show.id', ondelete='cascade'),
+        primary_key=True)
+    start_time = db.Column(db.DateTime, nullable=False)
+    artist_id = db.Column(db.Integer, nullable=False, index=True)
+    venue_id = db.Column(db.Integer, nullable=False, index=True)
+    artist_name = db.Column(db.String)
+    artist_image_link = db.Column(db.String(500))
+    venue_name = db.Column(db.String)
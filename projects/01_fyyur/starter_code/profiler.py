@@ -0,0 +1,97 @@
+from collections import Counter
+import time
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+'''
+Raised in strict mode when a request repeats the same statement shape
+often enough to look like a lazy-load loop
+'''
+class NPlusOneError(Exception):
+    pass
+
+
+'''
+Statement count, DB time and statement shapes of one request
+'''
+class RequestProfile:
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.shapes = Counter()
+
+    def duplicates(self, threshold):
+        return [(shape, times) for shape, times in self.shapes.most_common()
+                if times >= threshold]
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _start_statement(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('profiler_start', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'handle_error')
+def _failed_statement(exception_context):
+    if exception_context.connection is not None:
+        starts = exception_context.connection.info.get('profiler_start')
+        if starts:
+            starts.pop()
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _end_statement(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info['profiler_start'].pop()
+    if not has_request_context():
+        return
+    profile = g.get('sql_profile')
+    if profile is not None:
+        profile.count += 1
+        profile.seconds += time.perf_counter() - started
+        # Statements are parameterized, so the SQL text is the shape.
+        profile.shapes[' '.join(statement.split())] += 1
+
+
+'''
+Hooks the SQL profiler into the app: every request gets X-Query-Count and
+Server-Timing headers, requests over the SQL_PROFILER_* thresholds are
+logged, and SQL_PROFILER_STRICT turns repeated statement shapes into
+NPlusOneError so tests fail on lazy-load loops.
+'''
+def setup_profiler(app):
+    if not app.config.get('SQL_PROFILER_ENABLED', True):
+        return
+
+    @app.before_request
+    def start_profile():
+        g.sql_profile = RequestProfile()
+
+    @app.after_request
+    def report_profile(response):
+        profile = g.get('sql_profile')
+        if profile is None:
+            return response
+        milliseconds = profile.seconds * 1000
+        response.headers['X-Query-Count'] = str(profile.count)
+        response.headers.add(
+            'Server-Timing',
+            'db;dur={:.2f};desc="{} statements"'.format(
+                milliseconds, profile.count))
+        duplicates = profile.duplicates(
+            app.config.get('SQL_PROFILER_DUPLICATE_THRESHOLD', 3))
+        if (profile.count > app.config.get('SQL_PROFILER_QUERY_THRESHOLD', 20)
+                or milliseconds > app.config.get('SQL_PROFILER_TIME_THRESHOLD_MS', 200)
+                or duplicates):
+            app.logger.warning(
+                '%s %s ran %d statements in %.1f ms; repeated: %s',
+                request.method, request.path, profile.count, milliseconds,
+                '; '.join('{}x {}'.format(times, shape[:200])
+                          for shape, times in duplicates) or 'none')
+        if duplicates and app.config.get('SQL_PROFILER_STRICT', False):
+            shape, times = duplicates[0]
+            raise NPlusOneError(
+                '{} {} repeated a statement {} times: {}'.format(
+                    request.method, request.path, times, shape))
+        return response
@@ -0,0 +1,103 @@
+from itertools import count
+import time
+from flask import g, has_request_context, request
+from flask_sqlalchemy import SignallingSession, SQLAlchemy, get_state
+from sqlalchemy import event, orm
+
+READ_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# Cookie holding the time until which a client that just wrote reads from
+# the primary. A plain cookie, since SECRET_KEY differs between workers.
+PRIMARY_COOKIE = 'fyyur_primary_until'
+
+_replica_counter = count()
+
+
+'''
+Picks the replica bind for the current request, or None for the primary.
+Read-only requests go to a replica unless the request has already written
+or the client wrote within the read-your-own-writes window.
+'''
+def replica_bind(app):
+    replicas = app.config.get('REPLICA_BINDS')
+    if not replicas or not has_request_context():
+        return None
+    if request.method not in READ_METHODS or g.get('db_wrote'):
+        return None
+    if 'db_replica' not in g:
+        try:
+            primary_until = float(request.cookies.get(PRIMARY_COOKIE, 0))
+        except ValueError:
+            primary_until = 0
+        if primary_until > time.time():
+            g.db_replica = None
+        else:
+            g.db_replica = replicas[next(_replica_counter) % len(replicas)]
+    return g.db_replica
+
+
+'''
+Session that sends reads of read-only requests to a replica bind
+'''
+class RoutingSession(SignallingSession):
+
+    def get_bind(self, mapper=None, clause=None):
+        bind = replica_bind(self.app)
+        if bind is not None:
+            return get_state(self.app).db.get_engine(self.app, bind=bind)
+        return super().get_bind(mapper, clause)
+
+
+'''
+SQLAlchemy extension whose sessions route reads to replicas
+'''
+class RoutingSQLAlchemy(SQLAlchemy):
+
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+
+'''
+Flags the current request as having written, so its remaining reads and
+the client's next requests use the primary
+'''
+@event.listens_for(RoutingSession, 'after_flush')
+def mark_flush_write(session, flush_context):
+    if has_request_context():
+        g.db_wrote = True
+
+
+@event.listens_for(RoutingSession, 'do_orm_execute')
+def mark_statement_write(state):
+    if has_request_context() and (
+            state.is_insert or state.is_update or state.is_delete):
+        g.db_wrote = True
+
+
+'''
+Registers the configured replica URIs as binds and the hooks that pin a
+client to the primary for READ_YOUR_WRITES_SECONDS after it writes
+'''
+def setup_replicas(app):
+    uris = app.config.get('SQLALCHEMY_REPLICA_URIS') or []
+    binds = dict(app.config.get('SQLALCHEMY_BINDS') or {})
+    keys = []
+    for number, uri in enumerate(uris):
+        key = 'replica_{}'.format(number)
+        binds[key] = uri
+        keys.append(key)
+    app.config['SQLALCHEMY_BINDS'] = binds
+    app.config['REPLICA_BINDS'] = keys
+    if not keys:
+        return
+
+    @app.after_request
+    def pin_to_primary(response):
+        if g.get('db_wrote'):
+            window = app.config.get('READ_YOUR_WRITES_SECONDS', 5)
+            response.set_cookie(
+                PRIMARY_COOKIE,
+                str(time.time() + window),
+                max_age=window,
+                httponly=True)
+        return response
@@ -0,0 +1,166 @@
+import re
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import Float, Integer, String, cast, func, or_, text
+from models import Artist, Venue, db
+
+SEARCH_RESULTS_PER_PAGE = 20
+
+# Columns folded into the search document of each searchable model.
+SEARCH_COLUMNS = ('name', 'city', 'state', 'genres')
+
+SEARCH_MODELS = (Artist, Venue)
+
+# SQLite FTS5 tables this process has found.
+_sqlite_indexes = set()
+
+
+'''
+Splits a search term into lowercase word tokens
+'''
+def tokenize(term):
+    return re.findall(r'\w+', (term or '').lower())
+
+
+'''
+Searches artists or venues by name, city, state and genres.
+Returns one page of (model, total) rows, best matches first. Postgres uses
+the tsvector and trigram indexes from the search migration, SQLite the FTS5
+table built by `flask search build`; without it, and on any other
+database, the search falls back to ILIKE.
+'''
+def search(model, term, page=1, per_page=SEARCH_RESULTS_PER_PAGE):
+    tokens = tokenize(term)
+    total = func.count().over().label('total')
+    query = db.session.query(model, total)
+    if tokens:
+        dialect = db.engine.dialect.name
+        if dialect == 'postgresql':
+            query = _postgres_query(query, model, term, tokens)
+        elif dialect == 'sqlite' and has_sqlite_index(model):
+            query = _sqlite_query(query, model, tokens)
+        else:
+            query = _ilike_query(query, model, tokens)
+    else:
+        query = query.order_by(model.id)
+    rows = query.offset((page - 1) * per_page).limit(per_page).all()
+    count = rows[0].total if rows else 0
+    return [row[0] for row in rows], count
+
+
+def _postgres_query(query, model, term, tokens):
+    # fyyur_search_document() is the IMMUTABLE function the GIN index is
+    # built on, so the planner can match the expression to the index.
+    document = func.fyyur_search_document(
+        *[getattr(model, column) for column in SEARCH_COLUMNS])
+    tsquery = func.to_tsquery(
+        'simple', ' & '.join(token + ':*' for token in tokens))
+    rank = func.ts_rank(document, tsquery) + func.similarity(model.name, term)
+    return query.filter(or_(
+        document.op('@@')(tsquery),
+        model.name.op('%')(term))).order_by(rank.desc(), model.id)
+
+
+def _sqlite_query(query, model, tokens):
+    table = model.__tablename__ + '_search'
+    match = ' '.join('"{}"*'.format(token) for token in tokens)
+    ranked = text(
+        'SELECT rowid AS id, bm25({0}) AS rank FROM {0} '
+        'WHERE {0} MATCH :match'.format(table)).bindparams(
+        match=match).columns(id=Integer, rank=Float).subquery()
+    return query.join(ranked, ranked.c.id == model.id).order_by(
+        ranked.c.rank, model.id)
+
+
+def _ilike_query(query, model, tokens):
+    for token in tokens:
+        pattern = '%' + token + '%'
+        query = query.filter(or_(
+            model.name.ilike(pattern),
+            model.city.ilike(pattern),
+            model.state.ilike(pattern),
+            # The text of the genres array or JSON list.
+            cast(model.genres, String).ilike(pattern)))
+    return query.order_by(model.id)
+
+
+def _sqlite_table_exists(table):
+    return db.session.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+        {'name': table}).scalar() is not None
+
+
+'''
+Whether the FTS5 table of a model exists; a table once found is not
+looked up again
+'''
+def has_sqlite_index(model):
+    table = model.__tablename__ + '_search'
+    key = (str(db.engine.url), table)
+    if key in _sqlite_indexes:
+        return True
+    if _sqlite_table_exists(table):
+        _sqlite_indexes.add(key)
+        return True
+    return False
+
+
+'''
+Creates the FTS5 table mirroring a model, with triggers keeping it in
+sync, and backfills it. Does nothing when the table exists.
+'''
+def build_sqlite_index(model):
+    source = model.__tablename__
+    table = source + '_search'
+    if _sqlite_table_exists(table):
+        return
+    columns = ', '.join(SEARCH_COLUMNS)
+    values = ', '.join('new.' + column for column in SEARCH_COLUMNS)
+    statements = [
+        "CREATE VIRTUAL TABLE {t} USING fts5({c}, tokenize='unicode61')",
+        "INSERT INTO {t} (rowid, {c}) SELECT id, {c} FROM {s}",
+        "CREATE TRIGGER {t}_insert AFTER INSERT ON {s} BEGIN "
+        "INSERT INTO {t} (rowid, {c}) VALUES (new.id, {v}); END",
+        "CREATE TRIGGER {t}_update AFTER UPDATE ON {s} BEGIN "
+        "DELETE FROM {t} WHERE rowid = old.id; "
+        "INSERT INTO {t} (rowid, {c}) VALUES (new.id, {v}); END",
+        "CREATE TRIGGER {t}_delete AFTER DELETE ON {s} BEGIN "
+        "DELETE FROM {t} WHERE rowid = old.id; END",
+    ]
+    for statement in statements:
+        db.session.execute(text(
+            statement.format(t=table, s=source, c=columns, v=values)))
+
+
+'''
+Drops the FTS5 table of a model and its triggers
+'''
+def drop_sqlite_index(model):
+    table = model.__tablename__ + '_search'
+    for trigger in ('insert', 'update', 'delete'):
+        db.session.execute(text(
+            'DROP TRIGGER IF EXISTS {}_{}'.format(table, trigger)))
+    db.session.execute(text('DROP TABLE IF EXISTS {}'.format(table)))
+    _sqlite_indexes.discard((str(db.engine.url), table))
+
+
+'''
+Commands for the search indexes.
+On Postgres they come from the migrations; on SQLite run
+`flask search build` once after creating the tables.
+'''
+@click.group('search')
+def search_command():
+    pass
+
+
+@search_command.command('build')
+@with_appcontext
+def build_command():
+    if db.engine.dialect.name != 'sqlite':
+        click.echo('Search indexes are created by `flask db upgrade`')
+        return
+    for model in SEARCH_MODELS:
+        build_sqlite_index(model)
+    db.session.commit()
+    click.echo('Built the SQLite search tables')
@@ -1,6 +1,9 @@
 from flask import Blueprint, jsonify, render_template, request, flash, abort
-from models import Show
+from models import Show, Artist, Venue
+from datetime import datetime
 from app import db
+from booking import find_conflicts, is_double_booking
+from feed import upcoming_shows
 from forms import ShowForm
 import sys
 
@@ -11,12 +14,67 @@ Define the blueprint: 'shows'
 show_bp = Blueprint('show', __name__, template_folder='templates')
 
 
+SHOWS_PER_PAGE = 30
+
+
+'''
+Parses an optional YYYY-MM-DD query argument, aborts on a bad value
+'''
+def parse_date_arg(name):
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        abort(400)
+
+
 '''
-Lists Shows
+Fetches one page of shows with the artist and venue columns the tiles
+need, joined in the same statement. Used for ranges reaching into the past,
+which the upcoming shows feed does not hold.
+'''
+def show_feed(page=1, start=None, end=None, per_page=SHOWS_PER_PAGE):
+    query = db.session.query(
+        Show.id,
+        Show.start_time,
+        Show.artist_id,
+        Show.venue_id,
+        Artist.name.label('artist_name'),
+        Artist.image_link.label('artist_image_link'),
+        Venue.name.label('venue_name')).join(
+        Artist, Show.artist_id == Artist.id).join(
+        Venue, Show.venue_id == Venue.id)
+    if start is not None:
+        query = query.filter(Show.start_time >= start)
+    if end is not None:
+        query = query.filter(Show.start_time < end)
+    rows = query.order_by(Show.start_time, Show.id).offset(
+        (page - 1) * per_page).limit(per_page + 1).all()
+    return rows[:per_page], len(rows) > per_page
+
+
+'''
+Lists upcoming Shows, or the shows from ?start= on when it lies in the past
 '''
 @show_bp.route('/')
 def shows():
-    return render_template('pages/shows.html', shows=Show.query.all())
+    page = max(request.args.get('page', 1, type=int), 1)
+    start = parse_date_arg('start')
+    end = parse_date_arg('end')
+    if start is not None and start < datetime.now():
+        shows, has_next = show_feed(page, start, end)
+    else:
+        shows, has_next = upcoming_shows(
+            page, start or datetime.now(), end, SHOWS_PER_PAGE)
+    return render_template(
+        'pages/shows.html',
+        shows=shows,
+        page=page,
+        has_next=has_next,
+        start=request.args.get('start', ''),
+        end=request.args.get('end', ''))
 
 
 '''
@@ -40,6 +98,11 @@ def create_show_submission():
             venue_id = form.venue_id.data
             artist_id = form.artist_id.data
             start_time = form.start_time.data
+            conflicts = find_conflicts(int(venue_id), start_time)
+            if conflicts:
+                flash('Venue {} is already booked at that time (show {}).'.format(
+                    venue_id, ', '.join(str(show_id) for show_id in conflicts)))
+                return render_template('forms/new_show.html', form=form), 409
             show = Show(
                 venue_id=venue_id,
                 artist_id=artist_id,
@@ -47,9 +110,13 @@ def create_show_submission():
             db.session.add(show)
             db.session.commit()
             flash('Show was successfully listed!')
-        except BaseException:
-            error = True
+        except BaseException as exception:
             db.session.rollback()
+            if is_double_booking(exception):
+                flash('Venue {} was booked at that time meanwhile.'.format(
+                    venue_id))
+                return render_template('forms/new_show.html', form=form), 409
+            error = True
             flash('An error occurred. Show could not be listed.')
             print(sys.exc_info())
         finally:
@@ -0,0 +1,46 @@
+import pytest
+from sqlalchemy import event
+from app import create_app
+from benchmarks.datagen import seed
+from geo import load_geo_index
+from models import db
+
+
+'''
+App on an in-memory SQLite database seeded with the benchmark generator.
+The grid index is loaded as a server does at startup.
+'''
+@pytest.fixture(scope='session')
+def app():
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': 'sqlite://',
+        'WTF_CSRF_ENABLED': False,
+        'TESTING': True,
+    })
+    with app.app_context():
+        seed(artists=20, venues=20, shows=400)
+        load_geo_index()
+        db.session.remove()
+    return app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+'''
+List of the statements sent to the database while the test runs
+'''
+@pytest.fixture
+def statements(app):
+    executed = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        executed.append(statement)
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', record)
+    yield executed
+    event.remove(engine, 'before_cursor_execute', record)
@@ -0,0 +1,71 @@
+from autocomplete import PrefixIndex
+
+
+def _index(*entries):
+    index = PrefixIndex()
+    index.load(entries)
+    return index
+
+
+def _names(index, prefix, **args):
+    return [match['name'] for match in index.complete(prefix, **args)]
+
+
+def test_every_word_starts_a_key():
+    index = _index(('venue', 1, 'The Musical Hop'), ('venue', 2, 'Park Square'))
+    for prefix in ('the', 'mus', 'hop', 'musical h', '  MUSICAL   hop '):
+        assert _names(index, prefix) == ['The Musical Hop']
+    assert _names(index, 'sical') == []
+    assert _names(index, 'hop square') == []
+    assert _names(index, '') == []
+
+
+def test_repeated_words_match_once():
+    index = _index(('artist', 1, 'Hop Hop Hooray'))
+    assert index.complete('ho') == [
+        {'id': 1, 'name': 'Hop Hop Hooray', 'type': 'artist'}]
+
+
+def test_removed_and_renamed_names():
+    index = _index(('artist', 1, 'Guns N Petals'), ('artist', 2, 'Matt Quevedo'))
+    index.remove('artist', 1)
+    assert _names(index, 'petals') == []
+    index.add('artist', 2, 'The Wild Sax Band')
+    assert _names(index, 'matt') == []
+    assert _names(index, 'sax') == ['The Wild Sax Band']
+    # Removing an unknown or already removed id is a no-op.
+    index.remove('artist', 1)
+    index.remove('venue', 2)
+    assert _names(index, 'wild') == ['The Wild Sax Band']
+
+
+def test_type_and_limit():
+    index = _index(
+        ('artist', 1, 'Echo Park'), ('venue', 1, 'Echo Hall'),
+        *[('venue', n, 'Echo Room {:02d}'.format(n)) for n in range(2, 16)])
+    assert index.complete('echo p', kind='artist') == [
+        {'id': 1, 'name': 'Echo Park', 'type': 'artist'}]
+    assert _names(index, 'echo p', kind='venue') == []
+    assert _names(index, 'echo', kind='venue', limit=3) == [
+        'Echo Hall', 'Echo Room 02', 'Echo Room 03']
+    # Matches of both types are ordered by name before the limit applies.
+    assert _names(index, 'echo', limit=2) == ['Echo Hall', 'Echo Park']
+    assert len(index.complete('echo', limit=100)) == 16
+
+
+def test_autocomplete_route(app, client):
+    assert client.get('/api/autocomplete', query_string={
+        'q': 'a', 'type': 'show'}).status_code == 400
+    client.post('/artists/create', data={
+        'name': 'Zebra Quokka Band', 'city': 'Austin', 'state': 'TX',
+        'phone': '5125550100', 'genres': ['Jazz'],
+        'facebook_link': 'https://facebook.com/zqb'})
+    response = client.get('/api/autocomplete', query_string={
+        'q': 'quokka', 'type': 'artist'})
+    [match] = response.get_json()['data']
+    assert match['name'] == 'Zebra Quokka Band'
+    assert client.get('/api/autocomplete', query_string={
+        'q': 'quokka', 'type': 'venue'}).get_json()['data'] == []
+    client.delete('/api/artists', json={'ids': [match['id']]})
+    assert client.get('/api/autocomplete', query_string={
+        'q': 'quokka'}).get_json()['data'] == []
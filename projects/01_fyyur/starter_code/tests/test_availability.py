@@ -0,0 +1,104 @@
+from datetime import datetime, timedelta
+import pytest
+from availability import availability_cache, free_windows
+from models import Artist, Show, Venue, db
+
+DAY = datetime(2041, 3, 1)
+NEXT_DAY = DAY + timedelta(days=1)
+
+
+def _at(hours):
+    return DAY + timedelta(hours=hours)
+
+
+'''
+A new venue and artist with shows at 10:00 and 15:00 on DAY, free from
+13:00 to 15:00. Returns (artist id, venue id).
+'''
+@pytest.fixture
+def venue(app):
+    with app.app_context():
+        artist = Artist(name='Available Band', seeking_venue=False)
+        venue = Venue(name='Available Hall', seeking_talent=False)
+        db.session.add_all([artist, venue])
+        db.session.flush()
+        db.session.add_all([
+            Show(artist_id=artist.id, venue_id=venue.id, start_time=_at(hours))
+            for hours in (10, 15)])
+        db.session.commit()
+        ids = artist.id, venue.id
+        db.session.remove()
+    return ids
+
+
+def _free(client, venue_id, **args):
+    response = client.get('/api/venues/availability', query_string=dict(
+        ids=venue_id, start=DAY.isoformat(), end=NEXT_DAY.isoformat(), **args))
+    assert response.status_code == 200
+    return [
+        (window['start'][11:16], window['end'][11:16])
+        for window in response.get_json()['data'][0]['free']]
+
+
+def test_adjacent_and_overlapping_shows_merge():
+    # The first show started the day before and runs until 01:00.
+    starts = [_at(-2), _at(10), _at(12), _at(15)]
+    assert free_windows(starts, DAY, NEXT_DAY, timedelta(0)) == [
+        (_at(1), _at(10)), (_at(18), NEXT_DAY)]
+
+
+def test_windows_shorter_than_min_length_are_dropped():
+    starts = [_at(-2), _at(10), _at(12), _at(15)]
+    assert free_windows(starts, DAY, NEXT_DAY, timedelta(hours=6)) == [
+        (_at(1), _at(10)), (_at(18), NEXT_DAY)]
+    assert free_windows(starts, DAY, NEXT_DAY, timedelta(hours=7)) == [
+        (_at(1), _at(10))]
+    assert free_windows(starts, DAY, NEXT_DAY, timedelta(hours=10)) == []
+
+
+def test_min_hours(client, venue):
+    _, venue_id = venue
+    assert _free(client, venue_id) == [
+        ('00:00', '10:00'), ('13:00', '15:00'), ('18:00', '00:00')]
+    assert _free(client, venue_id, min_hours=2) == [
+        ('00:00', '10:00'), ('13:00', '15:00'), ('18:00', '00:00')]
+    assert _free(client, venue_id, min_hours=2.5) == [
+        ('00:00', '10:00'), ('18:00', '00:00')]
+    assert _free(client, venue_id, min_hours=7) == [('00:00', '10:00')]
+
+
+def test_committed_show_misses_the_cache(app, client, venue):
+    artist_id, venue_id = venue
+    assert _free(client, venue_id) == [
+        ('00:00', '10:00'), ('13:00', '15:00'), ('18:00', '00:00')]
+    key = availability_cache.key(venue_id, DAY, NEXT_DAY, timedelta(0))
+    assert availability_cache.get(key) is not None
+    with app.app_context():
+        db.session.add(
+            Show(artist_id=artist_id, venue_id=venue_id, start_time=_at(12)))
+        db.session.commit()
+        db.session.remove()
+    # The 12:00 show closes the gap up to the 15:00 one.
+    assert availability_cache.key(venue_id, DAY, NEXT_DAY, timedelta(0)) != key
+    assert _free(client, venue_id) == [('00:00', '10:00'), ('18:00', '00:00')]
+    with app.app_context():
+        db.session.add(
+            Show(artist_id=artist_id, venue_id=venue_id, start_time=_at(20)))
+        db.session.commit()
+        db.session.remove()
+    assert _free(client, venue_id) == [
+        ('00:00', '10:00'), ('18:00', '20:00'), ('23:00', '00:00')]
+
+
+def test_rollback_keeps_the_cache(app, client, venue):
+    artist_id, venue_id = venue
+    _free(client, venue_id)
+    key = availability_cache.key(venue_id, DAY, NEXT_DAY, timedelta(0))
+    with app.app_context():
+        db.session.add(
+            Show(artist_id=artist_id, venue_id=venue_id, start_time=_at(20)))
+        db.session.flush()
+        db.session.rollback()
+        db.session.remove()
+    assert availability_cache.key(venue_id, DAY, NEXT_DAY, timedelta(0)) == key
+    assert availability_cache.get(key) is not None
@@ -0,0 +1,132 @@
+from datetime import datetime, timedelta
+import pytest
+from models import Artist, Show, ShowFeedEntry, Venue, db
+
+CITY = 'Batchville'
+MISSING_ID = 10 ** 9
+
+
+'''
+A new artist with one past and one upcoming show at a first venue and an
+upcoming show at a second, both venues in CITY. Returns (artist id,
+[venue ids]).
+'''
+@pytest.fixture
+def touring(app):
+    with app.app_context():
+        artist = Artist(name='Touring Band', seeking_venue=False)
+        venues = [
+            Venue(name='Batch Hall {}'.format(number), city=CITY, state='ZZ',
+                  seeking_talent=False)
+            for number in (1, 2)]
+        db.session.add(artist)
+        db.session.add_all(venues)
+        db.session.flush()
+        now = datetime.now()
+        db.session.add_all([
+            Show(artist_id=artist.id, venue_id=venue.id, start_time=now + days)
+            for venue, days in (
+                (venues[0], timedelta(days=-10)),
+                (venues[0], timedelta(days=10)),
+                (venues[1], timedelta(days=20)))])
+        db.session.commit()
+        ids = artist.id, [venue.id for venue in venues]
+        db.session.remove()
+    yield ids
+    # Through the API, which also updates the in-process indexes.
+    client = app.test_client()
+    client.delete('/api/artists', json={'ids': [ids[0]]})
+    client.delete('/api/venues', json={'ids': ids[1]})
+
+
+def _counters(app, model, entity_id):
+    with app.app_context():
+        entity = db.session.get(model, entity_id)
+        counters = entity.upcoming_shows_count, entity.past_shows_count
+        db.session.remove()
+    return counters
+
+
+def _feed_names(app, artist_id):
+    with app.app_context():
+        names = sorted(
+            (entry.artist_name, entry.venue_name)
+            for entry in ShowFeedEntry.query.filter_by(artist_id=artist_id))
+        db.session.remove()
+    return names
+
+
+def test_delete_reports_status_per_id(client, touring):
+    _, venue_ids = touring
+    response = client.delete('/api/venues', json={
+        'ids': [venue_ids[0], MISSING_ID, venue_ids[0]]})
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['deleted'] == 1
+    assert body['results'] == [
+        {'id': venue_ids[0], 'status': 'deleted'},
+        {'id': MISSING_ID, 'status': 'not_found'}]
+
+
+def test_update_by_filter_reports_status_per_id(client, touring):
+    _, venue_ids = touring
+    response = client.patch('/api/venues', json={
+        'filter': {'city': CITY}, 'values': {'seeking_talent': True}})
+    assert response.status_code == 200
+    assert response.get_json()['results'] == [
+        {'id': venue_id, 'status': 'updated'} for venue_id in venue_ids]
+
+
+@pytest.mark.parametrize('body', [
+    {},
+    {'ids': [1], 'filter': {'city': CITY}},
+    {'ids': []},
+    {'ids': 'all'},
+    {'ids': ['one']},
+    {'filter': {}},
+    {'filter': ['city']},
+    {'filter': {'name': 'Batch Hall 1'}},
+    {'filter': {'upcoming_shows_count': 0}},
+])
+def test_bad_selection_is_refused(client, body):
+    assert client.delete('/api/venues', json=body).status_code == 400
+    body = dict(body, values={'seeking_talent': True})
+    assert client.patch('/api/venues', json=body).status_code == 400
+
+
+@pytest.mark.parametrize('values', [
+    None, {}, {'id': 5}, {'updated_at': '2020-01-01'},
+    {'upcoming_shows_count': 0}, {'no_such_column': 1},
+])
+def test_bad_values_are_refused(client, touring, values):
+    _, venue_ids = touring
+    response = client.patch('/api/venues', json={
+        'ids': venue_ids, 'values': values})
+    assert response.status_code == 400
+
+
+def test_unknown_entity(client):
+    assert client.delete('/api/shows', json={'ids': [1]}).status_code == 404
+
+
+def test_delete_uncounts_cascaded_shows(app, client, touring):
+    artist_id, venue_ids = touring
+    assert _counters(app, Artist, artist_id) == (2, 1)
+    client.delete('/api/venues', json={'ids': [venue_ids[0]]})
+    assert _counters(app, Artist, artist_id) == (1, 0)
+    client.delete('/api/artists', json={'ids': [artist_id]})
+    assert _counters(app, Venue, venue_ids[1]) == (0, 0)
+
+
+def test_renames_reach_the_feed(app, client, touring):
+    artist_id, venue_ids = touring
+    assert _feed_names(app, artist_id) == [
+        ('Touring Band', 'Batch Hall 1'), ('Touring Band', 'Batch Hall 2')]
+    client.patch('/api/venues', json={
+        'ids': [venue_ids[1]], 'values': {'name': 'Renamed Hall'}})
+    client.patch('/api/artists', json={
+        'ids': [artist_id], 'values': {'name': 'Renamed Band'}})
+    assert _feed_names(app, artist_id) == [
+        ('Renamed Band', 'Batch Hall 1'), ('Renamed Band', 'Renamed Hall')]
+    client.delete('/api/venues', json={'ids': [venue_ids[0]]})
+    assert _feed_names(app, artist_id) == [('Renamed Band', 'Renamed Hall')]
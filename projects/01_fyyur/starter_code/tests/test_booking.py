@@ -0,0 +1,115 @@
+from datetime import datetime, timedelta
+import pytest
+from booking import BOOKED, SHOW_DURATION, booking_index
+from models import Artist, Show, Venue, db
+
+START = datetime(2040, 1, 1, 20, 0)
+
+
+'''
+A new artist and venue with one show at START. Returns (artist id,
+venue id, show id).
+'''
+@pytest.fixture
+def booked(app):
+    with app.app_context():
+        artist = Artist(name='Booking Band', seeking_venue=False)
+        venue = Venue(name='Booking Hall', seeking_talent=False)
+        db.session.add_all([artist, venue])
+        db.session.flush()
+        show = Show(artist_id=artist.id, venue_id=venue.id, start_time=START)
+        db.session.add(show)
+        db.session.commit()
+        ids = artist.id, venue.id, show.id
+        db.session.remove()
+    return ids
+
+
+def _schedule(client, *shows):
+    response = client.post('/api/shows', json={'shows': list(shows)})
+    assert response.status_code == 200
+    return [result['status'] for result in response.get_json()['results']]
+
+
+def _show(artist_id, venue_id, start_time):
+    return {
+        'artist_id': artist_id, 'venue_id': venue_id,
+        'start_time': start_time.isoformat()}
+
+
+def _venue_shows(app, venue_id):
+    with app.app_context():
+        count = Show.query.filter_by(venue_id=venue_id).count()
+        db.session.remove()
+    return count
+
+
+def test_touching_shows_do_not_overlap(app, booked):
+    _, venue_id, _ = booked
+    with app.app_context():
+        booking_index.load([venue_id])
+        assert booking_index.conflicts(venue_id, START - SHOW_DURATION) == []
+        assert booking_index.conflicts(venue_id, START + SHOW_DURATION) == []
+        db.session.remove()
+
+
+def test_overlap_ends_at_show_duration(app, booked):
+    _, venue_id, show_id = booked
+    second = timedelta(seconds=1)
+    with app.app_context():
+        booking_index.load([venue_id])
+        for start_time in (
+                START, START - SHOW_DURATION + second,
+                START + SHOW_DURATION - second):
+            assert booking_index.conflicts(venue_id, start_time) == [show_id]
+        db.session.remove()
+
+
+def test_touching_show_is_scheduled(app, client, booked):
+    artist_id, venue_id, _ = booked
+    assert _schedule(
+        client,
+        _show(artist_id, venue_id, START + SHOW_DURATION),
+        _show(artist_id, venue_id, START - SHOW_DURATION)) == [
+        'created', 'created']
+    assert _venue_shows(app, venue_id) == 3
+
+
+def test_conflicts_within_a_batch(app, client, booked):
+    artist_id, venue_id, _ = booked
+    later = START + 2 * SHOW_DURATION
+    response = client.post('/api/shows', json={'shows': [
+        _show(artist_id, venue_id, later),
+        _show(artist_id, venue_id, later + SHOW_DURATION / 2),
+        _show(artist_id, venue_id, START + timedelta(hours=1)),
+    ]})
+    results = response.get_json()['results']
+    assert [result['status'] for result in results] == [
+        'created', 'conflict', 'conflict']
+    assert all(result['error'].startswith(BOOKED) for result in results[1:])
+    assert response.get_json()['created'] == 1
+    assert _venue_shows(app, venue_id) == 2
+
+
+def test_invalid_start_time(app, client, booked):
+    artist_id, venue_id, _ = booked
+    response = client.post('/api/shows', json={'shows': [
+        {'artist_id': artist_id, 'venue_id': venue_id,
+         'start_time': 'next tuesday-ish'},
+        {'artist_id': artist_id, 'venue_id': venue_id, 'start_time': 42},
+        {'artist_id': artist_id, 'venue_id': venue_id},
+    ]})
+    assert [result['status'] for result in response.get_json()['results']] == [
+        'invalid', 'invalid', 'invalid']
+    assert _venue_shows(app, venue_id) == 1
+
+
+def test_double_booking_form_is_refused(app, client, booked):
+    artist_id, venue_id, _ = booked
+    response = client.post('/shows/create', data={
+        'artist_id': artist_id,
+        'venue_id': venue_id,
+        'start_time': (START + timedelta(hours=1)).strftime('%Y-%m-%d %H:%M:%S'),
+    })
+    assert response.status_code == 409
+    assert _venue_shows(app, venue_id) == 1
@@ -0,0 +1,125 @@
+from datetime import datetime, timedelta
+import time
+import pytest
+from booking import SHOW_DURATION
+from models import Artist, Show, Venue, db
+
+
+def _artist(name):
+    return Artist(
+        name=name, city='Austin', state='TX', genres=['Jazz'],
+        seeking_venue=False)
+
+
+def _venue(name):
+    return Venue(
+        name=name, city='Austin', state='TX', address='1 Main St',
+        genres=['Jazz'], seeking_talent=False)
+
+
+'''
+A new artist and venue with one past and one upcoming show together.
+Returns (artist id, venue id, show ids).
+'''
+@pytest.fixture
+def booked(app):
+    with app.app_context():
+        artist, venue = _artist('Conditional Band'), _venue('Conditional Hall')
+        db.session.add_all([artist, venue])
+        db.session.flush()
+        now = datetime.now()
+        shows = [
+            Show(artist_id=artist.id, venue_id=venue.id,
+                 start_time=now + offset * SHOW_DURATION)
+            for offset in (-2, 2)]
+        db.session.add_all(shows)
+        db.session.commit()
+        ids = artist.id, venue.id, [show.id for show in shows]
+        db.session.remove()
+    return ids
+
+
+# Last-Modified has whole seconds: a write must land in a later second.
+def _next_second():
+    time.sleep(1.05)
+
+
+def _since(client, path):
+    response = client.get(path)
+    assert response.status_code == 200
+    assert response.last_modified is not None
+    return {'If-Modified-Since': response.headers['Last-Modified']}
+
+
+def _write(app, change):
+    _next_second()
+    with app.app_context():
+        change()
+        db.session.commit()
+        db.session.remove()
+
+
+def test_unchanged_page_is_not_modified(client, booked):
+    _, venue_id, _ = booked
+    for path in ('/venues/{}'.format(venue_id), '/api/venues/{}'.format(venue_id)):
+        headers = _since(client, path)
+        assert client.get(path, headers=headers).status_code == 304
+
+
+def test_renamed_artist_modifies_venue_page(app, client, booked):
+    artist_id, venue_id, _ = booked
+    path = '/venues/{}'.format(venue_id)
+    headers = _since(client, path)
+
+    def rename():
+        db.session.get(Artist, artist_id).name = 'Renamed Band'
+    _write(app, rename)
+    response = client.get(path, headers=headers)
+    assert response.status_code == 200
+    assert b'Renamed Band' in response.data
+
+
+def test_deleted_show_modifies_both_pages(app, client, booked):
+    artist_id, venue_id, show_ids = booked
+    paths = ['/venues/{}'.format(venue_id), '/artists/{}'.format(artist_id)]
+    headers = [_since(client, path) for path in paths]
+    _write(app, lambda: db.session.delete(db.session.get(Show, show_ids[1])))
+    for path, since in zip(paths, headers):
+        assert client.get(path, headers=since).status_code == 200
+
+
+def test_show_moving_into_the_past_modifies_page(app, client, booked):
+    artist_id, venue_id, _ = booked
+    with app.app_context():
+        db.session.add(Show(
+            artist_id=artist_id, venue_id=venue_id,
+            start_time=datetime.now() + timedelta(seconds=1)))
+        db.session.commit()
+        db.session.remove()
+    path = '/artists/{}'.format(artist_id)
+    headers = _since(client, path)
+    time.sleep(2.05)
+    assert client.get(path, headers=headers).status_code == 200
+
+
+def test_deleted_venue_modifies_venue_list(app, client, booked):
+    _, venue_id, _ = booked
+    with app.app_context():
+        db.session.add(_venue('Next Hall'))
+        db.session.commit()
+        db.session.remove()
+    path = '/api/venues?limit=3'
+    headers = _since(client, path)
+    assert client.get(path, headers=headers).status_code == 304
+    _write(app, lambda: db.session.delete(db.session.get(Venue, venue_id)))
+    assert client.get(path, headers=headers).status_code == 200
+
+
+def test_batch_deleted_venue_modifies_venue_list(app, client, booked):
+    _, venue_id, _ = booked
+    path = '/api/venues?limit=3'
+    headers = _since(client, path)
+    _next_second()
+    response = client.delete('/api/venues', json={'ids': [venue_id]})
+    assert response.json['deleted'] == 1
+    assert client.get(path, headers=headers).status_code == 200
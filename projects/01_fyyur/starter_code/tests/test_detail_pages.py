@@ -0,0 +1,25 @@
+import pytest
+
+# The entity, its shows split into past and upcoming, and the other side
+# of each show come back in one statement.
+MAX_STATEMENTS = 1
+
+
+@pytest.mark.parametrize('path', ['/venues/{}', '/artists/{}'])
+def test_detail_page_statement_count(client, statements, path):
+    for entity_id in (1, 2, 3):
+        statements.clear()
+        response = client.get(path.format(entity_id))
+        assert response.status_code == 200
+        assert len(statements) <= MAX_STATEMENTS, statements
+
+
+@pytest.mark.parametrize('path', ['/venues/1', '/artists/1'])
+def test_revalidated_detail_page_statement_count(client, statements, path):
+    response = client.get(path)
+    for headers in (
+            {'If-None-Match': response.headers['ETag']},
+            {'If-Modified-Since': response.headers['Last-Modified']}):
+        statements.clear()
+        assert client.get(path, headers=headers).status_code == 304
+        assert len(statements) <= MAX_STATEMENTS, statements
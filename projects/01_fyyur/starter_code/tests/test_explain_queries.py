@@ -0,0 +1,36 @@
+from benchmarks.explain_queries import capture_statements, explain
+
+
+def test_hot_queries_avoid_full_table_scans(app):
+    engine, captured = capture_statements(app)
+    assert captured
+    with engine.connect() as connection:
+        full_scans = {
+            ' '.join(statement.split()): scans
+            for statement, parameters in captured.items()
+            for _, scans in [explain(connection, statement, parameters)]
+            if scans
+        }
+    assert not full_scans
+
+
+def test_limit_alone_does_not_exempt_a_scan(app):
+    engine, _ = capture_statements(app)
+    with engine.connect() as connection:
+        # Walks venue by rowid and stops early.
+        _, scans = explain(
+            connection, 'SELECT * FROM venue ORDER BY venue.id DESC LIMIT 10', ())
+        assert scans == []
+        # Walks the (start_time, id) index in ORDER BY order.
+        _, scans = explain(connection, (
+            'SELECT * FROM show ORDER BY show.start_time, show.id LIMIT 10'), ())
+        assert scans == []
+        # Reads every venue to find ten matching rows.
+        _, scans = explain(
+            connection, "SELECT * FROM venue WHERE phone = '1' LIMIT 10", ())
+        assert scans == ['venue']
+        # The LIMIT applies to venue; the show scan still reads the table.
+        _, scans = explain(connection, (
+            'SELECT * FROM venue WHERE venue.id IN (SELECT show.venue_id '
+            "FROM show WHERE show.artist_id + 0 = 1) ORDER BY venue.id LIMIT 10"), ())
+        assert scans == ['show']
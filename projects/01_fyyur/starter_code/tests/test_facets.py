@@ -0,0 +1,85 @@
+import pytest
+from facets import count_facets, facet_cache, facet_key
+from models import Venue, db
+
+KEYS = [
+    facet_key(),
+    facet_key(['Jazz']),
+    facet_key(['Funk', 'Jazz']),
+    facet_key(city='Austin'),
+    facet_key(['Funk'], 'Denver', 'CO'),
+    facet_key(state='TX'),
+]
+
+
+'''
+Three new venues in Austin. Returns their ids; they and the venues the
+test adds are deleted afterwards.
+'''
+@pytest.fixture
+def venues(app):
+    with app.app_context():
+        venues = [
+            Venue(name='Facet Hall {}'.format(number), city='Austin',
+                  state='TX', genres=genres, seeking_talent=False)
+            for number, genres in (
+                (1, ['Jazz', 'Blues']), (2, ['Jazz']), (3, ['Funk']))]
+        db.session.add_all(venues)
+        db.session.commit()
+        ids = [venue.id for venue in venues]
+        db.session.remove()
+    yield ids
+    with app.app_context():
+        ids = [venue_id for venue_id, in db.session.query(Venue.id).filter(
+            Venue.name.like('Facet Hall %'))]
+        db.session.remove()
+    app.test_client().delete('/api/venues', json={'ids': ids})
+
+
+def _prime(app):
+    with app.app_context():
+        for key in KEYS:
+            facet_cache.counts('venues', key)
+        db.session.remove()
+
+
+def _edit(venue_ids):
+    first, second, third = [
+        db.session.get(Venue, venue_id) for venue_id in venue_ids]
+    first.genres = ['Funk', 'Blues']
+    first.city, first.state = 'Denver', 'CO'
+    second.genres = ['Jazz', 'Funk']
+    db.session.add(Venue(
+        name='Facet Hall 4', city='Denver', state='CO', genres=['Funk'],
+        seeking_talent=False))
+    db.session.delete(third)
+
+
+def _assert_cache_matches_aggregate(app, statements):
+    with app.app_context():
+        for key in KEYS:
+            del statements[:]
+            cached = facet_cache.counts('venues', key)
+            # Served from the cache, not re-aggregated.
+            assert statements == []
+            assert cached == count_facets(Venue, key)
+        db.session.remove()
+
+
+def test_committed_edits_are_applied(app, venues, statements):
+    _prime(app)
+    with app.app_context():
+        _edit(venues)
+        db.session.commit()
+        db.session.remove()
+    _assert_cache_matches_aggregate(app, statements)
+
+
+def test_rolled_back_edits_are_dropped(app, venues, statements):
+    _prime(app)
+    with app.app_context():
+        _edit(venues)
+        db.session.flush()
+        db.session.rollback()
+        db.session.remove()
+    _assert_cache_matches_aggregate(app, statements)
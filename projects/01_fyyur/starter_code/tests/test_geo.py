@@ -0,0 +1,98 @@
+from heapq import nsmallest
+import random
+import pytest
+from geo import GridIndex, distance_km
+
+
+def _brute_within(points, lat, lon, radius_km):
+    return sorted(
+        (distance, venue_id) for distance, venue_id in (
+            (distance_km(lat, lon, *point), venue_id)
+            for venue_id, point in points.items())
+        if distance <= radius_km)
+
+
+def _brute_nearest(points, lat, lon, k, max_km):
+    return nsmallest(k, (
+        (distance, venue_id)
+        for distance, venue_id in _brute_within(points, lat, lon, max_km)))
+
+
+def _random_point(rng):
+    # Mostly clustered, one cluster straddling the antimeridian, and some
+    # anywhere on the globe.
+    if rng.random() < 0.2:
+        return rng.uniform(-90, 90), rng.uniform(-180, 180)
+    lat, lon = rng.choice((
+        (30.27, -97.74), (40.71, -74.01), (64.84, -147.72), (-17.5, 179.8)))
+    lon += rng.gauss(0, 1)
+    return lat + rng.gauss(0, 1), lon - 360 if lon > 180 else lon
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_grid_index_matches_brute_force(seed):
+    rng = random.Random(seed)
+    points = {venue_id: _random_point(rng) for venue_id in range(1, 301)}
+    index = GridIndex()
+    index.load((venue_id, lat, lon) for venue_id, (lat, lon) in points.items())
+    # Removed and moved venues leave their old cell.
+    for venue_id in rng.sample(sorted(points), 30):
+        if rng.random() < 0.5:
+            index.remove(venue_id)
+            del points[venue_id]
+        else:
+            points[venue_id] = _random_point(rng)
+            index.add(venue_id, *points[venue_id])
+    for _ in range(50):
+        lat, lon = _random_point(rng)
+        radius_km = rng.choice((1, 25, 100, 400, 2000))
+        assert index.within(lat, lon, radius_km) == _brute_within(
+            points, lat, lon, radius_km)
+        assert index.within(lat, lon, radius_km, 5) == _brute_within(
+            points, lat, lon, radius_km)[:5]
+        k = rng.choice((1, 5, 20))
+        max_km = rng.choice((10, 200, 500, 20000))
+        assert index.nearest(lat, lon, k, max_km) == _brute_nearest(
+            points, lat, lon, k, max_km)
+
+
+def test_grid_index_wraps_around_antimeridian_and_poles():
+    points = {1: (0, 179.9), 2: (0, -179.9), 3: (89.9, 0), 4: (89.9, 180)}
+    index = GridIndex()
+    index.load((venue_id, lat, lon) for venue_id, (lat, lon) in points.items())
+    for lat, lon in ((0, 179.95), (0, -180), (89.95, 90), (89.95, -90)):
+        assert index.within(lat, lon, 50) == _brute_within(points, lat, lon, 50)
+        assert len(index.within(lat, lon, 50)) == 2
+        assert index.nearest(lat, lon, 2, 50) == _brute_nearest(
+            points, lat, lon, 2, 50)
+
+
+@pytest.mark.parametrize('query', [
+    {},
+    {'lat': 30.27},
+    {'lng': -97.74},
+    {'city': 'Atlantis', 'state': 'ZZ'},
+    {'lat': 'north', 'lng': -97.74},
+    {'lat': 91, 'lng': -97.74},
+    {'lat': 30.27, 'lng': -181},
+    {'lat': 'nan', 'lng': -97.74},
+    {'lat': 30.27, 'lng': 'inf'},
+    {'lat': 30.27, 'lng': -97.74, 'radius_km': 'nan'},
+    {'lat': 30.27, 'lng': -97.74, 'radius_km': 'inf'},
+    {'lat': 30.27, 'lng': -97.74, 'radius_km': '-inf'},
+    {'lat': 30.27, 'lng': -97.74, 'radius_km': -1},
+    {'lat': 30.27, 'lng': -97.74, 'radius_km': 0},
+])
+def test_nearby_refuses_bad_queries(client, query):
+    response = client.get('/api/venues/nearby', query_string=query)
+    assert response.status_code == 400
+    assert response.get_json()['success'] is False
+
+
+def test_nearby_venues(client):
+    response = client.get('/api/venues/nearby', query_string={
+        'city': 'Austin', 'state': 'TX', 'radius_km': 50, 'limit': 5})
+    assert response.status_code == 200
+    distances = [venue['distance_km'] for venue in response.get_json()['data']]
+    assert distances == sorted(distances)
+    assert all(distance <= 50 for distance in distances)
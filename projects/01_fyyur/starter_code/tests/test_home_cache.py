@@ -0,0 +1,77 @@
+import pytest
+from cache import page_cache
+from models import Artist, db
+
+
+def _artist_form(name):
+    return {
+        'name': name,
+        'city': 'Austin',
+        'state': 'TX',
+        'phone': '5125550100',
+        'genres': ['Jazz'],
+        'facebook_link': 'https://facebook.com/home-cache',
+    }
+
+
+def _artist_id(app, name):
+    with app.app_context():
+        artist_id = db.session.query(Artist.id).filter_by(name=name).scalar()
+        db.session.remove()
+    return artist_id
+
+
+'''
+Client that never writes, so it has no pending flash messages and is
+served from the page cache
+'''
+@pytest.fixture
+def visitor(app):
+    return app.test_client()
+
+
+def _home(visitor):
+    response = visitor.get('/')
+    assert response.status_code == 200
+    return response.get_data(as_text=True)
+
+
+def test_writes_invalidate_the_home_page(app, client, visitor):
+    _home(visitor)
+    assert 'Fresh Band' not in _home(visitor)
+
+    client.post('/artists/create', data=_artist_form('Fresh Band'))
+    assert 'Fresh Band' in _home(visitor)
+
+    artist_id = _artist_id(app, 'Fresh Band')
+    client.post('/artists/{}/edit'.format(artist_id),
+                data=_artist_form('Edited Band'))
+    page = _home(visitor)
+    assert 'Edited Band' in page and 'Fresh Band' not in page
+
+    client.delete('/artists/{}'.format(artist_id))
+    assert 'Edited Band' not in _home(visitor)
+
+
+def test_cached_home_page_is_reused(visitor):
+    _home(visitor)
+    hits = page_cache.stats()['hits']
+    _home(visitor)
+    assert page_cache.stats()['hits'] == hits + 1
+
+
+def test_pending_flash_bypasses_the_cache(app, client, visitor):
+    _home(visitor)
+    client.post('/artists/create', data=_artist_form('Flashed Band'))
+    _home(visitor)
+    stats = page_cache.stats()
+    page = _home(client)
+    # Rendered for this client only: the cache is neither read nor filled.
+    assert 'Artist Flashed Band was successfully listed!' in page
+    assert page_cache.stats() == stats
+    assert 'successfully listed' not in _home(visitor)
+    # The flash was shown; the next visit is served from the cache.
+    hits = page_cache.stats()['hits']
+    assert 'successfully listed' not in _home(client)
+    assert page_cache.stats()['hits'] == hits + 1
+    client.delete('/artists/{}'.format(_artist_id(app, 'Flashed Band')))
@@ -0,0 +1,92 @@
+import json
+import pytest
+from importer import import_command
+from models import Artist, db
+
+CITY = 'Importville'
+
+
+'''
+Runs `flask import` with the given arguments; imported artists are
+deleted afterwards
+'''
+@pytest.fixture
+def run_import(app):
+    runner = app.test_cli_runner()
+
+    def run(*args):
+        result = runner.invoke(import_command, [str(arg) for arg in args])
+        assert result.exit_code == 0, result.output
+        return result.output
+    yield run
+    app.test_client().delete('/api/artists', json={'filter': {'city': CITY}})
+
+
+def _imported_names(app):
+    with app.app_context():
+        names = sorted(
+            name for name, in db.session.query(Artist.name).filter_by(city=CITY))
+        db.session.remove()
+    return names
+
+
+def _rejects(path):
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f]
+
+
+def _artist_line(name, **columns):
+    return json.dumps(dict(
+        {'name': name, 'city': CITY, 'state': 'TX', 'genres': ['Jazz']},
+        **columns))
+
+
+def test_csv_import_rejects_bad_rows(app, run_import, tmp_path):
+    source = tmp_path / 'artists.csv'
+    source.write_text(
+        'name,city,state,genres,seeking_venue\n'
+        'CSV One,{0},TX,"Jazz, Blues",yes\n'
+        ',{0},TX,Jazz,no\n'
+        'CSV Two,{0},TX,Folk,no\n'.format(CITY))
+    run_import('artist', source)
+    assert _imported_names(app) == ['CSV One', 'CSV Two']
+    rejects = _rejects(str(source) + '.rejects.jsonl')
+    assert [(reject['line'], reject['error']) for reject in rejects] == [
+        (3, 'missing name')]
+    assert not (tmp_path / 'artists.csv.checkpoint').exists()
+
+
+def test_jsonl_import_retries_refused_rows_one_by_one(app, run_import, tmp_path):
+    source = tmp_path / 'artists.jsonl'
+    source.write_text('\n'.join([
+        _artist_line('JSON One'),
+        '{"name": "JSON Broken",',
+        # Artist 1 exists: the database refuses the whole batch.
+        _artist_line('JSON Duplicate', id=1),
+        '["not", "an", "object"]',
+        _artist_line('JSON Two'),
+    ]) + '\n')
+    output = run_import('artist', source, '--batch-size', 10)
+    assert 'Imported 2 artist rows (3 rejected' in output
+    assert _imported_names(app) == ['JSON One', 'JSON Two']
+    rejects = _rejects(str(source) + '.rejects.jsonl')
+    assert [reject['line'] for reject in rejects] == [2, 4, 3]
+    assert rejects[0]['error'].startswith('invalid JSON')
+    assert rejects[1]['error'] == 'not an object'
+    assert 'UNIQUE' in rejects[2]['error']
+    assert rejects[2]['row']['name'] == 'JSON Duplicate'
+
+
+def test_resume_skips_committed_batches(app, run_import, tmp_path):
+    source = tmp_path / 'artists.jsonl'
+    source.write_text('\n'.join(
+        _artist_line('Resumed {}'.format(number)) for number in range(1, 6)
+    ) + '\n')
+    # An import stopped after its first committed batch of two rows.
+    (tmp_path / 'artists.jsonl.checkpoint').write_text('2')
+    rejects = tmp_path / 'artists.jsonl.rejects.jsonl'
+    rejects.write_text('{"line": 1, "error": "earlier run", "row": null}\n')
+    run_import('artist', source, '--batch-size', 2, '--resume')
+    assert _imported_names(app) == ['Resumed 3', 'Resumed 4', 'Resumed 5']
+    assert [reject['error'] for reject in _rejects(rejects)] == ['earlier run']
+    assert not (tmp_path / 'artists.jsonl.checkpoint').exists()
@@ -0,0 +1,94 @@
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import create_engine, func, select
+from app import create_app
+from autocomplete import load_name_index
+from booking import booking_index
+from geo import load_geo_index
+from models import Artist, Show, Venue, db
+from routing import PRIMARY_COOKIE
+
+VENUE_ID = 1
+
+
+'''
+Creates the schema in a database file with one artist and one venue
+named after the file, so a response tells which database served it
+'''
+def _database(path, label):
+    uri = 'sqlite:///{}'.format(path)
+    engine = create_engine(uri)
+    db.metadata.create_all(engine)
+    with engine.begin() as connection:
+        connection.execute(Artist.__table__.insert(), {
+            'id': 1, 'name': label + ' Band', 'seeking_venue': False})
+        connection.execute(Venue.__table__.insert(), {
+            'id': VENUE_ID, 'name': label + ' Hall', 'city': 'Austin',
+            'state': 'TX', 'seeking_talent': False})
+    return uri, engine
+
+
+def _count_shows(engine):
+    with engine.connect() as connection:
+        return connection.execute(
+            select(func.count()).select_from(Show.__table__)).scalar()
+
+
+'''
+App on a primary SQLite file with one replica file. The module-level
+indexes are reloaded from the shared test app afterwards.
+'''
+@pytest.fixture
+def replicated(app, tmp_path):
+    primary_uri, primary = _database(tmp_path / 'primary.db', 'Primary')
+    replica_uri, replica = _database(tmp_path / 'replica.db', 'Replica')
+    routed = create_app({
+        'SQLALCHEMY_DATABASE_URI': primary_uri,
+        'SQLALCHEMY_REPLICA_URIS': [replica_uri],
+        'WTF_CSRF_ENABLED': False,
+        'TESTING': True,
+    })
+    yield routed, primary, replica
+    db.app = app
+    booking_index.forget([VENUE_ID])
+    with app.app_context():
+        load_name_index()
+        load_geo_index()
+        db.session.remove()
+    primary.dispose()
+    replica.dispose()
+
+
+def _venue_name(client):
+    response = client.get('/api/venues/{}'.format(VENUE_ID))
+    assert response.status_code == 200
+    return response.get_json()['data']['name']
+
+
+def test_get_reads_from_replica(replicated):
+    routed, _, _ = replicated
+    assert _venue_name(routed.test_client()) == 'Replica Hall'
+
+
+def test_post_writes_to_primary_and_pins_client(replicated):
+    routed, primary, replica = replicated
+    client = routed.test_client()
+    start_time = datetime.now() + timedelta(days=30)
+    response = client.post('/api/shows', json={'shows': [{
+        'artist_id': 1, 'venue_id': VENUE_ID,
+        'start_time': start_time.isoformat()}]})
+    assert response.status_code == 200
+    assert response.get_json()['created'] == 1
+    assert PRIMARY_COOKIE in response.headers['Set-Cookie']
+    assert _count_shows(primary) == 1
+    assert _count_shows(replica) == 0
+    # The client now holds the read-your-writes cookie; others do not.
+    assert _venue_name(client) == 'Primary Hall'
+    assert _venue_name(routed.test_client()) == 'Replica Hall'
+
+
+def test_expired_cookie_reads_from_replica(replicated):
+    routed, _, _ = replicated
+    client = routed.test_client()
+    client.set_cookie('localhost', PRIMARY_COOKIE, '0')
+    assert _venue_name(client) == 'Replica Hall'
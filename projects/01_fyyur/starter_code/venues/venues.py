@@ -1,7 +1,13 @@
-from flask import Blueprint, jsonify, render_template, request, flash, url_for, redirect
+from flask import Blueprint, jsonify, render_template, request, flash, url_for, redirect, abort, make_response
 from models import Venue, Show, Artist
 from datetime import datetime
+from sqlalchemy import and_, func
 from app import db
+from autocomplete import name_index
+from cache import page_cache, HOME_PAGE
+from conditional import (
+    compute_etag, local_to_utc, newest, not_modified, with_validators)
+from search import search, SEARCH_RESULTS_PER_PAGE
 from forms import VenueForm
 import sys
 
@@ -12,12 +18,97 @@ Define the blueprint: 'venues'
 venue_bp = Blueprint('venue', __name__, template_folder='templates')
 
 
+AREAS_PER_PAGE = 20
+VENUES_PER_AREA = 5
+
+
+'''
+Groups a page of city/state areas with their venue count and first venues.
+Runs as a single statement: the GROUP BY picks the page of areas and a
+row_number() window over just those areas keeps the first few venues each.
+'''
+def venues_by_area(page=1, per_area=VENUES_PER_AREA):
+    areas = db.session.query(
+        Venue.city,
+        Venue.state,
+        func.count(Venue.id).label('num_venues')).group_by(
+        Venue.city, Venue.state).order_by(
+        Venue.state, Venue.city).offset(
+        (page - 1) * AREAS_PER_PAGE).limit(
+        AREAS_PER_PAGE + 1).subquery()
+    ranked = db.session.query(
+        Venue.id,
+        Venue.name,
+        Venue.upcoming_shows_count,
+        areas.c.city,
+        areas.c.state,
+        areas.c.num_venues,
+        func.row_number().over(
+            partition_by=(areas.c.city, areas.c.state),
+            order_by=Venue.id).label('position')).join(
+        areas, and_(
+            Venue.city == areas.c.city,
+            Venue.state == areas.c.state)).subquery()
+    rows = db.session.query(ranked).filter(
+        ranked.c.position <= per_area).order_by(
+        ranked.c.state, ranked.c.city, ranked.c.position).all()
+    grouped = []
+    for row in rows:
+        if not grouped or (grouped[-1]['city'], grouped[-1]['state']) != (row.city, row.state):
+            grouped.append({
+                'city': row.city,
+                'state': row.state,
+                'num_venues': row.num_venues,
+                'venues': []
+            })
+        grouped[-1]['venues'].append({
+            'id': row.id,
+            'name': row.name,
+            'num_upcoming_shows': row.upcoming_shows_count
+        })
+    has_next = len(grouped) > AREAS_PER_PAGE
+    return grouped[:AREAS_PER_PAGE], has_next
+
+
 '''
 Lists Venues.
 '''
 @venue_bp.route('/')
 def venues():
-    return render_template('pages/venues.html', venues=Venue.query.all())
+    page = max(request.args.get('page', 1, type=int), 1)
+    areas, has_next = venues_by_area(page)
+    return render_template(
+        'pages/venues.html',
+        areas=areas,
+        page=page,
+        has_next=has_next,
+        per_area=VENUES_PER_AREA)
+
+
+'''
+Lists more venues of a single area, used to lazily expand it
+'''
+@venue_bp.route('/area')
+def area_venues():
+    city = request.args.get('city', '')
+    state = request.args.get('state', '')
+    offset = max(request.args.get('offset', 0, type=int), 0)
+    limit = min(max(request.args.get('limit', 20, type=int), 1), 100)
+    rows = db.session.query(
+        Venue.id, Venue.name, Venue.upcoming_shows_count).filter(
+        Venue.city == city, Venue.state == state).order_by(
+        Venue.id).offset(offset).limit(limit + 1).all()
+    return jsonify(
+        {
+            'success': True,
+            'data': [{
+                'id': row.id,
+                'name': row.name,
+                'num_upcoming_shows': row.upcoming_shows_count
+            } for row in rows[:limit]],
+            'next_offset': offset + limit if len(rows) > limit else None
+        }
+    )
 
 
 '''
@@ -25,12 +116,9 @@ Functionality to search for venues
 '''
 @venue_bp.route('/search', methods=['POST'])
 def search_venues():
-    venues = Venue.query.filter(
-        Venue.name.ilike(
-            "%" +
-            request.form.get('search_term') +
-            '%')).all()
-    count_venues = len(venues)
+    search_term = request.form.get('search_term', '')
+    page = max(request.form.get('page', 1, type=int), 1)
+    venues, count_venues = search(Venue, search_term, page)
     response = {
         "count": count_venues,
         "data": venues
@@ -38,9 +126,9 @@ def search_venues():
     return render_template(
         'pages/search_venues.html',
         results=response,
-        search_term=request.form.get(
-            'search_term',
-            ''))
+        search_term=search_term,
+        page=page,
+        has_next=page * SEARCH_RESULTS_PER_PAGE < count_venues)
 
 
 '''
@@ -48,21 +136,44 @@ Venue page
 '''
 @venue_bp.route('/<int:venue_id>')
 def show_venue(venue_id):
+    # One statement: the venue joined to its shows and their artist columns.
+    rows = db.session.query(
+        Venue,
+        Show.start_time,
+        Show.artist_id,
+        Artist.name.label('artist_name'),
+        Artist.image_link.label('artist_image_link'),
+        Show.updated_at.label('show_updated_at'),
+        Artist.updated_at.label('artist_updated_at')).outerjoin(
+        Show, Show.venue_id == Venue.id).outerjoin(
+        Artist, Show.artist_id == Artist.id).filter(
+        Venue.id == venue_id).order_by(Show.start_time).all()
+    if not rows:
+        abort(404)
     date_today = datetime.now()
-    venue = Venue.query.get(venue_id)
-    upcoming_shows = db.session.query(Show).join(Artist).filter(
-        Show.venue_id == venue_id).filter(
-        Show.start_time > date_today).all()
-    upcoming_shows = [show for show in upcoming_shows if len(show.venue.name) > 0]
-    past_shows = db.session.query(Show).join(Artist).filter(
-        Show.venue_id == venue_id).filter(
-        Show.start_time < date_today).all()
-    past_shows = [show for show in past_shows if len(show.venue.name) > 0]
-    return render_template(
+    shows = [row for row in rows if row.start_time is not None]
+    past_shows = [show for show in shows if show.start_time < date_today]
+    upcoming_shows = [show for show in shows if show.start_time >= date_today]
+    # The rows hold everything the page renders; the split moves over time.
+    venue = rows[0].Venue
+    etag = compute_etag(
+        'venue', venue.id, venue.updated_at,
+        [tuple(show)[1:] for show in shows], len(upcoming_shows))
+    # A show leaving the page moves the venue's counters, and so its
+    # updated_at; a show moves into the past at its start time.
+    last_modified = newest(
+        venue.updated_at,
+        *[show.show_updated_at for show in shows],
+        *[show.artist_updated_at for show in shows],
+        *[local_to_utc(show.start_time) for show in past_shows])
+    unchanged = not_modified(etag, last_modified)
+    if unchanged:
+        return unchanged
+    return with_validators(make_response(render_template(
         'pages/show_venue.html',
         venue=venue,
         upcoming_shows=upcoming_shows,
-        past_shows=past_shows)
+        past_shows=past_shows)), etag, last_modified)
 
 
 '''
@@ -95,6 +206,8 @@ def create_venue_submission():
             seeking_description=form.seeking_description.data)
         db.session.add(vanue)
         db.session.commit()
+        name_index.add('venue', vanue.id, vanue.name)
+        page_cache.invalidate(HOME_PAGE)
         db.session.close()
         flash('Venue ' + request.form['name'] + ' was successfully listed!')
         return redirect(url_for('venue.venues'))
@@ -148,6 +261,8 @@ def edit_venue_submission(venue_id):
         venue.seeking_talent = form.seeking_talent.data
         venue.seeking_description = form.seeking_description.data
         db.session.commit()
+        name_index.add('venue', venue_id, form.name.data)
+        page_cache.invalidate(HOME_PAGE)
         flash('Venue ' + request.form['name'] +
               ' was successfully updated!')
         db.session.close()
@@ -171,6 +286,8 @@ def delete_venue(venue_id):
         venue = Venue.query.get(venue_id)
         db.session.delete(venue)
         db.session.commit()
+        name_index.remove('venue', int(venue_id))
+        page_cache.invalidate(HOME_PAGE)
         flash('Venue ' + venue.name + ' was successfully deleted!')
     except BaseException:
         error = True